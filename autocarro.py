@@ -1,20 +1,44 @@
-import requests
-from bs4 import BeautifulSoup
+import sys
+
+# --profile-startup: o cronômetro de imports precisa entrar antes deles
+if '--profile-startup' in sys.argv:
+    from services import perfil_inicio
+    perfil_inicio.ativar()
+
+import argparse
+import hashlib
 import json
 import os
-import sys
+import signal
+import threading
 import time
 import urllib3
 from datetime import datetime, timedelta
+from functools import partial
+
+# services (supabase, NumPy e BeautifulSoup são importados só quando usados)
+from services.fipe_service import resolver_fipe_em_lote, obter_cache, obter_tabela, salvar_cache
+from services.telegram_service import enviar_telegram_em_lote
+from services.supabase_service import SupabaseService as DatabaseService, SupabasePreguicoso, BufferAnuncios
+from services.busca_service import SessaoBusca, buscar_paginado
+from services.next_data import extrair_next_data, fatiar_next_data
+from services.memoria_service import MemoriaPrecos
+from services.historico_cache import CacheHistorico
+from services.metricas import metricas
+from services.planejador import carregar_watchlists, planejar, nome_busca, rotear, aceita_alguma
+from services.agendador import Agendador, OrcamentoRequisicoes
+from services.pipeline import (
+    EstagioParalelo, STATUS_BAIXOU, STATUS_NOVO, STATUS_SUBIU, comparar, cronometrar, deduplicar,
+    enriquecer, gravar, ler_ofertas, normalizar, sem_sedan,
+)
+from services import next_data
 
-# services
-from services.fipe_service import obter_valor_fipe
-from services.telegram_service import enviar_telegram
-from services.supabase_service import SupabaseService as DatabaseService
-
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 # CONFIGURAÇÕES - Otimizado para GitHub Actions
+# Watchlists (estados, câmbios, faixas de ano/preço) ficam em watchlists.json;
+# esta lista é usada só se o arquivo não existir
+ARQUIVO_WATCHLISTS = os.getenv("WATCHLISTS_PATH", "watchlists.json")
+WATCHLIST_PADROES = {"estados": [43], "cambios": [1]}
 VEICULOS_POPULARES = [
     {"nome": "HB20", "query": "hb20", "ano_de": 2015, "preco_ate": 60000},
     {"nome": "Onix", "query": "onix", "ano_de": 2015, "preco_ate": 60000},
@@ -24,196 +48,558 @@ VEICULOS_POPULARES = [
 ]
 
 # Limites para reduzir consumo
-MAX_RESULTADOS_POR_BUSCA = 15
+MAX_RESULTADOS_POR_BUSCA = 15  # usado só sem paginação
+PAGINAR = True  # segue as próximas páginas até uma sem novidades
+MAX_PAGINAS_POR_BUSCA = 5
+# varredura periódica até o fim dos resultados, sem a parada antecipada: sem
+# ela as buscas param na 1ª página sem novidades e a expiração por execuções
+# nunca vê um anúncio sumir
+VARREDURA_COMPLETA_HORAS = 24
+MAX_PAGINAS_VARREDURA_COMPLETA = 30
+PARAMETRO_PAGINA = "page"
+REQUISICAO_CONDICIONAL = True  # ETag / Last-Modified + hash do conteúdo por URL
 ENVIAR_TELEGRAM = False  # Desabilitar por padrão
+# Alertas de BAIXOU/SUBIU com os últimos preços gravados no Supabase (cache local incremental)
+HISTORICO_NOS_ALERTAS = True
+HISTORICO_LIMITE = 5
+ARQUIVO_HISTORICO_CACHE = os.getenv("HISTORY_CACHE_PATH", "historico_cache.sqlite3")
 BUSCAR_FIPE_APENAS_NOVOS = True
+FIPE_CONSULTAS_PARALELAS = 4
+FIPE_LOTE_PIPELINE = 20  # anúncios por lote no enriquecimento em paralelo com a busca
+FILA_PIPELINE = 500  # novidades aguardando FIPE (cheia = a busca espera)
+TAMANHO_LOTE_DB = 100
+# Oportunidades: depois da FIPE, só as melhores do lote viram alerta/gravação
+FILTRAR_OPORTUNIDADES = True
+OPORTUNIDADES_TOP_N = 20
+DESCONTO_FIPE_MINIMO = 0.05  # 5% abaixo da FIPE
+ZSCORE_MAXIMO = -1.0  # 1 desvio abaixo da média do modelo/ano na memória
+GRAVAR_PONTUACAO_DB = False  # exige as colunas de sql/listings_pontuacao.sql
+GRAVAR_MODELO_DB = False  # exige a coluna model de sql/estatisticas_listings.sql
+INTERVALO_LOTE_DB = 10.0
 TIMEOUT_REQUISICAO = 20
+# Verificação TLS do autocarro (AUTOCARRO_VERIFY_TLS=0 desliga, se o certificado quebrar)
+VERIFICAR_TLS = os.getenv("AUTOCARRO_VERIFY_TLS", "1") != "0"
 
-URL_BASE = "https://m.autocarro.com.br/autobusca/carros?q={query}&ano_de={ano_de}&preco_ate={preco_ate}&cambio=1&estado=43&sort=1"
+# Motor de busca assíncrono (substitui o sleep fixo entre buscas)
+LIMITE_CONCORRENCIA_POR_HOST = 3
+REQUISICOES_POR_SEGUNDO = 2.0
+RAJADA_REQUISICOES = 2
+
+URL_BUSCA = "https://m.autocarro.com.br/autobusca/carros"
+PARAMETROS_BUSCA = {"sort": 1}
 
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN", "")
 TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID", "")
 
-ARQUIVO_MEMORIA = "price_memory.json"
+ARQUIVO_MEMORIA = os.getenv("PRICE_MEMORY_PATH", "price_memory.sqlite3")
+ARQUIVO_MEMORIA_LEGADO = "price_memory.json"  # importado na primeira execução
+
+# Retenção: anúncios não vistos há N dias / N execuções saem da memória
+RETENCAO_DIAS = 30
+RETENCAO_EXECUCOES = None
+REGISTRAR_REMOVIDOS = True  # marca os expirados como REMOVIDO no Supabase
+
+# Modo daemon (python autocarro.py --daemon): cada watchlist tem intervalo
+# próprio, mais curto quando aparecem NOVO/BAIXOU e mais longo quando quieta
+INTERVALO_INICIAL = 30 * 60
+INTERVALO_MINIMO = 10 * 60
+INTERVALO_MAXIMO = 4 * 60 * 60
+REQUISICOES_POR_MINUTO = 20  # orçamento global no autocarro.com.br
+STATUS_EVENTO = (STATUS_NOVO, STATUS_BAIXOU)
+
+if not VERIFICAR_TLS:
+    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+# Instrumentação: relatório JSON de cada execução e, opcionalmente,
+# métricas no formato texto do Prometheus (ex: textfile collector)
+RELATORIO_EXECUCAO = os.getenv("RUN_REPORT_PATH", "run_report.json")
+METRICAS_PROMETHEUS = os.getenv("PROMETHEUS_METRICS_PATH")
 
 
 def carregar_memoria():
-    if os.path.exists(ARQUIVO_MEMORIA):
-        try:
-            with open(ARQUIVO_MEMORIA, 'r') as f:
-                return json.load(f)
-        except:
-            return {}
-    return {}
+    with metricas.medir('inicializacao', servico='memoria'):
+        return MemoriaPrecos(ARQUIVO_MEMORIA, importar_json=ARQUIVO_MEMORIA_LEGADO)
 
 
-def salvar_memoria(dados):
-    with open(ARQUIVO_MEMORIA, 'w') as f:
-        json.dump(dados, f, indent=4)
+def carregar_banco():
+    """Supabase criado só quando a primeira novidade precisar ser gravada"""
+    return SupabasePreguicoso(DatabaseService)
 
 
-def limpar_preco(preco_str):
+def _ranqueador_oportunidades():
+    """ranquear_oportunidades (importa o NumPy), ou None se o NumPy não estiver instalado"""
     try:
-        limpo = preco_str.replace('R$', '').replace(
-            '.', '').replace(',', '.').strip()
-        return float(limpo)
-    except:
-        return 0.0
+        from services.oportunidades import ranquear_oportunidades
+    except ImportError:  # todas as novidades seguem adiante
+        return None
+    return ranquear_oportunidades
+
+
+def salvar_memoria(memoria):
+    return memoria.salvar()
+
+
+HEADERS_BUSCA = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+}
+
+
+def _opcoes_motor():
+    return {
+        'limite_por_host': LIMITE_CONCORRENCIA_POR_HOST,
+        'taxa_por_segundo': REQUISICOES_POR_SEGUNDO,
+        'rajada': RAJADA_REQUISICOES,
+        'timeout': TIMEOUT_REQUISICAO,
+        'verify': VERIFICAR_TLS,
+    }
+
 
+def extrair_pagina(conteudo, memoria, nova_memoria, limite=None, processados=None, origem=None,
+                   url=None):
+    """
+    Lê o __NEXT_DATA__ da página e retorna (novidades, qtd_itens): os anúncios
+    novos ou com preço alterado (atualizando nova_memoria) e quantos anúncios
+    a página trazia (0 = fim dos resultados).
+    limite: máximo de anúncios lidos da página (None = todos)
+    processados / origem: deduplicação entre buscas (ver comparar_ofertas)
+    url: registra na memória os anúncios da página (usado pela expiração)
+    """
+    novidades = []
+    qtd_itens = 0
 
-def buscar_veiculos(url, headers, db, memoria, nova_memoria):
-    """Busca veículos de uma URL e processa os resultados"""
-    msgs_para_enviar = []
-    
     try:
-        response = requests.get(url, headers=headers, timeout=TIMEOUT_REQUISICAO, verify=False)
-        response.raise_for_status()
-    except requests.exceptions.RequestException as e:
-        print(f"    ❌ Erro: {e}")
-        return msgs_para_enviar
+        data_json = extrair_next_data(conteudo)
+        if not data_json:
+            return novidades, qtd_itens
 
-    soup = BeautifulSoup(response.content, 'html.parser')
-    script_tag = soup.find('script', id='__NEXT_DATA__')
+        lista_bruta = ler_ofertas(data_json, limite)
+        qtd_itens = len(lista_bruta)
+        novidades, car_ids = comparar_ofertas(lista_bruta, memoria, nova_memoria, processados, origem)
+        if url:
+            nova_memoria.registrar_pagina(url, car_ids=car_ids)
 
-    if not script_tag:
-        return msgs_para_enviar
+    except json.JSONDecodeError as e:
+        print(f"    ❌ Erro JSON: {e}")
+    except Exception as e:
+        print(f"    ❌ Erro: {e}")
+
+    return novidades, qtd_itens
+
+
+def extrair_resultado(resultado, memoria, nova_memoria, limite=None, processados=None, origem=None):
+    """
+    Versão incremental de extrair_pagina para respostas do MotorBusca.
+    Pula decodificação, diff e FIPE quando a página não mudou desde a última
+    execução: resposta 304, mesmo hash do __NEXT_DATA__ ou mesmos itens.
+    Marca resultado['inalterada'] e retorna (novidades, qtd_itens).
+    """
+    url = resultado['url']
+    anterior = memoria.obter_pagina(url)
+    resultado['inalterada'] = False
+
+    def _inalterada():
+        # os anúncios continuam no ar mesmo sem reprocessar a página
+        for car_id in anterior['car_ids']:
+            nova_memoria.marcar_visto(car_id)
+            if processados is not None:
+                processados.setdefault(car_id, set()).add(origem)
+        resultado['inalterada'] = True
+        return [], len(anterior['car_ids'])
+
+    if resultado['nao_modificado']:
+        return _inalterada() if anterior else ([], 0)
+
+    conteudo = resultado['conteudo']
+    bruto = fatiar_next_data(conteudo)
+    hash_bruto = hashlib.sha1(bruto).hexdigest() if bruto is not None else None
+    if anterior and hash_bruto and anterior['hash_bruto'] == hash_bruto:
+        return _inalterada()
 
     try:
-        data_json = json.loads(script_tag.string)
-        page_props = data_json.get('props', {}).get('pageProps', {})
-        offers = page_props.get('offers', {})
-        lista_bruta = offers.get('items', [])
-        
-        lista_bruta = lista_bruta[:MAX_RESULTADOS_POR_BUSCA]
-        
-        if not lista_bruta:
-            return msgs_para_enviar
-
-        for carro in lista_bruta:
-            version = carro.get('version', '').upper()
-            model = carro.get('model', '').upper()
-            nome_completo = f"{model} {version}".strip()
-
-            if 'SEDAN' in nome_completo:
-                continue
-
-            link = carro.get('link')
-            car_id = str(carro.get('id', link))
-            preco_visual = carro.get('priceCurrency', 'R$ 0')
-            preco_float = limpar_preco(preco_visual)
-            preco_antigo = memoria.get(car_id)
-
-            # Determinar status
-            if car_id not in memoria:
-                status_aviso = "🆕 NOVO"
-                nova_memoria[car_id] = preco_float
-            elif preco_float != preco_antigo:
-                diferenca = preco_float - preco_antigo
-                status_aviso = "📉 BAIXOU" if diferenca < 0 else "📈 SUBIU"
-                nova_memoria[car_id] = preco_float
-            else:
-                continue  # Ignorar preço mantido
-
-            year_model = carro.get('yearModel')
-            
-            # Buscar FIPE
-            fipe_info = None
-            if BUSCAR_FIPE_APENAS_NOVOS:
-                try:
-                    fipe_info = obter_valor_fipe(model, version, year_model)
-                except Exception:
-                    pass
-
-            fipe_text = None
-            fipe_fonte = None
-            marca = None
-            modelo_fipe = None
-            ano_fipe = None
-            
-            if fipe_info and isinstance(fipe_info, dict):
-                fipe_text = fipe_info.get('valor')
-                fipe_fonte = fipe_info.get('fonte')
-                marca = fipe_info.get('marca')
-                modelo_fipe = fipe_info.get('modelo_fipe')
-                ano_fipe = fipe_info.get('ano_nome')
-
-            msg = (
-                f"{status_aviso} - {nome_completo}\n"
-                f"💰 {preco_visual} | 📅 {year_model}\n"
-                f"💸 FIPE: {fipe_text or 'N/D'}\n"
-                f"🔗 {link}"
+        data_json = extrair_next_data(conteudo)
+        if not data_json:
+            return [], 0
+
+        lista_bruta = ler_ofertas(data_json, limite)
+        hash_itens = hashlib.sha1(
+            json.dumps(lista_bruta, sort_keys=True).encode('utf-8')
+        ).hexdigest()
+
+        if anterior and anterior['hash_itens'] == hash_itens:
+            car_ids = anterior['car_ids']
+            novidades, qtd_itens = _inalterada()
+        else:
+            novidades, car_ids = comparar_ofertas(
+                lista_bruta, memoria, nova_memoria, processados, origem
             )
-            msgs_para_enviar.append(msg)
-
-            # Salvar no BD
-            dados_anuncio = {
-                'car_id': car_id,
-                'full_name': nome_completo,
-                'price_display': preco_visual,
-                'price_numeric': preco_float,
-                'model_year': year_model,
-                'fipe_value': fipe_text,
-                'fipe_source': fipe_fonte,
-                'brand': marca,
-                'fipe_model': modelo_fipe,
-                'fipe_year': ano_fipe,
-                'city_name': 'Brasil',
-                'listing_url': link,
-                'status': status_aviso,
-                'listing_date': datetime.now()
-            }
-            db.salvar_anuncio(dados_anuncio)
+            qtd_itens = len(lista_bruta)
+
+        memoria.registrar_pagina(
+            url, resultado['etag'], resultado['last_modified'], hash_bruto, hash_itens, car_ids
+        )
+        return novidades, qtd_itens
 
     except json.JSONDecodeError as e:
         print(f"    ❌ Erro JSON: {e}")
     except Exception as e:
         print(f"    ❌ Erro: {e}")
-    
-    return msgs_para_enviar
+    return [], 0
+
+
+def comparar_ofertas(lista_bruta, memoria, nova_memoria, processados=None, origem=None):
+    """
+    Compara os anúncios com a memória de preços.
+    Retorna (novidades, car_ids): novidades como Listing e car_ids de todos
+    os anúncios considerados.
+    processados: dict opcional car_id -> buscas (origem) em que o anúncio
+    apareceu nesta execução; anúncios já processados por outra busca só
+    têm a origem registrada.
+    """
+    car_ids = []
+    listings = normalizar(lista_bruta)
+    if processados is not None:
+        listings = deduplicar(listings, processados, origem, car_ids)
+    listings = comparar(sem_sedan(listings), memoria, nova_memoria, car_ids)
+    return list(listings), car_ids
+
+
+def distribuir_novidades(novidades, processados, buscas, watchlists):
+    """
+    Aplica localmente as faixas de ano/preço e marca em cada novidade as
+    watchlists que a recebem ('watchlists'). Novidades fora de todas as
+    faixas são descartadas (o preço continua gravado na memória).
+    Retorna (novidades_roteadas, {watchlist: quantidade}).
+    """
+    roteadas = []
+    por_watchlist = {w['nome']: 0 for w in watchlists}
+    for novidade in novidades:
+        nomes = rotear(novidade, processados.get(novidade.car_id, ()), buscas, watchlists)
+        if not nomes:
+            continue
+        novidade.watchlists = nomes
+        roteadas.append(novidade)
+        for nome in nomes:
+            por_watchlist[nome] += 1
+            metricas.contar('novidades_watchlist', watchlist=nome)
+    return roteadas, {nome: qtd for nome, qtd in por_watchlist.items() if qtd}
+
+
+def _resolver_fipe(consultas):
+    """resolver_fipe_em_lote sem deixar uma falha derrubar o pipeline"""
+    try:
+        return resolver_fipe_em_lote(consultas, max_workers=FIPE_CONSULTAS_PARALELAS)
+    except Exception:
+        return [None] * len(consultas), {}
+
+
+def estagio_fipe(estatisticas=None, tamanho_lote=FIPE_LOTE_PIPELINE):
+    """Estágio de enriquecimento FIPE (repassa sem consultar se BUSCAR_FIPE_APENAS_NOVOS=False)"""
+    if not BUSCAR_FIPE_APENAS_NOVOS:
+        return lambda listings: listings
+    return partial(enriquecer, resolver=_resolver_fipe, tamanho_lote=tamanho_lote, estatisticas=estatisticas)
+
+
+def historicos_alertas(db, novidades):
+    """
+    Últimos preços no Supabase dos anúncios que mudaram de preço, lidos pelo
+    CacheHistorico (só o que mudou desde a última leitura vai ao banco).
+    Retorna {car_id: [(created_at, price_numeric, status), ...]}.
+    """
+    car_ids = [str(n.car_id) for n in novidades if n.status_aviso in (STATUS_BAIXOU, STATUS_SUBIU)]
+    if not car_ids:
+        return {}
+    cache = CacheHistorico(ARQUIVO_HISTORICO_CACHE)
+    try:
+        with metricas.etapa('historico'):
+            return cache.obter(db, car_ids, HISTORICO_LIMITE)
+    except Exception as e:
+        print(f"⚠️ Histórico de preços indisponível: {e}")
+        return {}
+    finally:
+        cache.fechar()
+
+
+def _formatar_preco(preco):
+    return f"R$ {float(preco):,.0f}".replace(',', '.')
+
+
+def montar_mensagem(novidade, historico=None):
+    """historico: [(created_at, price_numeric, status), ...] do mais recente ao mais antigo"""
+    fipe_info = novidade.fipe if isinstance(novidade.fipe, dict) else {}
+    fipe_text = fipe_info.get('valor')
+
+    desconto = novidade.desconto_fipe
+    if desconto is not None:
+        fipe_text_msg = f"{fipe_text} ({abs(desconto):.0%} {'abaixo' if desconto >= 0 else 'acima'})"
+    else:
+        fipe_text_msg = fipe_text or 'N/D'
+
+    precos = [_formatar_preco(preco) for _, preco, _ in reversed(historico or []) if preco]
+    return (
+        (f"🎯 {', '.join(novidade.watchlists)}\n" if novidade.watchlists else "")
+        + f"{novidade.status_aviso} - {novidade.nome_completo}\n"
+        f"💰 {novidade.preco_visual} | 📅 {novidade.year_model}\n"
+        f"💸 FIPE: {fipe_text_msg}\n"
+        + (f"📊 Histórico: {' → '.join(precos)}\n" if precos else "")
+        + f"🔗 {novidade.link}"
+    )
+
+
+def registrar_novidades(novidades, buffer, historicos=None):
+    """
+    Grava as novidades pelo buffer e monta as mensagens só das que chegaram
+    ao banco (as que falharam voltam na próxima varredura e alertam lá)
+    """
+    historicos = historicos or {}
+    enviadas = list(gravar(novidades, buffer, pontuacao=GRAVAR_PONTUACAO_DB, modelo=GRAVAR_MODELO_DB))
+    buffer.descarregar()
+    falhas = {str(r['car_id']) for r in buffer.resultados if not r['ok']}
+    return [
+        montar_mensagem(novidade, historicos.get(str(novidade.car_id)))
+        for novidade in enviadas if str(novidade.car_id) not in falhas
+    ]
 
 
 def main():
+    watchlists = carregar_watchlists(ARQUIVO_WATCHLISTS, VEICULOS_POPULARES, WATCHLIST_PADROES)
+    buscas = planejar(watchlists, URL_BUSCA, PARAMETROS_BUSCA)
+
     print("\n" + "="*60)
     print("🚗 Autocarro - GitHub Actions (Otimizado)")
-    print(f"📊 Veículos: {len(VEICULOS_POPULARES)}")
+    print(f"📊 Watchlists: {len(watchlists)} → {len(buscas)} buscas")
     print("="*60 + "\n")
 
-    try:
-        db = DatabaseService()
-    except Exception as e:
-        print(f"❌ Erro Supabase: {e}")
-        return
-
+    db = carregar_banco()
     memoria = carregar_memoria()
-    nova_memoria = memoria.copy()
-
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+    executar_ciclo(db, memoria, buscas, watchlists)
+    salvar_relatorio()
+
+
+def executar_ciclo(db, memoria, buscas, watchlists, retencao_execucoes=RETENCAO_EXECUCOES,
+                   sessao=None):
+    """
+    Uma varredura completa das buscas: download, diff com a memória, FIPE,
+    pontuação, gravação e alertas.
+    sessao: SessaoBusca reaproveitada entre ciclos (sem ela, o motor de busca
+    é criado e fechado dentro do ciclo).
+    Retorna {'requisicoes', 'paginas' (por busca), 'eventos' (NOVO/BAIXOU por watchlist)}.
+    """
+    # leituras veem o estado anterior; as alterações só vão ao disco no salvar
+    nova_memoria = memoria
+
+    urls = [busca['url'] for busca in buscas]
+    nomes_buscas = [nome_busca(busca) for busca in buscas]
+
+    limite = None if PAGINAR else MAX_RESULTADOS_POR_BUSCA
+    novidades_por_busca = [0] * len(urls)
+    # car_id -> buscas em que apareceu: cada anúncio é processado uma vez por execução
+    processados = {}
+
+    # parse e diff rodam a cada página; as novidades seguem por uma fila para
+    # a FIPE numa thread própria enquanto a busca continua baixando
+    stats_lote = {}
+    enriquecimento = EstagioParalelo(
+        cronometrar('fipe', estagio_fipe(stats_lote)), FILA_PIPELINE, nome='enriquecimento'
+    )
+    # fora das faixas das watchlists da busca de origem: só vão à FIPE se o
+    # roteamento final (com todas as buscas) as aceitar
+    adiadas = set()
+    # buscas lidas até a última página (página vazia ou menor que a primeira):
+    # só nelas a ausência de um anúncio indica que ele saiu do ar
+    itens_primeira_pagina = {}
+    completas = set()
+    enviadas = []
+    # buscas sem varredura completa há VARREDURA_COMPLETA_HORAS: ignoram a parada antecipada
+    agora = time.time()
+    profundas = {
+        indice for indice, url in enumerate(urls)
+        if PAGINAR and agora - memoria.ultima_varredura_completa(url) >= VARREDURA_COMPLETA_HORAS * 3600
     }
 
-    todas_msgs = []
-    total_processados = 0
+    async def continuar(indice, pagina, resultado):
+        antes = len(processados)
+        with metricas.etapa('parse', busca=nomes_buscas[indice], pagina=pagina):
+            if REQUISICAO_CONDICIONAL:
+                novidades, qtd_itens = extrair_resultado(
+                    resultado, memoria, nova_memoria, limite, processados, indice
+                )
+            else:
+                novidades, qtd_itens = extrair_pagina(
+                    resultado['conteudo'], memoria, nova_memoria, limite, processados, indice,
+                    url=resultado['url']
+                )
+        if not qtd_itens or qtd_itens < itens_primeira_pagina.setdefault(indice, qtd_itens):
+            completas.add(indice)
+        novidades_por_busca[indice] += len(novidades)
+        watchlists_busca = [watchlists[w] for w in buscas[indice]['watchlists']]
+        for novidade in novidades:
+            if aceita_alguma(watchlists_busca, novidade):
+                enviadas.append(novidade.car_id)
+                await enriquecimento.enviar_async(novidade)
+            else:
+                adiadas.add(novidade)
+        if indice in profundas:
+            return qtd_itens > 0
+        if pagina >= MAX_PAGINAS_POR_BUSCA:
+            return False
+        # resultados ordenados (sort=1): página sem novidades = resto já conhecido;
+        # anúncios já processados por outra busca não dizem nada sobre o resto
+        repetidos = qtd_itens - (len(processados) - antes)
+        return qtd_itens > 0 and (len(novidades) > 0 or repetidos > 0)
+
+    if not PAGINAR:
+        max_paginas = 1
+    elif profundas:
+        max_paginas = max(MAX_PAGINAS_POR_BUSCA, MAX_PAGINAS_VARREDURA_COMPLETA)
+    else:
+        max_paginas = MAX_PAGINAS_POR_BUSCA
+
+    # Baixa todas as buscas em paralelo (pool compartilhado + token bucket)
+    with metricas.etapa('busca'):
+        paginas_por_busca, tempos = buscar_paginado(
+            urls, HEADERS_BUSCA, continuar,
+            max_paginas=max_paginas,
+            parametro=PARAMETRO_PAGINA,
+            condicional=memoria.obter_pagina if REQUISICAO_CONDICIONAL else None,
+            sessao=sessao,
+            **_opcoes_motor()
+        )
 
-    for idx, veiculo in enumerate(VEICULOS_POPULARES, 1):
-        print(f"  [{idx}/{len(VEICULOS_POPULARES)}] {veiculo['nome']:12}", end=" ")
-        
-        url = URL_BASE.format(
-            query=veiculo['query'],
-            ano_de=veiculo['ano_de'],
-            preco_ate=veiculo['preco_ate']
+    # a FIPE termina o que ainda estava na fila; um erro no estágio não derruba
+    # o ciclo (nem o daemon): as novidades enviadas a ele voltam na próxima varredura
+    with metricas.etapa('fipe'):
+        try:
+            todas_novidades = enriquecimento.fechar()
+        except Exception as e:
+            print(f"❌ Erro no enriquecimento FIPE: {e}")
+            nova_memoria.descartar(enviadas)
+            todas_novidades = []
+
+    for idx, (nome, paginas, novidades) in enumerate(
+            zip(nomes_buscas, paginas_por_busca, novidades_por_busca), 1):
+        print(f"  [{idx}/{len(buscas)}] {nome:18}", end=" ")
+        for pagina in paginas:
+            metricas.registrar_tempo('http_busca', pagina.get('duracao', 0.0), busca=nome)
+        metricas.contar('paginas', len(paginas), busca=nome)
+
+        erro = paginas[-1]['erro']
+        if erro and len(paginas) == 1:
+            print(f"❌ Erro: {erro}")
+            continue
+
+        status = f"✓ {novidades} novidades" if novidades else "⚪ sem novidades"
+        inalteradas = sum(1 for p in paginas if p.get('inalterada'))
+        metricas.contar('novidades', novidades, busca=nome)
+        metricas.contar('paginas_inalteradas', inalteradas, busca=nome)
+        print(
+            f"{status} ({len(paginas)} pág."
+            + (f", {inalteradas} inalteradas" if inalteradas else "")
+            + (", varredura completa" if idx - 1 in profundas else "") + ")"
+            + (f" ⚠ {erro}" if erro else "")
+        )
+    # sem erro, a próxima varredura completa da busca fica para daqui a VARREDURA_COMPLETA_HORAS
+    nova_memoria.registrar_varredura_completa(
+        urls[indice] for indice in profundas if not paginas_por_busca[indice][-1]['erro']
+    )
+
+    todas_novidades, por_watchlist = distribuir_novidades(
+        todas_novidades + list(adiadas), processados, buscas, watchlists
+    )
+    atrasadas = [novidade for novidade in todas_novidades if novidade in adiadas]
+    if atrasadas:
+        list(estagio_fipe(stats_lote)(atrasadas))
+    if por_watchlist:
+        print("🎯 " + " | ".join(f"{nome}: {qtd}" for nome, qtd in por_watchlist.items()))
+
+    eventos = {}
+    for novidade in todas_novidades:
+        if novidade.status_aviso in STATUS_EVENTO:
+            for nome in novidade.watchlists:
+                eventos[nome] = eventos.get(nome, 0) + 1
+
+    print(
+        f"\n⏱ {tempos['requisicoes']} requisições em {tempos['parede']:.2f}s "
+        f"(média {tempos['media']:.2f}s, máx {tempos['maximo']:.2f}s, "
+        f"soma sequencial {tempos['total']:.2f}s)"
+    )
+
+    # FIPE em lotes: consultas idênticas (modelo, versão, ano) viram uma só
+    if stats_lote.get('consultas'):
+        print(
+            f"🔎 FIPE: {stats_lote['unicas']} consultas únicas para "
+            f"{stats_lote['consultas']} anúncios ({stats_lote['economizadas']} economizadas)"
         )
-        
-        msgs = buscar_veiculos(url, headers, db, memoria, nova_memoria)
-        total_processados += len(msgs)
-        todas_msgs.extend(msgs)
-        
-        status = f"✓ {len(msgs)} novidades" if msgs else "⚪ sem novidades"
-        print(status)
-        
-        if idx < len(VEICULOS_POPULARES):
-            time.sleep(1)
 
-    salvar_memoria(nova_memoria)
+    ranquear_oportunidades = _ranqueador_oportunidades() if FILTRAR_OPORTUNIDADES and todas_novidades else None
+    if ranquear_oportunidades is not None:
+        total_novidades = len(todas_novidades)
+        with metricas.etapa('pontuacao'):
+            todas_novidades, _ = ranquear_oportunidades(
+                todas_novidades, [novidade.fipe for novidade in todas_novidades],
+                memoria.estatisticas_modelos(),
+                top_n=OPORTUNIDADES_TOP_N,
+                desconto_minimo=DESCONTO_FIPE_MINIMO,
+                zscore_maximo=ZSCORE_MAXIMO,
+            )
+        metricas.contar('oportunidades', len(todas_novidades))
+        print(f"🏷 Oportunidades: {len(todas_novidades)} de {total_novidades} novidades selecionadas")
+
+    # preços anteriores no banco, lidos antes de gravar os desta execução
+    historicos = historicos_alertas(db, todas_novidades) if ENVIAR_TELEGRAM and HISTORICO_NOS_ALERTAS else {}
+    with metricas.etapa('bd'):
+        buffer = BufferAnuncios(db, TAMANHO_LOTE_DB, INTERVALO_LOTE_DB)
+        todas_msgs = registrar_novidades(todas_novidades, buffer, historicos)
+    total_processados = len(todas_msgs)
+
+    falhas = [r['car_id'] for r in buffer.resultados if not r['ok']]
+    print(
+        f"🗄 BD: {len(buffer.resultados)} anúncios em {buffer.lotes_enviados} lotes"
+        + (f" ({len(falhas)} falhas; ficam fora da memória para nova tentativa)" if falhas else "")
+    )
+    # o que não chegou ao banco não pode constar como já visto na memória
+    nova_memoria.descartar(falhas)
+
+    # com a paginação interrompida, anúncios das páginas não lidas continuam
+    # no ar: por execuções só expiram os vistos por último nas páginas das
+    # buscas completas (o limite em dias vale para todos)
+    paginas_lidas = {
+        pagina['url'] for indice in completas for pagina in paginas_por_busca[indice]
+        if not pagina['erro']
+    }
+    with metricas.etapa('memoria'):
+        gravadas = salvar_memoria(nova_memoria)
+        removidos = memoria.expirar(RETENCAO_DIAS, retencao_execucoes, paginas=paginas_lidas)
+    parcial = retencao_execucoes is not None and len(completas) < len(buscas)
+    print(
+        f"🧠 Memória: {gravadas} preços gravados, {len(removidos)} expirados "
+        f"({len(memoria)} anúncios monitorados"
+        + (f"; expiração só em {len(completas)}/{len(buscas)} buscas lidas até o fim" if parcial else "")
+        + ")"
+    )
+    if removidos and REGISTRAR_REMOVIDOS:
+        try:
+            with metricas.etapa('bd_removidos'):
+                db.marcar_removidos(car_id for car_id, _ in removidos)
+        except Exception as e:
+            print(f"⚠️ Removidos não marcados no Supabase: {e}")
+    with metricas.etapa('cache_fipe'):
+        salvar_cache()
+
+    stats_fipe = obter_cache().estatisticas()
+    metricas.definir('fipe_cache_taxa_acerto', stats_fipe['taxa_acerto'])
+    for nivel, valores in stats_fipe['por_nivel'].items():
+        metricas.definir('fipe_cache_hits', valores['hits'], nivel=nivel)
+        metricas.definir('fipe_cache_misses', valores['misses'], nivel=nivel)
+    print(
+        f"💾 Cache FIPE: {stats_fipe['hits']} hits / {stats_fipe['misses']} misses "
+        f"({stats_fipe['taxa_acerto']:.0%})"
+    )
+    tabela_fipe = obter_tabela()
+    if tabela_fipe is not None:
+        print(
+            f"📚 Tabela FIPE offline: {tabela_fipe.referencia or 'sem referência'}"
+            + ("" if tabela_fipe.vigente else " (desatualizada, ignorada até reimportar: python -m services.fipe_tabela)")
+        )
 
     print("\n" + "="*60)
     print(f"✅ CONCLUÍDO: {total_processados} anúncios relevantes")
@@ -226,19 +612,153 @@ def main():
         agora_formatada = fuso_brasil.strftime("%d/%m %H:%M")
 
         try:
-            enviar_telegram(
-                f"🏁 Relatório: {agora_formatada}\n✅ Total: {len(todas_msgs)} anúncios",
-                TELEGRAM_TOKEN, TELEGRAM_CHAT_ID
+            with metricas.etapa('telegram'):
+                resumo = enviar_telegram_em_lote(
+                    todas_msgs, TELEGRAM_TOKEN, TELEGRAM_CHAT_ID,
+                    cabecalho=f"🏁 Relatório: {agora_formatada}\n✅ Total: {len(todas_msgs)} anúncios"
+                )
+            print(
+                f"✅ {resumo['alertas']} alertas em {resumo['enviadas']}/{resumo['mensagens']} mensagens"
+                + (f" ({resumo['falhas']} falhas)" if resumo['falhas'] else "") + "\n"
             )
-
-            for m in todas_msgs:
-                enviar_telegram(m, TELEGRAM_TOKEN, TELEGRAM_CHAT_ID)
-                time.sleep(0.5)
-            
-            print("✅ Notificações enviadas!\n")
         except Exception as e:
             print(f"⚠️ Erro ao enviar Telegram: {e}\n")
 
+    return {
+        'requisicoes': tempos['requisicoes'],
+        'paginas': [len(paginas) for paginas in paginas_por_busca],
+        'eventos': eventos,
+    }
+
+
+def selecionar_buscas(buscas, watchlists, agendador, orcamento, paginas_estimadas):
+    """
+    Índices das buscas do próximo ciclo: as que atendem alguma watchlist
+    vencida, da mais atrasada para a menos, enquanto couberem no orçamento
+    (estimado pelas páginas que cada busca usou no último ciclo).
+    """
+    vencidas = agendador.vencidas()
+    atrasos = {}
+    for indice, busca in enumerate(buscas):
+        nomes = [watchlists[w]['nome'] for w in busca['watchlists']]
+        if any(nome in vencidas for nome in nomes):
+            atrasos[indice] = max(agendador.atraso(nome) for nome in nomes)
+
+    selecionadas = []
+    custo = 0
+    disponivel = orcamento.disponivel()
+    for indice in sorted(atrasos, key=atrasos.get, reverse=True):
+        # uma busca maior que o orçamento inteiro ainda precisa poder rodar
+        custo_busca = min(paginas_estimadas[indice], orcamento.por_minuto)
+        if custo + custo_busca > disponivel:
+            break
+        selecionadas.append(indice)
+        custo += custo_busca
+    return selecionadas, [indice for indice in atrasos if indice not in selecionadas]
+
+
+def executar_daemon():
+    """
+    Varreduras contínuas num único processo: cliente Supabase, memória,
+    cache/tabela FIPE e sessões HTTP ficam abertos entre os ciclos.
+    Encerra com SIGINT/SIGTERM ao fim do ciclo em andamento.
+    """
+    watchlists = carregar_watchlists(ARQUIVO_WATCHLISTS, VEICULOS_POPULARES, WATCHLIST_PADROES)
+    buscas = planejar(watchlists, URL_BUSCA, PARAMETROS_BUSCA)
+
+    print("\n" + "="*60)
+    print("🚗 Autocarro - modo daemon")
+    print(f"📊 Watchlists: {len(watchlists)} → {len(buscas)} buscas | {REQUISICOES_POR_MINUTO} req/min")
+    print("="*60 + "\n")
+
+    db = carregar_banco()
+    memoria = carregar_memoria()
+    agendador = Agendador(
+        [w['nome'] for w in watchlists], INTERVALO_INICIAL, INTERVALO_MINIMO, INTERVALO_MAXIMO
+    )
+    orcamento = OrcamentoRequisicoes(REQUISICOES_POR_MINUTO)
+    paginas_estimadas = [1] * len(buscas)
+    sessao = SessaoBusca(HEADERS_BUSCA, **_opcoes_motor())
+
+    parar = threading.Event()
+    for sinal in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sinal, lambda *_: parar.set())
+
+    ciclo = 0
+    while not parar.is_set():
+        selecionadas, adiadas = selecionar_buscas(
+            buscas, watchlists, agendador, orcamento, paginas_estimadas
+        )
+        if not selecionadas:
+            if adiadas:
+                espera = orcamento.espera(min(paginas_estimadas[i] for i in adiadas))
+            else:
+                espera = agendador.espera()
+            parar.wait(max(espera, 1.0))
+            continue
+
+        ciclo += 1
+        if ciclo > 1:
+            memoria.nova_execucao()
+        metricas.reiniciar()
+        nomes = sorted({watchlists[w]['nome'] for i in selecionadas for w in buscas[i]['watchlists']})
+        print(f"\n🔁 Ciclo {ciclo}: {', '.join(nomes)}" + (f" ({len(adiadas)} buscas adiadas)" if adiadas else ""))
+
+        # a retenção por número de execuções não faz sentido com buscas em ritmos diferentes
+        resultado = executar_ciclo(
+            db, memoria, [buscas[i] for i in selecionadas], watchlists, None, sessao
+        )
+        orcamento.consumir(resultado['requisicoes'])
+        for indice, paginas in zip(selecionadas, resultado['paginas']):
+            paginas_estimadas[indice] = max(1, paginas)
+        for nome in nomes:
+            eventos = resultado['eventos'].get(nome, 0)
+            intervalo = agendador.registrar(nome, eventos)
+            metricas.definir('daemon_intervalo_segundos', intervalo, watchlist=nome)
+        print("⏰ Próximas: " + " | ".join(
+            f"{nome} {agendador.intervalos[nome] / 60:.0f}min" for nome in nomes
+        ))
+        salvar_relatorio()
+
+    print("⏹ Daemon encerrado")
+    sessao.fechar()
+    memoria.fechar()
+    salvar_cache()
+
+
+def tempos_inicializacao():
+    """[(serviço, segundos)] dos serviços inicializados nesta execução"""
+    return [
+        (tempo['rotulos'].get('servico', '?'), tempo['total'])
+        for tempo in metricas.relatorio()['tempos'] if tempo['nome'] == 'inicializacao'
+    ]
+
+
+def salvar_relatorio():
+    """Grava o relatório de instrumentação da execução (JSON e Prometheus)"""
+    metricas.definir('next_data_extracoes', next_data.estatisticas['rapido'], caminho='rapido')
+    metricas.definir('next_data_extracoes', next_data.estatisticas['fallback'], caminho='fallback')
+
+    etapas = metricas.resumo_etapas()
+    if etapas:
+        print("📈 Etapas: " + " | ".join(f"{nome} {duracao:.2f}s" for nome, duracao in etapas))
+    try:
+        metricas.salvar(RELATORIO_EXECUCAO, METRICAS_PROMETHEUS)
+        print(f"📈 Relatório da execução salvo em {RELATORIO_EXECUCAO}")
+    except OSError as e:
+        print(f"⚠️ Erro ao salvar relatório da execução: {e}")
+
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Sniper de carros do autocarro.com.br", allow_abbrev=False)
+    parser.add_argument('--daemon', action='store_true',
+                        help='varreduras contínuas com intervalo adaptativo por watchlist')
+    parser.add_argument('--profile-startup', action='store_true',
+                        help='mostra o tempo de import e de inicialização de cada módulo/serviço')
+    args = parser.parse_args()
+    if args.daemon:
+        executar_daemon()
+    else:
+        main()
+    if args.profile_startup:
+        perfil_inicio.imprimir(tempos_inicializacao())
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark: extração do __NEXT_DATA__ por fatiamento de bytes
+versus a árvore completa do BeautifulSoup, sobre as páginas em fixtures/.
+
+Uso: python benchmarks/bench_next_data.py [repeticoes]
+"""
+
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from services.next_data import _extrair_com_bs4, fatiar_next_data  # noqa: E402
+
+FIXTURES = Path(__file__).resolve().parent / 'fixtures'
+
+
+def extrair_rapido(conteudo):
+    return json.loads(fatiar_next_data(conteudo))
+
+
+def medir(funcao, conteudo, repeticoes):
+    funcao(conteudo)  # aquecimento
+
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        funcao(conteudo)
+    por_pagina = (time.perf_counter() - inicio) / repeticoes
+
+    tracemalloc.start()
+    funcao(conteudo)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return por_pagina, pico
+
+
+def main():
+    repeticoes = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    paginas = sorted(FIXTURES.glob('*.html'))
+    if not paginas:
+        print("❌ Nenhuma fixture encontrada. Rode benchmarks/gerar_fixtures.py")
+        return
+
+    print(f"{'página':28} {'KB':>6} {'bs4 ms':>8} {'bytes ms':>9} {'ganho':>7} {'pico bs4':>9} {'pico bytes':>10}")
+    for pagina in paginas:
+        conteudo = pagina.read_bytes()
+        assert extrair_rapido(conteudo) == _extrair_com_bs4(conteudo), pagina.name
+
+        t_bs4, mem_bs4 = medir(_extrair_com_bs4, conteudo, repeticoes)
+        t_rapido, mem_rapido = medir(extrair_rapido, conteudo, repeticoes)
+        print(
+            f"{pagina.name:28} {len(conteudo) / 1024:6.0f} "
+            f"{t_bs4 * 1000:8.2f} {t_rapido * 1000:9.3f} {t_bs4 / t_rapido:6.0f}x "
+            f"{mem_bs4 / 1024:8.0f}K {mem_rapido / 1024:9.0f}K"
+        )
+
+
+if __name__ == "__main__":
+    main()
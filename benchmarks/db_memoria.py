@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+Substituto em memória do SupabaseService para benchmarks e testes locais.
+Mesma interface pública; cada método conta como uma ida ao banco.
+"""
+
+from datetime import datetime
+
+from services.supabase_service import TAMANHO_LOTE_REMOVIDOS, _eventos_removidos, _montar_registro
+
+
+def _resumir(linhas):
+    precos = [l['price_numeric'] for l in linhas if l['price_numeric'] and l['price_numeric'] > 0]
+    return {
+        'total_anuncios': len({l['car_id'] for l in linhas}),
+        'total_registros': len(linhas),
+        'preco_medio': sum(precos) / len(precos) if precos else 0,
+        'preco_minimo': min(precos) if precos else 0,
+        'preco_maximo': max(precos) if precos else 0,
+    }
+
+
+class SupabaseEmMemoria:
+    def __init__(self):
+        self.linhas = []
+        self.por_car_id = {}
+        self.round_trips = 0
+
+    def _gravar(self, registro):
+        # como no Supabase: listings só recebe inserções (histórico de preços)
+        agora = datetime.now().isoformat()
+        registro = dict(registro, created_at=agora, updated_at=agora)
+        self.por_car_id.setdefault(registro['car_id'], []).append(len(self.linhas))
+        self.linhas.append(registro)
+
+    def salvar_anuncio(self, dados):
+        self.round_trips += 1
+        self._gravar(_montar_registro(dados))
+        return True
+
+    def salvar_anuncios_em_lote(self, lista_dados):
+        if not lista_dados:
+            return []
+        self.round_trips += 1
+        registros = [_montar_registro(dados) for dados in lista_dados]
+        for registro in registros:
+            self._gravar(registro)
+        return [{'car_id': r['car_id'], 'ok': True, 'erro': None} for r in registros]
+
+    def marcar_removidos(self, car_ids, status='🗑 REMOVIDO'):
+        car_ids = list(dict.fromkeys(str(car_id) for car_id in car_ids))
+        marcados = 0
+        for inicio in range(0, len(car_ids), TAMANHO_LOTE_REMOVIDOS):
+            self.round_trips += 1
+            linhas = sorted(
+                (self.linhas[indice]
+                 for car_id in car_ids[inicio:inicio + TAMANHO_LOTE_REMOVIDOS]
+                 for indice in self.por_car_id.get(car_id, ())),
+                key=lambda l: l['created_at'], reverse=True,
+            )
+            eventos = _eventos_removidos(linhas, status)
+            if eventos:
+                self.round_trips += 1
+                for evento in eventos:
+                    self._gravar(evento)
+            marcados += len(eventos)
+        return marcados
+
+    def obter_historico_preco(self, car_id, limite=10):
+        self.round_trips += 1
+        linhas = [l for l in self.linhas if l['car_id'] == car_id]
+        linhas.sort(key=lambda l: l['created_at'], reverse=True)
+        return [(l['created_at'], l['price_numeric'], l['status']) for l in linhas[:limite]]
+
+    def obter_historicos_precos(self, car_ids, limite=10, desde=None):
+        self.round_trips += 1
+        desde = desde or {}
+        historicos = {}
+        for car_id in dict.fromkeys(str(c) for c in car_ids):
+            linhas = sorted(
+                (l for l in self.linhas if l['car_id'] == car_id),
+                key=lambda l: l['created_at'], reverse=True,
+            )[:limite]
+            linhas = [l for l in linhas if car_id not in desde or l['updated_at'] > desde[car_id]]
+            if linhas:
+                historicos[car_id] = [
+                    (l['created_at'], l['price_numeric'], l['status'], l['updated_at']) for l in linhas
+                ]
+        return historicos
+
+    def obter_estatisticas(self):
+        # mesmos agrupamentos de sql/estatisticas_listings.sql
+        self.round_trips += 1
+        por_modelo, por_modelo_ano = {}, {}
+        for linha in self.linhas:
+            modelo = (linha.get('model') or '').strip().upper()
+            if modelo:
+                por_modelo.setdefault(modelo, []).append(linha)
+                por_modelo_ano.setdefault((modelo, linha['model_year']), []).append(linha)
+        return {
+            **_resumir(self.linhas),
+            'por_modelo': [
+                {'modelo': modelo, **_resumir(linhas)} for modelo, linhas in sorted(por_modelo.items())
+            ],
+            'por_modelo_ano': [
+                {'modelo': modelo, 'model_year': ano, **_resumir(linhas)}
+                for (modelo, ano), linhas in sorted(por_modelo_ano.items(), key=lambda i: (i[0][0], str(i[0][1])))
+            ],
+        }
+
+    def listar_anuncios_recentes(self, limite=20):
+        self.round_trips += 1
+        linhas = sorted(self.linhas, key=lambda l: l['created_at'], reverse=True)[:limite]
+        return [
+            (l['car_id'], l['full_name'], l['price_display'], l['city_name'], l['status'], l['created_at'])
+            for l in linhas
+        ]
+
+    def verificar_conexao(self):
+        self.round_trips += 1
+        return True
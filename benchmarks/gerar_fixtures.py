@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Gera páginas de busca no formato do autocarro (Next.js com __NEXT_DATA__)
+e as respostas da API FIPE (parallelum) usadas pelos benchmarks.
+Os dados são sintéticos, mas a estrutura segue a das respostas reais:
+<head> cheio de scripts, cards renderizados no <body> e o JSON completo
+no final; FIPE com marcas -> modelos -> anos -> valor.
+"""
+
+import json
+import random
+from pathlib import Path
+
+FIXTURES = Path(__file__).resolve().parent / 'fixtures'
+
+MODELOS = [
+    ('HB20', ['1.0 COMFORT 12V', '1.0 COMFORT PLUS 12V', '1.6 PREMIUM 16V', '1.0 SENSE 12V']),
+    ('ONIX', ['1.0 LT 8V', '1.4 LTZ 8V', '1.0 JOY 8V', '1.0 TURBO PREMIER']),
+    ('COROLLA', ['2.0 XEI 16V', '1.8 GLI 16V', '2.0 ALTIS 16V']),
+    ('ETIOS', ['1.5 XS 16V', '1.5 XLS 16V', '1.5 X PLUS 16V', '1.5 SEDAN XS 16V']),
+    ('CIVIC', ['2.0 LXR 16V', '2.0 EXL 16V', '1.5 TOURING TURBO']),
+]
+
+
+def _anuncio(rng, car_id, modelo, versoes):
+    versao = rng.choice(versoes)
+    ano = rng.randint(2015, 2022)
+    preco = rng.randint(38, 89) * 1000 + rng.choice([0, 500, 900])
+    loja = f'loja{rng.randint(1, 300)}'
+    slug = f"{modelo.lower()}-{versao.lower().replace('.', '-').replace(' ', '-')}-{ano}"
+    return {
+        'id': car_id,
+        'model': modelo.title(),
+        'version': versao,
+        'yearModel': ano,
+        'yearFabrication': ano - rng.randint(0, 1),
+        'priceCurrency': f"R$ {preco:,}".replace(',', '.'),
+        'price': preco,
+        'km': rng.randint(10, 150) * 1000,
+        'link': f'https://m.autocarro.com.br/{loja}/anuncio/{slug}/{car_id}',
+        'city': rng.choice(['Porto Alegre', 'Canoas', 'Caxias do Sul', 'Pelotas']),
+        'dealer': {'name': loja.upper(), 'phone': '(51) 99999-0000', 'verified': True},
+        'photos': [f'https://img.autocarro.com.br/{car_id}/{n}.jpg' for n in range(12)],
+        'optionals': rng.sample(['AR', 'DH', 'VE', 'TE', 'ABS', 'AIRBAG', 'MULTIMIDIA', 'CAMERA'], 5),
+    }
+
+
+def gerar_pagina(rng, query, total, id_inicial=1800000):
+    modelo, versoes = next(m for m in MODELOS if m[0].lower() == query)
+    itens = [_anuncio(rng, id_inicial + i, modelo, versoes) for i in range(total)]
+    dados = {
+        'props': {'pageProps': {
+            'offers': {'items': itens, 'total': total * 7, 'page': 1},
+            'filters': {'q': query, 'estado': 43, 'cambio': 1},
+        }},
+        'page': '/autobusca/carros',
+        'query': {'q': query},
+        'buildId': 'fixture',
+    }
+
+    head = ''.join(
+        f'<link rel="preload" href="/_next/static/chunks/{n}.js" as="script"/>'
+        f'<script src="/_next/static/chunks/{n}.js" defer=""></script>'
+        for n in range(60)
+    )
+    cards = ''.join(
+        '<div class="card"><a href="{link}"><img src="{foto}" alt="{m}"/>'
+        '<h2>{m} {v}</h2><p class="preco">{p}</p><p>{km} km · {c}</p></a></div>'.format(
+            link=i['link'], foto=i['photos'][0], m=i['model'], v=i['version'],
+            p=i['priceCurrency'], km=i['km'], c=i['city'],
+        )
+        for i in itens
+    )
+    return (
+        '<!DOCTYPE html><html lang="pt-BR"><head><meta charSet="utf-8"/>'
+        f'<title>{modelo} à venda</title>{head}'
+        '<script type="application/ld+json">{"@type":"WebSite"}</script></head>'
+        f'<body><div id="__next"><main>{cards}</main></div>'
+        f'<script id="__NEXT_DATA__" type="application/json">{json.dumps(dados, ensure_ascii=False)}</script>'
+        '</body></html>'
+    )
+
+
+MARCAS_FIPE = {
+    'Hyundai': 'HB20', 'GM - Chevrolet': 'ONIX', 'Toyota': 'ETIOS', 'Honda': 'CIVIC',
+}
+MARCAS_EXTRAS = [
+    'Acura', 'Agrale', 'Alfa Romeo', 'Audi', 'BMW', 'Chery', 'Citroën', 'Fiat', 'Ford',
+    'JAC', 'Jeep', 'Kia Motors', 'Mitsubishi', 'Nissan', 'Peugeot', 'Renault', 'VW - VolksWagen',
+]
+
+
+def gerar_catalogo_fipe(rng):
+    """
+    Catálogo FIPE: {'marcas': [...], 'modelos': {codigo_marca: [...]}}.
+    Inclui os modelos das fixtures de busca (com as versões usadas nas páginas)
+    e marcas extras com modelos aleatórios para dar volume ao catálogo.
+    Anos e valores são derivados do caminho pelo servidor stub.
+    """
+    marcas = []
+    modelos_por_marca = {}
+    codigo_modelo = 1000
+    nomes = list(MARCAS_FIPE) + MARCAS_EXTRAS
+    for codigo_marca, nome_marca in enumerate(sorted(nomes), 1):
+        marcas.append({'codigo': str(codigo_marca), 'nome': nome_marca})
+        modelos = []
+        principal = MARCAS_FIPE.get(nome_marca)
+        if principal:
+            versoes = next(v for m, v in MODELOS if m == principal)
+            modelos += [f'{principal} {versao.title()} Flex' for versao in versoes]
+            if principal == 'HB20':
+                modelos.append('HB20S Comfort 1.6 Flex')
+            if principal == 'ETIOS':
+                modelos.append('COROLLA XEi 2.0 Flex 16V Aut.')
+                modelos.append('COROLLA GLi 1.8 Flex 16V Mec.')
+        for _ in range(rng.randint(20, 60)):
+            base = ''.join(rng.choices('ABCDEFGHIJKLMNOPRSTUVXZ', k=rng.randint(3, 6)))
+            modelos.append(f"{base} {rng.choice(['1.0', '1.4', '1.6', '2.0'])} "
+                           f"{rng.choice(['Flex', 'Gasolina', 'Turbo'])} {rng.choice(['Mec.', 'Aut.'])}")
+
+        lista = []
+        for nome_modelo in modelos:
+            codigo_modelo += 1
+            lista.append({'codigo': codigo_modelo, 'nome': nome_modelo})
+        modelos_por_marca[str(codigo_marca)] = lista
+    return {'marcas': marcas, 'modelos': modelos_por_marca}
+
+
+def main():
+    rng = random.Random(43)
+    FIXTURES.mkdir(exist_ok=True)
+    paginas = {
+        'busca_hb20.html': ('hb20', 15),
+        'busca_etios_grande.html': ('etios', 120),
+    }
+    for nome, (query, total) in paginas.items():
+        (FIXTURES / nome).write_text(gerar_pagina(rng, query, total), encoding='utf-8')
+        print(f"✓ {nome}")
+
+    catalogo = gerar_catalogo_fipe(random.Random(7))
+    with open(FIXTURES / 'fipe_catalogo.json', 'w', encoding='utf-8') as f:
+        json.dump(catalogo, f, ensure_ascii=False, separators=(',', ':'))
+    total = sum(len(m) for m in catalogo['modelos'].values())
+    print(f"✓ fipe_catalogo.json ({len(catalogo['marcas'])} marcas, {total} modelos)")
+
+
+if __name__ == "__main__":
+    main()
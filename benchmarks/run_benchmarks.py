@@ -0,0 +1,373 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark do pipeline busca -> diff -> FIPE -> BD, sem rede externa.
+
+Usa as fixtures (páginas geradas e catálogo FIPE), o servidor stub local e
+o SupabaseEmMemoria. Mede vazão e latência de cada etapa para 10, 100 e
+10k anúncios e grava o resultado em JSON para comparar entre versões.
+
+Uso:
+    python benchmarks/run_benchmarks.py [--tamanhos 10 100 10000]
+                                        [--saida arquivo.json]
+                                        [--comparar base.json] [--tolerancia 0.25]
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from functools import partial
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(RAIZ))
+sys.path.insert(0, str(RAIZ / 'benchmarks'))
+
+import autocarro  # noqa: E402
+from services import fipe_service  # noqa: E402
+from services.fipe_cache import CacheFipe  # noqa: E402
+from services.fipe_indice import IndiceModelos, normalizar as normalizar_fipe  # noqa: E402
+from services.memoria_service import MemoriaPrecos  # noqa: E402
+from services.metricas import metricas  # noqa: E402
+from services.next_data import extrair_next_data  # noqa: E402
+from services.pipeline import analisar, cronometrar, encadear, limpar_preco, normalizar, sem_sedan  # noqa: E402
+from services.pipeline import comparar as comparar_memoria  # noqa: E402
+from services.supabase_service import BufferAnuncios  # noqa: E402
+from db_memoria import SupabaseEmMemoria  # noqa: E402
+from gerar_fixtures import FIXTURES, MODELOS, gerar_pagina  # noqa: E402
+from servidor_stub import PREFIXO_FIPE, ServidorStub  # noqa: E402
+
+TAMANHOS_PADRAO = [10, 100, 10000]
+# nome FIPE das versões das fixtures que não seguem '<MODELO> <Versão> Flex'
+ROTULOS_FIPE = {
+    ('COROLLA', '2.0 XEI 16V'): 'COROLLA XEi 2.0 Flex 16V Aut.',
+    ('COROLLA', '1.8 GLI 16V'): 'COROLLA GLi 1.8 Flex 16V Mec.',
+}
+LOTE_MATCHER = 500  # consultas por ranquear_lote, como num lote de enriquecimento
+
+
+def _itens(n, semente=1):
+    """n anúncios sintéticos, distribuídos entre os modelos das fixtures"""
+    rng = random.Random(semente)
+    itens = []
+    por_modelo = n // len(MODELOS) + 1
+    for i, (modelo, _) in enumerate(MODELOS):
+        html = gerar_pagina(rng, modelo.lower(), por_modelo, 3000000 + i * por_modelo)
+        itens += autocarro.ler_ofertas(extrair_next_data(html.encode('utf-8')))
+    return itens[:n]
+
+
+def _medir(funcao, n, repeticoes=1):
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        extra = funcao()
+    total = (time.perf_counter() - inicio) / repeticoes
+    resultado = {
+        'n': n,
+        'total_s': total,
+        'latencia_us': total / n * 1e6 if n else 0.0,
+        'itens_por_s': n / total if total else 0.0,
+    }
+    resultado.update(extra or {})
+    return resultado
+
+
+def bench_parse(n):
+    rng = random.Random(n)
+    html = gerar_pagina(rng, 'hb20', n).encode('utf-8')
+    repeticoes = max(1, 2000 // n)
+
+    def rodar():
+        autocarro.ler_ofertas(extrair_next_data(html))
+        return {'bytes_pagina': len(html)}
+    return _medir(rodar, n, repeticoes)
+
+
+def bench_limpar_preco(n):
+    precos = [item['priceCurrency'] for item in _itens(n)]
+    repeticoes = max(1, 20000 // n)
+
+    def rodar():
+        for preco in precos:
+            limpar_preco(preco)
+    return _medir(rodar, n, repeticoes)
+
+
+def bench_diff_memoria(n, pasta):
+    itens = _itens(n)
+    caminho = os.path.join(pasta, f'memoria_{n}.sqlite3')
+    memoria = MemoriaPrecos(caminho)
+    # metade já conhecida (metade dessas com preço diferente)
+    for i, item in enumerate(itens[: n // 2]):
+        preco = limpar_preco(item['priceCurrency'])
+        memoria[str(item['id'])] = preco if i % 2 else preco + 1000
+    memoria.salvar()
+
+    def rodar():
+        novidades, _ = autocarro.comparar_ofertas(itens, memoria, memoria)
+        gravadas = memoria.salvar()
+        return {'novidades': len(novidades), 'gravadas': gravadas}
+    resultado = _medir(rodar, n)
+    memoria.fechar()
+    return resultado
+
+
+def bench_estagios(n, pasta):
+    """Tempo próprio de cada estágio do pipeline, numa única passada em fluxo"""
+    rng = random.Random(n)
+    html = gerar_pagina(rng, 'etios', n).encode('utf-8')  # com versões SEDAN para o filtro
+    memoria = MemoriaPrecos(os.path.join(pasta, f'estagios_{n}.sqlite3'))
+
+    metricas.reiniciar()
+    listings = encadear(
+        [html],
+        cronometrar('parse', analisar),
+        cronometrar('normalizar', normalizar),
+        cronometrar('sem_sedan', sem_sedan),
+        cronometrar('comparar', partial(comparar_memoria, memoria=memoria, nova_memoria=memoria)),
+    )
+    for _ in listings:
+        pass
+    memoria.fechar()
+
+    resultados = {}
+    for tempo in metricas.relatorio()['tempos']:
+        if tempo['nome'] == 'estagio':
+            total = tempo['total']
+            resultados[tempo['rotulos']['estagio']] = {
+                'n': n,
+                'total_s': total,
+                'latencia_us': total / n * 1e6 if n else 0.0,
+                'itens_por_s': n / total if total else 0.0,
+            }
+    return resultados
+
+
+def bench_fipe(n, pasta, base_url):
+    itens = _itens(n)
+    consultas = [(i['model'].upper(), i['version'].upper(), i['yearModel']) for i in itens]
+
+    fipe_service.BASE_FIPE = base_url + PREFIXO_FIPE
+    fipe_service._cache = CacheFipe(os.path.join(pasta, f'fipe_{n}.sqlite3'))
+    fipe_service._indice = None
+    fipe_service._indice_motor = None
+
+    def rodar():
+        encontrados = sum(1 for consulta in consultas if fipe_service.obter_valor_fipe(*consulta))
+        return {'encontrados': encontrados}
+
+    frio = _medir(rodar, n)
+    quente = _medir(rodar, n)
+    estatisticas = fipe_service.obter_cache().estatisticas()
+    frio['consultas_unicas'] = len(set(fipe_service.chave_fipe(*c) for c in consultas))
+    quente['taxa_acerto_cache'] = estatisticas['taxa_acerto']
+    fipe_service.obter_cache().fechar()
+    fipe_service._cache = None
+    return frio, quente
+
+
+def _consultas_rotuladas(modelos_por_marca):
+    """
+    [(modelo, versao, nome FIPE esperado)] a partir das versões das fixtures
+    que existem no catálogo, com variações de escrita comuns nos anúncios
+    (sem as válvulas, vírgula na cilindrada, modelo separado: "HB 20")
+    """
+    nomes = {m['nome'] for modelos in modelos_por_marca.values() for m in modelos}
+    rotuladas = []
+    for modelo, versoes in MODELOS:
+        for versao in versoes:
+            esperado = ROTULOS_FIPE.get((modelo, versao), f'{modelo} {versao.title()} Flex')
+            if esperado not in nomes:
+                continue
+            variantes = {
+                (modelo, versao),
+                (modelo, re.sub(r' \d+V$', '', versao)),
+                (modelo, versao.replace('.', ',', 1)),
+                (re.sub(r'([A-Z])(\d)', r'\1 \2', modelo), versao),
+            }
+            rotuladas += [(m, v, esperado) for m, v in sorted(variantes)]
+    return rotuladas
+
+
+def bench_matcher(n):
+    """
+    Correspondência anúncio -> modelo FIPE no catálogo das fixtures: motor
+    vetorizado (ranquear_lote, com FIPE_MOTOR_VETORIZADO=1) x índice invertido
+    de duas fases (o padrão). Acerto = primeiro candidato igual ao
+    rótulo; a latência é por consulta, com o índice já montado.
+    """
+    with open(FIXTURES / 'fipe_catalogo.json', encoding='utf-8') as f:
+        catalogo = json.load(f)
+    marcas, modelos = catalogo['marcas'], catalogo['modelos']
+    rotuladas = _consultas_rotuladas(modelos)
+    consultas = [rotuladas[i % len(rotuladas)] for i in range(n)]
+
+    def _acertos(escolhidos):
+        acertos = sum(
+            1 for (_, _, esperado), escolhido in zip(rotuladas, escolhidos)
+            if escolhido and escolhido['nome'] == esperado
+        )
+        return {'acertos': acertos, 'rotulados': len(rotuladas), 'taxa_acerto': acertos / len(rotuladas)}
+
+    resultados = {}
+
+    indice = IndiceModelos(marcas, modelos)
+
+    def _primeiro(modelo, versao):
+        termo = fipe_service.chave_fipe(modelo, versao, None)[0]
+        candidatos = indice.candidatos(normalizar_fipe(modelo), termo) or indice.candidatos_amplos(
+            termo, fipe_service._marcas_candidatas(marcas, termo)
+        )
+        return candidatos[0][1] if candidatos else None
+
+    acertos = _acertos([_primeiro(modelo, versao) for modelo, versao, _ in rotuladas])
+
+    def rodar_indice():
+        for modelo, versao, _ in consultas:
+            _primeiro(modelo, versao)
+        return acertos
+    resultados['matcher_indice'] = _medir(rodar_indice, n)
+
+    motor = fipe_service._classe_motor()
+    if motor is not None:
+        vetorizado = motor(marcas, modelos)
+
+        def _ranquear(lista):
+            rankings = []
+            for inicio in range(0, len(lista), LOTE_MATCHER):
+                rankings += vetorizado.ranquear_lote(
+                    [(modelo, f"{modelo} {versao}") for modelo, versao, _ in lista[inicio:inicio + LOTE_MATCHER]],
+                    limite=fipe_service.LIMITE_CANDIDATOS,
+                )
+            return rankings
+
+        acertos_motor = _acertos([ranking[0][1] if ranking else None for ranking in _ranquear(rotuladas)])
+
+        def rodar_motor():
+            _ranquear(consultas)
+            return acertos_motor
+        resultados['matcher_vetorizado'] = _medir(rodar_motor, n)
+    return resultados
+
+
+def bench_db_lote(n):
+    itens = _itens(n)
+    registros = [{
+        'car_id': str(item['id']),
+        'full_name': f"{item['model']} {item['version']}",
+        'price_display': item['priceCurrency'],
+        'price_numeric': limpar_preco(item['priceCurrency']),
+        'model_year': item['yearModel'],
+        'listing_url': item['link'],
+        'status': '🆕 NOVO',
+        'listing_date': datetime.now(),
+    } for item in itens]
+
+    def rodar():
+        db = SupabaseEmMemoria()
+        buffer = BufferAnuncios(db, autocarro.TAMANHO_LOTE_DB, autocarro.INTERVALO_LOTE_DB)
+        for registro in registros:
+            buffer.adicionar(registro)
+        buffer.descarregar()
+        return {'round_trips': db.round_trips}
+    return _medir(rodar, n)
+
+
+def executar(tamanhos):
+    resultados = {}
+
+    def registrar(etapa, resultado):
+        resultados.setdefault(etapa, {})[str(resultado['n'])] = resultado
+        print(
+            f"  {etapa:18} n={resultado['n']:<6} {resultado['total_s'] * 1000:10.2f} ms "
+            f"{resultado['latencia_us']:10.2f} µs/item {resultado['itens_por_s']:12.0f} itens/s"
+            + (f"  acerto {resultado['taxa_acerto']:.0%} ({resultado['acertos']}/{resultado['rotulados']})"
+               if 'taxa_acerto' in resultado else "")
+        )
+
+    with tempfile.TemporaryDirectory() as pasta, ServidorStub() as base_url:
+        for n in tamanhos:
+            registrar('parse', bench_parse(n))
+            registrar('limpar_preco', bench_limpar_preco(n))
+            registrar('diff_memoria', bench_diff_memoria(n, pasta))
+            for estagio, resultado in bench_estagios(n, pasta).items():
+                registrar(f'estagio_{estagio}', resultado)
+            frio, quente = bench_fipe(n, pasta, base_url)
+            registrar('fipe_frio', frio)
+            registrar('fipe_quente', quente)
+            for etapa, resultado in bench_matcher(n).items():
+                registrar(etapa, resultado)
+            registrar('db_lote', bench_db_lote(n))
+    return resultados
+
+
+def _versao():
+    try:
+        return subprocess.check_output(
+            ['git', 'describe', '--always', '--dirty'], cwd=RAIZ, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(atual, base, tolerancia):
+    """Lista as etapas cuja latência piorou mais que `tolerancia` (ex: 0.25 = 25%)"""
+    regressoes = []
+    for etapa, por_n in atual['resultados'].items():
+        for n, resultado in por_n.items():
+            anterior = base.get('resultados', {}).get(etapa, {}).get(n)
+            if not anterior or not anterior['latencia_us']:
+                continue
+            variacao = resultado['latencia_us'] / anterior['latencia_us'] - 1
+            if variacao > tolerancia:
+                regressoes.append((etapa, n, anterior['latencia_us'], resultado['latencia_us'], variacao))
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=TAMANHOS_PADRAO)
+    parser.add_argument('--saida', help='arquivo JSON de saída (padrão: benchmarks/resultados/<versão>.json)')
+    parser.add_argument('--comparar', help='JSON de uma execução anterior para detectar regressões')
+    parser.add_argument('--tolerancia', type=float, default=0.25)
+    args = parser.parse_args()
+
+    print("\n⏱ Benchmarks do pipeline\n")
+    relatorio = {
+        'versao': _versao(),
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'resultados': executar(args.tamanhos),
+    }
+
+    saida = Path(args.saida) if args.saida else (
+        RAIZ / 'benchmarks' / 'resultados' / f"{relatorio['versao'] or 'sem-versao'}.json"
+    )
+    saida.parent.mkdir(parents=True, exist_ok=True)
+    with open(saida, 'w', encoding='utf-8') as f:
+        json.dump(relatorio, f, indent=2, ensure_ascii=False)
+    print(f"\n💾 Resultado salvo em {saida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            base = json.load(f)
+        regressoes = comparar(relatorio, base, args.tolerancia)
+        if regressoes:
+            print(f"\n❌ {len(regressoes)} regressões (> {args.tolerancia:.0%}) contra {base.get('versao')}:")
+            for etapa, n, antes, depois, variacao in regressoes:
+                print(f"   {etapa} n={n}: {antes:.2f} → {depois:.2f} µs/item (+{variacao:.0%})")
+            sys.exit(1)
+        print(f"\n✅ Sem regressões contra {base.get('versao')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Servidor HTTP local que imita o autocarro e a API FIPE a partir das fixtures.
+
+- /autobusca/carros?q=<query>&page=<n>  -> página de busca gerada (ETag estável)
+- /fipe/api/v1/carros/...               -> catálogo de fixtures/fipe_catalogo.json
+
+Uso em código:
+    with ServidorStub() as base_url:
+        ...
+Ou direto: python benchmarks/servidor_stub.py [porta]
+"""
+
+import hashlib
+import json
+import random
+import sys
+import threading
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from gerar_fixtures import FIXTURES, MODELOS, gerar_pagina  # noqa: E402
+
+PREFIXO_FIPE = '/fipe/api/v1/carros'
+ITENS_POR_PAGINA = 30
+PAGINAS_POR_BUSCA = 3
+
+
+def _carregar_catalogo():
+    with open(FIXTURES / 'fipe_catalogo.json', encoding='utf-8') as f:
+        return json.load(f)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    catalogo = None
+    contadores = None
+    _lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def _responder(self, status, corpo, tipo='application/json', etag=None):
+        if isinstance(corpo, (dict, list)):
+            corpo = json.dumps(corpo, ensure_ascii=False)
+        if isinstance(corpo, str):
+            corpo = corpo.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', tipo)
+        self.send_header('Content-Length', str(len(corpo)))
+        if etag:
+            self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def do_GET(self):
+        partes = urlsplit(self.path)
+        servico = 'fipe' if partes.path.startswith(PREFIXO_FIPE) else 'autocarro'
+        with self._lock:
+            self.contadores[servico] = self.contadores.get(servico, 0) + 1
+
+        if partes.path.startswith('/autobusca/'):
+            return self._busca(parse_qs(partes.query))
+        if partes.path.startswith(PREFIXO_FIPE):
+            return self._fipe(partes.path[len(PREFIXO_FIPE):])
+        self._responder(404, {'erro': 'não encontrado'})
+
+    def _busca(self, params):
+        query = params.get('q', ['hb20'])[0].lower()
+        pagina = int(params.get('page', ['1'])[0])
+        if not any(m.lower() == query for m, _ in MODELOS):
+            query = MODELOS[0][0].lower()
+
+        total = ITENS_POR_PAGINA if pagina <= PAGINAS_POR_BUSCA else 0
+        indice_modelo = next(i for i, (m, _) in enumerate(MODELOS) if m.lower() == query)
+        rng = random.Random(zlib.crc32(f'{query}:{pagina}'.encode()))
+        id_inicial = 2000000 + indice_modelo * 10000 + (pagina - 1) * ITENS_POR_PAGINA
+        html = gerar_pagina(rng, query, total, id_inicial)
+        etag = '"' + hashlib.sha1(html.encode('utf-8')).hexdigest()[:16] + '"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        self._responder(200, html, 'text/html; charset=utf-8', etag)
+
+    def _fipe(self, caminho):
+        partes = [p for p in caminho.split('/') if p]
+        catalogo = self.catalogo
+
+        if partes == ['marcas']:
+            return self._responder(200, catalogo['marcas'])
+        if len(partes) == 3 and partes[2] == 'modelos':
+            modelos = catalogo['modelos'].get(partes[1])
+            if modelos is None:
+                return self._responder(404, {'erro': 'marca'})
+            return self._responder(200, {'modelos': modelos, 'anos': []})
+        if len(partes) == 5 and partes[4] == 'anos':
+            anos = [{'codigo': f'{ano}-1', 'nome': f'{ano} Gasolina'} for ano in range(2012, 2024)]
+            return self._responder(200, anos)
+        if len(partes) == 6 and partes[4] == 'anos':
+            semente = zlib.crc32('/'.join(partes).encode())
+            valor = 35000 + semente % 100000
+            return self._responder(200, {
+                'Valor': f"R$ {valor:,}".replace(',', '.') + ',00',
+                'Marca': partes[1],
+                'Modelo': partes[3],
+                'AnoModelo': int(partes[5].split('-')[0]),
+                'MesReferencia': 'outubro de 2026',
+            })
+        self._responder(404, {'erro': 'caminho FIPE'})
+
+
+class ServidorStub:
+    """Sobe o servidor numa thread; o `with` devolve a URL base"""
+
+    def __init__(self, porta=0):
+        self.porta = porta
+        self.contadores = {}
+        self._servidor = None
+        self._thread = None
+
+    def __enter__(self):
+        handler = type('Handler', (_Handler,), {
+            'catalogo': _carregar_catalogo(),
+            'contadores': self.contadores,
+        })
+        self._servidor = ThreadingHTTPServer(('127.0.0.1', self.porta), handler)
+        self._thread = threading.Thread(target=self._servidor.serve_forever, daemon=True)
+        self._thread.start()
+        return f'http://127.0.0.1:{self._servidor.server_address[1]}'
+
+    def __exit__(self, *exc):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+
+if __name__ == "__main__":
+    porta = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+    with ServidorStub(porta) as base_url:
+        print(f"🧪 Servidor stub em {base_url} (Ctrl+C para sair)")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
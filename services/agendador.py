@@ -0,0 +1,85 @@
+"""
+Agendamento do modo daemon (python autocarro.py --daemon).
+
+Cada watchlist tem o seu intervalo de consulta, que se adapta à atividade:
+um ciclo com eventos (anúncio novo ou preço que baixou) encurta o intervalo
+(× FATOR_ACELERACAO) e um ciclo sem eventos o alonga (× FATOR_RECUO),
+sempre entre o mínimo e o máximo configurados.
+
+Um orçamento global de requisições por minuto (token bucket) limita a
+carga no autocarro.com.br, independente de quantas watchlists vencerem.
+"""
+
+import time
+
+FATOR_ACELERACAO = 0.5
+FATOR_RECUO = 1.5
+
+
+class OrcamentoRequisicoes:
+    """
+    Token bucket de requisições por minuto (capacidade = um minuto cheio).
+    O consumo é registrado depois do ciclo e pode deixar o saldo negativo:
+    o próximo ciclo espera até a dívida ser paga.
+    """
+
+    def __init__(self, por_minuto):
+        self.por_minuto = float(por_minuto)
+        self._saldo = self.por_minuto
+        self._ultimo = time.monotonic()
+
+    def _repor(self):
+        agora = time.monotonic()
+        self._saldo = min(self.por_minuto, self._saldo + (agora - self._ultimo) * self.por_minuto / 60)
+        self._ultimo = agora
+
+    def disponivel(self):
+        self._repor()
+        return self._saldo
+
+    def consumir(self, requisicoes):
+        self._repor()
+        self._saldo -= requisicoes
+
+    def espera(self, requisicoes):
+        """Segundos até haver saldo para `requisicoes` (limitado a um minuto cheio)"""
+        falta = min(requisicoes, self.por_minuto) - self.disponivel()
+        return max(0.0, falta * 60 / self.por_minuto)
+
+
+class Agendador:
+    """Intervalo adaptativo e próxima consulta de cada watchlist (pelo nome)"""
+
+    def __init__(self, nomes, inicial, minimo, maximo):
+        self.minimo = minimo
+        self.maximo = maximo
+        agora = time.monotonic()
+        self.intervalos = {nome: min(max(inicial, minimo), maximo) for nome in nomes}
+        # todas vencem no primeiro ciclo
+        self.proximas = {nome: agora for nome in nomes}
+
+    def vencidas(self, agora=None):
+        """Watchlists com consulta vencida, da mais atrasada para a menos"""
+        agora = time.monotonic() if agora is None else agora
+        return sorted(
+            (nome for nome, proxima in self.proximas.items() if proxima <= agora),
+            key=lambda nome: self.proximas[nome],
+        )
+
+    def atraso(self, nome, agora=None):
+        agora = time.monotonic() if agora is None else agora
+        return agora - self.proximas[nome]
+
+    def espera(self, agora=None):
+        """Segundos até a próxima watchlist vencer"""
+        agora = time.monotonic() if agora is None else agora
+        return max(0.0, min(self.proximas.values(), default=agora) - agora)
+
+    def registrar(self, nome, eventos, agora=None):
+        """Ajusta o intervalo da watchlist consultada e agenda a próxima consulta"""
+        agora = time.monotonic() if agora is None else agora
+        fator = FATOR_ACELERACAO if eventos else FATOR_RECUO
+        intervalo = min(max(self.intervalos[nome] * fator, self.minimo), self.maximo)
+        self.intervalos[nome] = intervalo
+        self.proximas[nome] = agora + intervalo
+        return intervalo
@@ -0,0 +1,219 @@
+"""
+Carga histórica (backfill) de páginas de busca arquivadas no Supabase.
+
+    python -m services.backfill DIRETORIO [--processos N] [--fila 5000] [--lote 500]
+
+Lê recursivamente os .html (página completa com __NEXT_DATA__) e .json
+(__NEXT_DATA__, o objeto offers ou a lista de anúncios) do diretório. A
+data de cada página vem do caminho (2024-05-01, 20240501, 2024-05-01_0930,
+no nome do arquivo ou de uma pasta), pois os anúncios não trazem data;
+arquivos sem data são ignorados e contados como erro. As páginas são lidas
+em ordem cronológica e, como na varredura diária, cada uma é comparada com
+o último preço já visto de cada anúncio: só anúncios novos ou com preço
+alterado viram linha nova em listings (histórico de preços).
+
+A leitura e o parse rodam num pool de processos (CPU-bound), com poucos
+arquivos em voo por vez; os registros seguem por uma fila limitada até uma
+thread que grava em lotes via BufferAnuncios. Se o banco ficar para trás,
+a fila enche e o envio de arquivos ao pool para; a memória cresce só com
+o último preço de cada anúncio distinto, não com o tamanho do arquivo morto.
+"""
+
+import argparse
+import json
+import os
+import queue
+import re
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from services.metricas import metricas
+from services.next_data import extrair_next_data
+from services.pipeline import encadear, normalizar, sem_sedan
+
+EXTENSOES = ('.html', '.htm', '.json')
+STATUS_BACKFILL = "🗄 HISTÓRICO"
+TAMANHO_FILA = 5000
+TAMANHO_LOTE = 500
+ARQUIVOS_POR_PROCESSO = 2  # arquivos em voo por processo do pool
+
+_FIM = object()
+
+# data (e hora opcional) num nome de arquivo ou pasta: 2024-05-01, 20240501, 2024-05-01_0930
+_DATA_NO_NOME = re.compile(
+    r'(?<!\d)(\d{4})-?(\d{2})-?(\d{2})(?:[T_ -]?(\d{2})[:h-]?(\d{2})(?:[:m-]?(\d{2}))?)?(?!\d)'
+)
+
+
+def data_do_caminho(caminho):
+    """Data da página a partir do nome do arquivo (ou das pastas acima dele); None se não houver"""
+    for parte in reversed(Path(caminho).parts):
+        for encontrado in reversed(list(_DATA_NO_NOME.finditer(parte))):
+            try:
+                return datetime(*(int(campo) for campo in encontrado.groups() if campo is not None))
+            except ValueError:
+                continue
+    return None
+
+
+def listar_arquivos(diretorio):
+    """[(data, caminho)] das páginas arquivadas em ordem cronológica (data None = sem data)"""
+    caminhos = sorted(
+        str(caminho) for caminho in Path(diretorio).rglob('*')
+        if caminho.is_file() and caminho.suffix.lower() in EXTENSOES
+    )
+    return sorted(
+        ((data_do_caminho(caminho), caminho) for caminho in caminhos),
+        key=lambda item: (item[0] is not None, item[0] or datetime.min, item[1]),
+    )
+
+
+def _itens(dados):
+    """offers.items de um __NEXT_DATA__, de um objeto offers ou de uma lista"""
+    if isinstance(dados, list):
+        return dados
+    if not isinstance(dados, dict):
+        return []
+    if 'props' in dados:
+        dados = dados.get('props', {}).get('pageProps', {}).get('offers', {})
+    return dados.get('items', []) if isinstance(dados, dict) else []
+
+
+def normalizar_ofertas(itens, data):
+    """
+    Anúncios brutos -> registros no formato de BufferAnuncios, pelos mesmos
+    estágios da varredura diária (normalizar, sem_sedan, para_registro)
+    """
+    registros = []
+    for listing in encadear(itens, normalizar, sem_sedan):
+        listing.status_aviso = STATUS_BACKFILL
+        registros.append(listing.para_registro(data=data))
+    return registros
+
+
+def ler_arquivo(caminho, data):
+    """
+    Executado nos processos do pool: lê uma página arquivada e retorna a
+    lista de registros normalizados, com a data da página.
+    """
+    with open(caminho, 'rb') as f:
+        conteudo = f.read()
+
+    if caminho.lower().endswith('.json'):
+        dados = json.loads(conteudo)
+    else:
+        dados = extrair_next_data(conteudo)
+
+    return normalizar_ofertas(_itens(dados), data)
+
+
+def filtrar_alterados(registros, ultimos_precos):
+    """
+    Só os registros de anúncios novos ou com preço diferente do último visto
+    (o diff da varredura diária); atualiza ultimos_precos {car_id: preço}.
+    """
+    alterados = []
+    for registro in registros:
+        car_id, preco = registro['car_id'], registro['price_numeric']
+        if car_id in ultimos_precos and ultimos_precos[car_id] == preco:
+            continue
+        ultimos_precos[car_id] = preco
+        alterados.append(registro)
+    return alterados
+
+
+def executar_backfill(diretorio, db, processos=None, tamanho_fila=TAMANHO_FILA,
+                      tamanho_lote=TAMANHO_LOTE):
+    """
+    Lê as páginas de `diretorio` num pool de processos e grava em lotes em
+    `db` os anúncios novos ou com preço alterado. Retorna as estatísticas da carga.
+    """
+    from services.supabase_service import BufferAnuncios
+
+    arquivos = listar_arquivos(diretorio)
+    processos = processos or os.cpu_count() or 1
+    fila = queue.Queue(maxsize=tamanho_fila)
+    buffer = BufferAnuncios(db, tamanho_lote, guardar_resultados=False)
+    stats = {'arquivos': len(arquivos), 'lidos': 0, 'erros': 0, 'anuncios': 0, 'inalterados': 0}
+    ultimos_precos = {}
+
+    def _gravar():
+        while True:
+            registro = fila.get()
+            if registro is _FIM:
+                break
+            buffer.adicionar(registro)
+        buffer.descarregar()
+
+    def _encaminhar(caminho, futuro):
+        try:
+            registros = futuro.result()
+        except Exception as e:
+            stats['erros'] += 1
+            metricas.contar('backfill_erros')
+            print(f"    ❌ {caminho}: {e}")
+            return
+        stats['lidos'] += 1
+        stats['anuncios'] += len(registros)
+        alterados = filtrar_alterados(registros, ultimos_precos)
+        stats['inalterados'] += len(registros) - len(alterados)
+        metricas.contar('backfill_arquivos')
+        metricas.contar('backfill_anuncios', len(registros))
+        for registro in alterados:
+            fila.put(registro)  # bloqueia enquanto o banco está atrasado
+        if stats['lidos'] % 100 == 0:
+            print(f"    📦 {stats['lidos']}/{stats['arquivos']} arquivos, {stats['anuncios']} anúncios")
+
+    escritor = threading.Thread(target=_gravar, name='backfill-gravacao', daemon=True)
+    escritor.start()
+    try:
+        with metricas.etapa('backfill'), ProcessPoolExecutor(max_workers=processos) as pool:
+            # janela limitada de arquivos em voo, consumidos na ordem de envio
+            em_voo = deque()
+            for data, caminho in arquivos:
+                if data is None:
+                    stats['erros'] += 1
+                    metricas.contar('backfill_erros')
+                    print(f"    ❌ {caminho}: sem data no nome do arquivo ou das pastas")
+                    continue
+                em_voo.append((caminho, pool.submit(ler_arquivo, caminho, data)))
+                if len(em_voo) >= processos * ARQUIVOS_POR_PROCESSO:
+                    _encaminhar(*em_voo.popleft())
+            while em_voo:
+                _encaminhar(*em_voo.popleft())
+    finally:
+        fila.put(_FIM)
+        escritor.join()
+
+    stats.update({'gravados': buffer.gravados, 'falhas': buffer.falhas, 'lotes': buffer.lotes_enviados})
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Carrega páginas de busca arquivadas no Supabase")
+    parser.add_argument('diretorio')
+    parser.add_argument('--processos', type=int, help='processos de parse (padrão: núcleos da CPU)')
+    parser.add_argument('--fila', type=int, default=TAMANHO_FILA, help='máximo de anúncios aguardando gravação')
+    parser.add_argument('--lote', type=int, default=TAMANHO_LOTE, help='anúncios por insert em lote')
+    args = parser.parse_args()
+
+    from services.supabase_service import SupabaseService
+
+    db = SupabaseService()
+    stats = executar_backfill(args.diretorio, db, args.processos, args.fila, args.lote)
+    print(
+        f"🗄 Backfill: {stats['lidos']}/{stats['arquivos']} arquivos ({stats['erros']} com erro), "
+        f"{stats['anuncios']} anúncios ({stats['inalterados']} sem alteração de preço) → "
+        f"{stats['gravados']} gravados em {stats['lotes']} lotes "
+        f"({stats['falhas']} falhas)"
+    )
+    etapas = metricas.resumo_etapas()
+    if etapas:
+        print("📈 Etapas: " + " | ".join(f"{nome} {duracao:.2f}s" for nome, duracao in etapas))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+import asyncio
+import inspect
+import time
+from urllib.parse import urlencode, urlsplit
+
+import httpx
+
+from services.http_client import CircuitoAberto, cliente_async, requisitar_async
+from services.metricas import metricas
+
+
+class TokenBucket:
+    """
+    Limitador de taxa (token bucket) assíncrono.
+    taxa: tokens repostos por segundo
+    capacidade: tamanho máximo da rajada
+    """
+
+    def __init__(self, taxa, capacidade=1):
+        self.taxa = float(taxa)
+        self.capacidade = max(1.0, float(capacidade))
+        self._tokens = self.capacidade
+        self._ultimo = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _repor(self):
+        agora = time.monotonic()
+        self._tokens = min(self.capacidade, self._tokens + (agora - self._ultimo) * self.taxa)
+        self._ultimo = agora
+
+    async def adquirir(self):
+        async with self._lock:
+            while True:
+                self._repor()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.taxa)
+
+
+class MotorBusca:
+    """
+    Motor de busca assíncrono com pool de conexões compartilhado,
+    limite de concorrência por host e token bucket por host.
+    Retentativas e circuit breaker vêm de services.http_client.
+    Registra o tempo de cada requisição em self.tempos.
+    """
+
+    def __init__(self, headers=None, limite_por_host=3, taxa_por_segundo=2.0,
+                 rajada=2, timeout=20, verify=True):
+        self.headers = headers or {}
+        self.limite_por_host = limite_por_host
+        self.taxa_por_segundo = taxa_por_segundo
+        self.rajada = rajada
+        self.timeout = timeout
+        self.verify = verify
+        self.tempos = []
+        self._semaforos = {}
+        self._buckets = {}
+        self._client = None
+
+    async def __aenter__(self):
+        self._client = cliente_async(
+            headers=self.headers,
+            timeout=self.timeout,
+            verify=self.verify,
+            follow_redirects=True,
+        )
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._client.aclose()
+        self._client = None
+
+    def _controles(self, host):
+        if host not in self._semaforos:
+            self._semaforos[host] = asyncio.Semaphore(self.limite_por_host)
+            self._buckets[host] = TokenBucket(self.taxa_por_segundo, self.rajada)
+        return self._semaforos[host], self._buckets[host]
+
+    async def buscar(self, url, condicional=None):
+        """
+        Baixa uma URL respeitando os limites do host.
+        condicional: dict opcional com 'etag' / 'last_modified' de uma resposta
+        anterior, enviados como If-None-Match / If-Modified-Since.
+        Retorna dict com 'url', 'conteudo' (bytes ou None), 'status', 'erro',
+        'nao_modificado' (resposta 304), 'etag', 'last_modified' e 'duracao'.
+        """
+        host = urlsplit(url).netloc
+        semaforo, bucket = self._controles(host)
+
+        cabecalhos = {}
+        if condicional:
+            if condicional.get('etag'):
+                cabecalhos['If-None-Match'] = condicional['etag']
+            if condicional.get('last_modified'):
+                cabecalhos['If-Modified-Since'] = condicional['last_modified']
+
+        async with semaforo:
+            await bucket.adquirir()
+            inicio = time.perf_counter()
+            resultado = {
+                'url': url, 'conteudo': None, 'status': None, 'erro': None,
+                'nao_modificado': False, 'etag': None, 'last_modified': None,
+            }
+            try:
+                response = await requisitar_async(self._client, 'GET', url, headers=cabecalhos)
+                resultado['status'] = response.status_code
+                resultado['etag'] = response.headers.get('etag')
+                resultado['last_modified'] = response.headers.get('last-modified')
+                if response.status_code == 304:
+                    resultado['nao_modificado'] = True
+                else:
+                    response.raise_for_status()
+                    resultado['conteudo'] = response.content
+            except httpx.HTTPStatusError as e:
+                resultado['erro'] = f"HTTP {e.response.status_code} em {url}"
+            except httpx.HTTPError as e:
+                resultado['erro'] = str(e) or e.__class__.__name__
+            except CircuitoAberto as e:
+                resultado['erro'] = f"circuito aberto para {e}"
+            duracao = time.perf_counter() - inicio
+
+        resultado['duracao'] = duracao
+        tamanho = len(resultado['conteudo'] or b'')
+        self.tempos.append({
+            'url': url,
+            'host': host,
+            'status': resultado['status'],
+            'duracao': duracao,
+            'bytes': tamanho,
+        })
+        metricas.contar('http_requisicoes', host=host, status=resultado['status'] or 'erro')
+        metricas.contar('http_bytes', tamanho, host=host)
+        metricas.registrar_tempo('http', duracao, host=host)
+        return resultado
+
+    def resumo_tempos(self):
+        if not self.tempos:
+            return {'requisicoes': 0, 'total': 0.0, 'media': 0.0, 'maximo': 0.0, 'bytes': 0}
+        duracoes = [t['duracao'] for t in self.tempos]
+        return {
+            'requisicoes': len(duracoes),
+            'total': sum(duracoes),
+            'media': sum(duracoes) / len(duracoes),
+            'maximo': max(duracoes),
+            'bytes': sum(t['bytes'] for t in self.tempos),
+        }
+
+
+class SessaoBusca:
+    """
+    MotorBusca aberto num event loop próprio e reaproveitado entre chamadas
+    de buscar_paginado: o cliente httpx (preso ao loop em que foi criado),
+    os semáforos e os token buckets sobrevivem entre os ciclos do daemon.
+    """
+
+    def __init__(self, headers=None, **opcoes):
+        self._loop = asyncio.new_event_loop()
+        self.motor = MotorBusca(headers, **opcoes)
+        self.executar(self.motor.__aenter__())
+
+    def executar(self, corrotina):
+        return self._loop.run_until_complete(corrotina)
+
+    def fechar(self):
+        try:
+            self.executar(self.motor.__aexit__(None, None, None))
+            self.executar(self._loop.shutdown_asyncgens())
+        finally:
+            self._loop.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+
+def url_da_pagina(url, pagina, parametro='page'):
+    """URL da página `pagina` (1 = a própria URL)"""
+    if pagina <= 1:
+        return url
+    separador = '&' if urlsplit(url).query else '?'
+    return f"{url}{separador}{urlencode({parametro: pagina})}"
+
+
+def buscar_paginado(urls, headers=None, continuar=None, max_paginas=1, parametro='page',
+                    condicional=None, sessao=None, **opcoes):
+    """
+    Percorre as páginas de resultado de cada URL em paralelo (URLs distintas
+    concorrem entre si; as páginas de uma mesma URL são sequenciais).
+    continuar(indice, pagina, resultado) é chamado a cada página baixada e
+    decide se a próxima deve ser buscada (pode ser uma corrotina, aguardada
+    no loop).
+    condicional(url) pode devolver os validadores salvos da URL para uma
+    requisição condicional.
+    sessao: SessaoBusca aberta para reaproveitar o motor (e o pool de
+    conexões) entre chamadas; nesse caso headers e opcoes são ignorados.
+    Retorna (resultados_por_url, resumo_tempos), com a lista de resultados
+    de página de cada URL.
+    """
+    async def _percorrer(motor, indice, url):
+        resultados = []
+        for pagina in range(1, max_paginas + 1):
+            url_pagina = url_da_pagina(url, pagina, parametro)
+            validadores = condicional(url_pagina) if condicional else None
+            resultado = await motor.buscar(url_pagina, validadores)
+            resultado['pagina'] = pagina
+            resultados.append(resultado)
+            if resultado['erro'] or continuar is None:
+                break
+            seguir = continuar(indice, pagina, resultado)
+            if inspect.isawaitable(seguir):
+                seguir = await seguir
+            if not seguir:
+                break
+        return resultados
+
+    async def _executar(motor):
+        inicio = time.perf_counter()
+        por_url = await asyncio.gather(
+            *(_percorrer(motor, indice, url) for indice, url in enumerate(urls))
+        )
+        resumo = motor.resumo_tempos()
+        resumo['parede'] = time.perf_counter() - inicio
+        return por_url, resumo
+
+    async def _com_motor_novo():
+        async with MotorBusca(headers, **opcoes) as motor:
+            return await _executar(motor)
+
+    if sessao is not None:
+        sessao.motor.tempos = []
+        return sessao.executar(_executar(sessao.motor))
+    return asyncio.run(_com_motor_novo())
@@ -0,0 +1,113 @@
+import json
+import sqlite3
+import threading
+import time
+
+DIA = 24 * 60 * 60
+
+# A tabela FIPE é atualizada mensalmente; valores e resultados expiram antes
+TTL_PADRAO = {
+    'marcas': 30 * DIA,
+    'modelos': 30 * DIA,
+    'anos': 30 * DIA,
+    'valor': 15 * DIA,
+    'resultado': 15 * DIA,
+    'resultado_vazio': 1 * DIA,
+}
+
+
+class CacheFipe:
+    """
+    Cache persistente (SQLite) das respostas da API FIPE.
+    Cada entrada pertence a um nível (marcas, modelos, anos, valor, resultado)
+    com TTL próprio. Quando passa de max_entradas, remove as expiradas e
+    depois as menos acessadas recentemente.
+    """
+
+    def __init__(self, caminho='fipe_cache.sqlite3', ttls=None, max_entradas=50000):
+        self.caminho = caminho
+        self.ttls = dict(TTL_PADRAO, **(ttls or {}))
+        self.max_entradas = max_entradas
+        self.hits = {}
+        self.misses = {}
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(caminho, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " nivel TEXT NOT NULL,"
+            " chave TEXT NOT NULL,"
+            " valor TEXT NOT NULL,"
+            " criado REAL NOT NULL,"
+            " acessado REAL NOT NULL,"
+            " PRIMARY KEY (nivel, chave))"
+        )
+        self._conn.commit()
+
+    def obter(self, nivel, chave, padrao=None):
+        """Retorna o valor em cache ou `padrao` se ausente/expirado"""
+        with self._lock:
+            linha = self._conn.execute(
+                "SELECT valor, criado FROM cache WHERE nivel = ? AND chave = ?",
+                (nivel, str(chave)),
+            ).fetchone()
+
+            agora = time.time()
+            if linha is None or agora - linha[1] > self.ttls.get(nivel, 30 * DIA):
+                self.misses[nivel] = self.misses.get(nivel, 0) + 1
+                return padrao
+
+            self.hits[nivel] = self.hits.get(nivel, 0) + 1
+            self._conn.execute(
+                "UPDATE cache SET acessado = ? WHERE nivel = ? AND chave = ?",
+                (agora, nivel, str(chave)),
+            )
+            return json.loads(linha[0])
+
+    def gravar(self, nivel, chave, valor):
+        with self._lock:
+            agora = time.time()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (nivel, chave, valor, criado, acessado) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (nivel, str(chave), json.dumps(valor, ensure_ascii=False), agora, agora),
+            )
+
+    def despejar(self):
+        """Remove entradas expiradas e, se ainda acima do limite, as menos usadas"""
+        with self._lock:
+            agora = time.time()
+            for nivel, ttl in self.ttls.items():
+                self._conn.execute(
+                    "DELETE FROM cache WHERE nivel = ? AND criado < ?", (nivel, agora - ttl)
+                )
+
+            total = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+            excesso = total - self.max_entradas
+            if excesso > 0:
+                self._conn.execute(
+                    "DELETE FROM cache WHERE rowid IN "
+                    "(SELECT rowid FROM cache ORDER BY acessado ASC LIMIT ?)",
+                    (excesso,),
+                )
+            self._conn.commit()
+
+    def salvar(self):
+        self.despejar()
+
+    def estatisticas(self):
+        hits = sum(self.hits.values())
+        misses = sum(self.misses.values())
+        return {
+            'hits': hits,
+            'misses': misses,
+            'taxa_acerto': hits / (hits + misses) if hits + misses else 0.0,
+            'por_nivel': {
+                nivel: {'hits': self.hits.get(nivel, 0), 'misses': self.misses.get(nivel, 0)}
+                for nivel in sorted(set(self.hits) | set(self.misses))
+            },
+        }
+
+    def fechar(self):
+        with self._lock:
+            self.salvar()
+            self._conn.close()
@@ -0,0 +1,113 @@
+import re
+import unicodedata
+
+
+def normalizar(s):
+    """Remove acentos e pontuação, deixa em maiúsculas com espaços simples"""
+    if not s:
+        return ''
+    s = unicodedata.normalize('NFKD', s)
+    s = ''.join(c for c in s if not unicodedata.combining(c))
+    s = re.sub(r'[^A-Z0-9 ]+', ' ', s.upper())
+    return re.sub(r'\s+', ' ', s).strip()
+
+
+class IndiceModelos:
+    """
+    Índice invertido dos modelos FIPE: token normalizado -> entradas
+    (marca, modelo). Os nomes são normalizados uma única vez na construção,
+    então uma consulta só olha os modelos que compartilham algum token
+    com o termo buscado, sem varrer marca por marca.
+    """
+
+    def __init__(self, marcas, modelos_por_marca):
+        # cada entrada: (marca, modelo_fipe, nome_norm, tokens)
+        self.entradas = []
+        self.por_token = {}
+        self._relacionados = {}
+
+        for marca in marcas:
+            for modelo_fipe in modelos_por_marca.get(marca.get('codigo')) or []:
+                if not modelo_fipe.get('codigo'):
+                    continue
+                nome_norm = normalizar(modelo_fipe.get('nome'))
+                if not nome_norm:
+                    continue
+                tokens = frozenset(nome_norm.split())
+                idx = len(self.entradas)
+                self.entradas.append((marca, modelo_fipe, nome_norm, tokens))
+                for token in tokens:
+                    self.por_token.setdefault(token, []).append(idx)
+
+        self.vocabulario = tuple(self.por_token)
+
+    def __len__(self):
+        return len(self.entradas)
+
+    def _tokens_relacionados(self, token, contidos):
+        """
+        Tokens do vocabulário que contêm `token`; com `contidos`, também os
+        que estão contidos nele (ignorando os de 1 caractere, como "1" ou "V")
+        """
+        chave = (token, contidos)
+        if chave not in self._relacionados:
+            self._relacionados[chave] = [
+                t for t in self.vocabulario
+                if token in t or (contidos and len(t) > 1 and t in token)
+            ]
+        return self._relacionados[chave]
+
+    def _entradas_com(self, tokens, contidos=False):
+        idxs = set()
+        for token in tokens:
+            for relacionado in self._tokens_relacionados(token, contidos):
+                idxs.update(self.por_token[relacionado])
+        return idxs
+
+    @staticmethod
+    def _pontuar(tokens_termo, tokens_nome):
+        if not tokens_termo:
+            return 0.0
+        return len(tokens_termo & tokens_nome) / len(tokens_termo | tokens_nome)
+
+    def candidatos(self, modelo_norm, termo_norm):
+        """
+        Fase forte: modelos cujo nome contém o modelo buscado (ou vice-versa),
+        ordenados pela semelhança com o termo completo (modelo + versão).
+        Retorna lista de (marca, modelo_fipe).
+        """
+        if not modelo_norm:
+            return []
+
+        tokens_termo = frozenset(termo_norm.split())
+        achados = []
+        for idx in self._entradas_com(modelo_norm.split(), contidos=True):
+            marca, modelo_fipe, nome_norm, tokens = self.entradas[idx]
+            if modelo_norm in nome_norm or nome_norm in modelo_norm:
+                achados.append((-self._pontuar(tokens_termo, tokens), idx))
+
+        achados.sort()
+        return [self.entradas[idx][:2] for _, idx in achados]
+
+    def candidatos_amplos(self, termo_norm, codigos_marcas, ignorar=()):
+        """
+        Fase de fallback: modelos das marcas candidatas que contêm algum
+        token do termo (len > 1), ordenados por semelhança.
+        """
+        tokens_termo = frozenset(t for t in termo_norm.split() if len(t) > 1)
+        codigos_marcas = set(codigos_marcas)
+        ignorar = set(ignorar)
+
+        achados = []
+        for idx in self._entradas_com(tokens_termo):
+            marca, modelo_fipe, nome_norm, tokens = self.entradas[idx]
+            if marca.get('codigo') not in codigos_marcas:
+                continue
+            if (marca.get('codigo'), modelo_fipe.get('codigo')) in ignorar:
+                continue
+            if not any(tok in nome_norm for tok in tokens_termo):
+                continue
+            achados.append((-self._pontuar(tokens_termo, tokens), idx))
+
+        achados.sort()
+        return [self.entradas[idx][:2] for _, idx in achados]
@@ -0,0 +1,167 @@
+"""
+Motor de correspondência anúncio -> modelo FIPE com pontuação vetorizada.
+
+Cada nome de modelo FIPE vira dois vetores (hashing trick, dimensão fixa):
+- tokens ponderados por IDF ("1.0", "COMFORT", "12V", ...), preservando
+  cilindradas com ponto, que a normalização comum quebra em "1 0"
+- trigramas de caracteres de cada token (tolera "HB 20" x "HB20", "XEI" x "XEi")
+
+Uma consulta (ou um lote de consultas) é pontuada contra todos os modelos
+de uma vez com produtos de matrizes NumPy:
+
+    pontuação = cobertura_do_modelo * (0.7 * cos_tokens + 0.3 * cos_trigramas)
+
+onde cobertura_do_modelo é a fração dos trigramas do modelo do anúncio
+("HB20", "ETIOS") presentes no nome FIPE; evita que "COROLLA XEi" ganhe de
+"ETIOS XS" só por compartilhar a versão. A pontuação (0 a 1) é a confiança.
+"""
+
+import math
+import re
+import unicodedata
+import zlib
+
+import numpy as np
+
+DIMENSAO_TOKENS = 1024
+DIMENSAO_TRIGRAMAS = 1024
+PESO_TOKENS = 0.7
+PESO_TRIGRAMAS = 0.3
+CONFIANCA_MINIMA = 0.3
+
+
+def tokenizar(texto):
+    """Tokens em maiúsculas sem acento; '1.0' / '1,0' ficam inteiros"""
+    if not texto:
+        return []
+    texto = unicodedata.normalize('NFKD', str(texto))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c)).upper()
+    return [t.replace(',', '.') for t in re.findall(r'\d+[.,]\d+|[A-Z0-9]+', texto)]
+
+
+def _trigramas(tokens):
+    gramas = set()
+    for token in tokens:
+        marcado = f'#{token}#'
+        gramas.update(marcado[i:i + 3] for i in range(len(marcado) - 2))
+    return gramas
+
+
+def _indice(feature, dimensao):
+    return zlib.crc32(feature.encode('utf-8')) % dimensao
+
+
+class MotorCorrespondencia:
+    """
+    Matrizes pré-calculadas de todos os modelos FIPE (linhas L2-normalizadas)
+    para pontuar consultas em lote. Mesma entrada do IndiceModelos:
+    lista de marcas e {codigo_marca: [modelos]}.
+    """
+
+    def __init__(self, marcas, modelos_por_marca):
+        self.entradas = []
+        tokens_por_entrada = []
+        for marca in marcas:
+            for modelo_fipe in modelos_por_marca.get(marca.get('codigo')) or []:
+                tokens = tokenizar(modelo_fipe.get('nome'))
+                if not modelo_fipe.get('codigo') or not tokens:
+                    continue
+                self.entradas.append((marca, modelo_fipe))
+                tokens_por_entrada.append(set(tokens))
+
+        total = len(self.entradas)
+        frequencia = {}
+        for tokens in tokens_por_entrada:
+            for token in tokens:
+                frequencia[token] = frequencia.get(token, 0) + 1
+        self.idf = {t: math.log((total + 1) / (df + 1)) + 1 for t, df in frequencia.items()}
+        # token fora do catálogo é tratado como o mais raro
+        self.idf_padrao = math.log(total + 1) + 1
+
+        self.tokens = np.zeros((total, DIMENSAO_TOKENS), dtype=np.float32)
+        self.trigramas = np.zeros((total, DIMENSAO_TRIGRAMAS), dtype=np.float32)
+        for linha, tokens in enumerate(tokens_por_entrada):
+            self._preencher_tokens(self.tokens[linha], tokens)
+            for grama in _trigramas(tokens):
+                self.trigramas[linha, _indice(grama, DIMENSAO_TRIGRAMAS)] = 1.0
+
+        self._normalizar(self.tokens)
+        self.normas_trigramas = np.linalg.norm(self.trigramas, axis=1)
+        self.normas_trigramas[self.normas_trigramas == 0] = 1.0
+
+    def __len__(self):
+        return len(self.entradas)
+
+    def _preencher_tokens(self, vetor, tokens):
+        for token in tokens:
+            vetor[_indice(token, DIMENSAO_TOKENS)] += self.idf.get(token, self.idf_padrao)
+
+    @staticmethod
+    def _normalizar(matriz):
+        normas = np.linalg.norm(matriz, axis=1, keepdims=True)
+        normas[normas == 0] = 1.0
+        matriz /= normas
+
+    def _vetores_consulta(self, consultas):
+        qtd = len(consultas)
+        tokens = np.zeros((qtd, DIMENSAO_TOKENS), dtype=np.float32)
+        trigramas = np.zeros((qtd, DIMENSAO_TRIGRAMAS), dtype=np.float32)
+        trigramas_modelo = np.zeros((qtd, DIMENSAO_TRIGRAMAS), dtype=np.float32)
+        for linha, (modelo, termo) in enumerate(consultas):
+            tokens_termo = set(tokenizar(termo))
+            self._preencher_tokens(tokens[linha], tokens_termo)
+            for grama in _trigramas(tokens_termo):
+                trigramas[linha, _indice(grama, DIMENSAO_TRIGRAMAS)] = 1.0
+            for grama in _trigramas(tokenizar(modelo)):
+                trigramas_modelo[linha, _indice(grama, DIMENSAO_TRIGRAMAS)] = 1.0
+        self._normalizar(tokens)
+        return tokens, trigramas, trigramas_modelo
+
+    def pontuar_lote(self, consultas):
+        """
+        consultas: [(modelo, termo)], ex: ('HB20', 'HB20 1.0 COMFORT 12V').
+        Retorna matriz (consultas x modelos FIPE) com as pontuações de 0 a 1.
+        """
+        if not consultas or not self.entradas:
+            return np.zeros((len(consultas), len(self.entradas)), dtype=np.float32)
+
+        tokens, trigramas, trigramas_modelo = self._vetores_consulta(consultas)
+        cos_tokens = tokens @ self.tokens.T
+
+        comuns = trigramas @ self.trigramas.T
+        normas_consulta = np.linalg.norm(trigramas, axis=1, keepdims=True)
+        normas_consulta[normas_consulta == 0] = 1.0
+        cos_trigramas = comuns / (normas_consulta * self.normas_trigramas)
+
+        qtd_modelo = trigramas_modelo.sum(axis=1, keepdims=True)
+        qtd_modelo[qtd_modelo == 0] = 1.0
+        cobertura = (trigramas_modelo @ self.trigramas.T) / qtd_modelo
+
+        return cobertura * (PESO_TOKENS * cos_tokens + PESO_TRIGRAMAS * cos_trigramas)
+
+    def ranquear_lote(self, consultas, limite=10, minimo=CONFIANCA_MINIMA):
+        """
+        Para cada consulta, os `limite` melhores modelos com pontuação >= minimo:
+        [[(marca, modelo_fipe, confianca), ...], ...] do melhor para o pior.
+        """
+        pontuacoes = self.pontuar_lote(consultas)
+        rankings = []
+        for linha in pontuacoes:
+            if len(linha) > limite:
+                melhores = np.argpartition(-linha, limite - 1)[:limite]
+            else:
+                melhores = np.arange(len(linha))
+            melhores = melhores[np.argsort(-linha[melhores], kind='stable')]
+            rankings.append([
+                (*self.entradas[idx], round(float(linha[idx]), 3))
+                for idx in melhores if linha[idx] >= minimo
+            ])
+        return rankings
+
+    def ranquear(self, modelo, termo, limite=10, minimo=CONFIANCA_MINIMA):
+        return self.ranquear_lote([(modelo, termo)], limite, minimo)[0]
+
+    def melhor(self, modelo, termo):
+        """(marca, modelo_fipe, confianca) da melhor correspondência, ou None"""
+        ranking = self.ranquear(modelo, termo, limite=1)
+        return ranking[0] if ranking else None
@@ -1,18 +1,285 @@
-import requests
+import os
+import threading
 import difflib
-import unicodedata
-import re
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+
+from services.fipe_cache import CacheFipe
+from services.fipe_indice import IndiceModelos, normalizar as _norm
+from services.fipe_tabela import TabelaFipe
+from services.http_client import requisitar
+from services.metricas import metricas
+
+BASE_FIPE = 'https://parallelum.com.br/fipe/api/v1/carros'
+CAMINHO_CACHE_FIPE = os.getenv('FIPE_CACHE_PATH', 'fipe_cache.sqlite3')
+# Tabela do mês importada com `python -m services.fipe_tabela` (opcional)
+CAMINHO_TABELA_FIPE = os.getenv('FIPE_TABLE_PATH', 'fipe_tabela.sqlite3')
+MAX_REQUISICOES = 120
+# Motor vetorizado (NumPy): acerta mais variações de escrita que o índice
+# invertido, mas é mais lento por consulta (benchmarks: matcher_*). Quando
+# ligado, um miss ainda cai na heurística do índice.
+USAR_MOTOR_VETORIZADO = os.getenv('FIPE_MOTOR_VETORIZADO', '') == '1'
+# Modelos FIPE mais bem pontuados testados por consulta (motor vetorizado)
+LIMITE_CANDIDATOS = 10
+
+# Cache persistente em disco, compartilhado entre execuções
+_cache = None
+_cache_lock = threading.Lock()
+
+# Tabela FIPE local; False = arquivo ausente (consulta só cache/API).
+# Reaberta quando o arquivo muda (mtime), ex.: importação do novo mês
+_tabela = None
+_versao_tabela = None
+
+# Índice invertido dos modelos FIPE e, com USAR_MOTOR_VETORIZADO, o motor
+# vetorizado, montados uma vez por processo
+_indice = None
+_indice_motor = None
+_indice_lock = threading.Lock()
+
+# Classe do motor vetorizado, importada (com o NumPy) só ao montar o índice;
+# None = ainda não importada, False = NumPy ausente (fica com o índice invertido)
+_motor = None
+
+# Sentinela: limite de requisições por consulta atingido
+_LIMITE = object()
+
+
+def obter_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            with metricas.medir('inicializacao', servico='cache_fipe'):
+                _cache = CacheFipe(CAMINHO_CACHE_FIPE)
+    return _cache
+
+
+def obter_tabela():
+    """Tabela FIPE offline, ou None se não foi importada; recarregada se o arquivo mudou"""
+    global _tabela, _versao_tabela
+    try:
+        versao = os.stat(CAMINHO_TABELA_FIPE).st_mtime_ns
+    except OSError:
+        versao = None
+    with _cache_lock:
+        if _tabela is None or versao != _versao_tabela:
+            # sem fechar a anterior: outra thread pode estar consultando
+            with metricas.medir('inicializacao', servico='tabela_fipe'):
+                _tabela = TabelaFipe(CAMINHO_TABELA_FIPE) if versao is not None else False
+            _versao_tabela = versao
+    return _tabela or None
+
+
+def _classe_motor():
+    """MotorCorrespondencia, ou None se o NumPy não estiver instalado"""
+    global _motor
+    if _motor is None:
+        try:
+            from services.fipe_matcher import MotorCorrespondencia
+            _motor = MotorCorrespondencia
+        except ImportError:
+            _motor = False
+    return _motor or None
+
+
+def salvar_cache():
+    """Aplica a política de despejo e persiste o cache FIPE"""
+    if _cache is not None:
+        _cache.salvar()
+
+
+def _buscar(nivel, chave, url, estado):
+    """
+    Consulta a tabela offline, o cache e, em caso de miss, a API FIPE.
+    Retorna os dados, None se a API falhou ou _LIMITE se o limite estourou.
+    """
+    tabela = obter_tabela()
+    if tabela is not None and not tabela.vigente:
+        # tabela de mês anterior: vale o cache / a API até a próxima importação
+        metricas.contar('fipe_tabela', nivel=nivel, resultado='desatualizada')
+    elif tabela is not None:
+        dados = tabela.consultar(nivel, chave)
+        metricas.contar('fipe_tabela', nivel=nivel, resultado='hit' if dados is not None else 'miss')
+        if dados is not None:
+            return dados
+
+    cache = obter_cache()
+    dados = cache.obter(nivel, chave)
+    if dados is not None:
+        return dados
+
+    if estado['requisicoes'] >= MAX_REQUISICOES:
+        estado['limite'] = True
+        metricas.contar('fipe_limite_atingido', nivel=nivel)
+        return _LIMITE
+    with metricas.medir('fipe_http', nivel=nivel):
+        r = requisitar('GET', url, timeout=10)
+    estado['requisicoes'] += 1
+    host = urlsplit(url).netloc
+    metricas.contar('http_requisicoes', host=host, status=r.status_code)
+    metricas.contar('http_bytes', len(r.content), host=host)
+    if r.status_code != 200:
+        return None
+
+    dados = r.json()
+    cache.gravar(nivel, chave, dados)
+    return dados
+
+
+def _modelos_da_marca(codigo_marca, estado):
+    dados = _buscar('modelos', codigo_marca, f'{BASE_FIPE}/marcas/{codigo_marca}/modelos', estado)
+    if dados is _LIMITE or dados is None:
+        return dados
+    return dados.get('modelos', [])
+
+
+def _valor_por_ano(marca, modelo_fipe, ano_str, estado):
+    """Procura o ano do modelo e retorna o resultado FIPE, None ou _LIMITE"""
+    codigo_marca = marca.get('codigo')
+    codigo_modelo = modelo_fipe.get('codigo')
+    chave_modelo = f'{codigo_marca}/{codigo_modelo}'
+
+    url_modelo = f'{BASE_FIPE}/marcas/{codigo_marca}/modelos/{codigo_modelo}'
+
+    anos = _buscar('anos', chave_modelo, f'{url_modelo}/anos', estado)
+    if anos is _LIMITE or anos is None:
+        return anos
+
+    for ano in anos:
+        nome_ano = ano.get('nome', '')
+        codigo_ano = ano.get('codigo')
+        if ano_str and ano_str in nome_ano:
+            fonte_url = f'{url_modelo}/anos/{codigo_ano}'
+            detalhe = _buscar('valor', f'{chave_modelo}/{codigo_ano}', fonte_url, estado)
+            if detalhe is _LIMITE:
+                return _LIMITE
+            if detalhe is not None:
+                return {
+                    'valor': detalhe.get('Valor'),
+                    'fonte': fonte_url,
+                    'marca': marca.get('nome'),
+                    'modelo_fipe': modelo_fipe.get('nome'),
+                    'ano_nome': nome_ano,
+                }
+    return None
+
+
+def obter_indice(marcas):
+    """
+    Monta (ou reaproveita) o índice invertido de modelos de todas as marcas.
+    As listas de modelos vêm do cache em disco; se o limite de requisições
+    impedir alguma marca, o índice é refeito na próxima consulta.
+    """
+    with _indice_lock:
+        if _indice is not None:
+            return _indice
+        return _montar_indice(marcas)
+
+
+def obter_motor(marcas):
+    """Como obter_indice, para o motor vetorizado; None se desligado ou sem NumPy"""
+    if not USAR_MOTOR_VETORIZADO or _classe_motor() is None:
+        return None
+    with _indice_lock:
+        if _indice_motor is not None:
+            return _indice_motor
+        return _montar_indice(marcas, vetorizado=True)
+
+
+def _modelos_por_marca(marcas):
+    """({codigo_marca: [modelos]}, completo), completo=False se o limite cortou alguma marca"""
+    estado = {'requisicoes': 0, 'limite': False}
+    modelos_por_marca = {}
+    completo = True
+    for marca in marcas:
+        codigo_marca = marca.get('codigo')
+        if codigo_marca is None:
+            continue
+        modelos = _modelos_da_marca(codigo_marca, estado)
+        if modelos is _LIMITE:
+            completo = False
+            continue
+        modelos_por_marca[codigo_marca] = modelos or []
+    return modelos_por_marca, completo
 
-import requests
-import difflib
-import unicodedata
-import re
 
-# Cache em memória para a execução atual
-_fipe_cache = {
-    'marcas': None,
-    'modelos_por_marca': {}
-}
+def _montar_indice(marcas, vetorizado=False):
+    global _indice, _indice_motor
+    modelos_por_marca, completo = _modelos_por_marca(marcas)
+    with metricas.medir('inicializacao', servico='motor_fipe' if vetorizado else 'indice_fipe'):
+        if vetorizado:
+            indice = _classe_motor()(marcas, modelos_por_marca)
+        else:
+            indice = IndiceModelos(marcas, modelos_por_marca)
+    if completo:
+        if vetorizado:
+            _indice_motor = indice
+        else:
+            _indice = indice
+    return indice
+
+
+def chave_fipe(modelo, versao, ano_modelo):
+    """Chave normalizada (termo, ano) que identifica uma consulta FIPE"""
+    termo_norm = f"{_norm(modelo)} {_norm(versao)}".strip()
+    ano_str = str(ano_modelo) if ano_modelo is not None else ''
+    return termo_norm, ano_str
+
+
+def resolver_fipe_em_lote(consultas, max_workers=4):
+    """
+    Resolve várias consultas FIPE de uma vez.
+    consultas: lista de (modelo, versao, ano_modelo)
+    Agrupa as consultas pela chave normalizada, resolve cada chave única uma
+    única vez (em paralelo) e devolve (resultados, estatisticas), com os
+    resultados na mesma ordem das consultas.
+    Consultas sem modelo (ou com chave inválida) dão None, como em
+    obter_valor_fipe, e não entram nas contagens.
+    """
+    consultas = list(consultas)
+    unicas = {}
+    chaves = []
+    for modelo, versao, ano_modelo in consultas:
+        chave = None
+        if modelo:
+            try:
+                chave = chave_fipe(modelo, versao, ano_modelo)
+            except Exception:
+                chave = None
+        chaves.append(chave)
+        if chave is not None:
+            unicas.setdefault(chave, (modelo, versao, ano_modelo))
+
+    resolvidos = {}
+    pendentes = {}
+    for chave, consulta in unicas.items():
+        em_cache, resultado = _resultado_em_cache(*chave)
+        if em_cache:
+            resolvidos[chave] = resultado
+        else:
+            pendentes[chave] = consulta
+
+    if pendentes:
+        rankings = _ranquear_lote(pendentes)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futuros = {
+                chave: executor.submit(_resolver_e_gravar, *consulta, *chave, rankings.get(chave))
+                for chave, consulta in pendentes.items()
+            }
+            resolvidos.update({chave: futuro.result() for chave, futuro in futuros.items()})
+
+    validas = sum(1 for chave in chaves if chave is not None)
+    estatisticas = {
+        'consultas': validas,
+        'unicas': len(unicas),
+        'economizadas': validas - len(unicas),
+        'ignoradas': len(consultas) - validas,
+    }
+    resultados = [
+        dict(resolvidos[chave]) if chave is not None and resolvidos[chave] else None
+        for chave in chaves
+    ]
+    return resultados, estatisticas
 
 
 def obter_valor_fipe(modelo, versao, ano_modelo):
@@ -20,169 +287,165 @@ def obter_valor_fipe(modelo, versao, ano_modelo):
     Tenta obter o Valor FIPE para o veículo informado.
     modelo, versao: strings (ex: 'ETIOS', '1.5')
     ano_modelo: ano como inteiro ou string (ex: 2016)
-    Retorna dict com 'valor' e 'fonte' e metadados, ou None se não encontrado.
+    Retorna dict com 'valor' e 'fonte' e metadados (e 'confianca' da
+    correspondência, com o motor vetorizado), ou None se não encontrado.
     """
+    # require at least a model name
+    if not modelo:
+        return None
+
     try:
-        # require at least a model name
-        if not modelo:
-            return None
+        termo_norm, ano_str = chave_fipe(modelo, versao, ano_modelo)
+        em_cache, resultado = _resultado_em_cache(termo_norm, ano_str)
+    except Exception:
+        return None
+    if em_cache:
+        return resultado
+    return _resolver_e_gravar(modelo, versao, ano_modelo, termo_norm, ano_str)
 
-        base = 'https://parallelum.com.br/fipe/api/v1/carros'
-
-        def _norm(s):
-            if not s:
-                return ''
-            s = unicodedata.normalize('NFKD', s)
-            s = ''.join(c for c in s if not unicodedata.combining(c))
-            s = re.sub(r'[^A-Z0-9 ]+', ' ', s.upper())
-            return re.sub(r'\s+', ' ', s).strip()
-
-        modelo_norm = _norm(modelo)
-        versao_norm = _norm(versao)
-        termo_norm = f"{modelo_norm} {versao_norm}".strip()
-        ano_str = str(ano_modelo) if ano_modelo is not None else ''
-
-        # carregar marcas (cache)
-        if _fipe_cache['marcas'] is None:
-            r = requests.get(f'{base}/marcas', timeout=10)
-            r.raise_for_status()
-            _fipe_cache['marcas'] = r.json()
-
-        marcas = _fipe_cache['marcas'] or []
-
-        max_requests = 120
-        req_count = 0
-
-        # 1) Procurar fortemente pelo modelo entre os modelos FIPE (varre marcas até achar)
-        for marca in marcas:
-            codigo_marca = marca.get('codigo')
-            if codigo_marca is None:
-                continue
-
-            if codigo_marca not in _fipe_cache['modelos_por_marca']:
-                if req_count >= max_requests:
-                    break
-                r = requests.get(f'{base}/marcas/{codigo_marca}/modelos', timeout=10)
-                req_count += 1
-                if r.status_code != 200:
-                    _fipe_cache['modelos_por_marca'][codigo_marca] = []
-                else:
-                    _fipe_cache['modelos_por_marca'][codigo_marca] = r.json().get('modelos', [])
-
-            modelos = _fipe_cache['modelos_por_marca'].get(codigo_marca, [])
-
-            for modelo_fipe in modelos:
-                nome_modelo_fipe = modelo_fipe.get('nome') or ''
-                nome_norm = _norm(nome_modelo_fipe)
-
-                if modelo_norm and (modelo_norm in nome_norm or nome_norm in modelo_norm):
-                    codigo_modelo = modelo_fipe.get('codigo')
-                    if not codigo_modelo:
-                        continue
-
-                    # obter anos disponíveis
-                    if req_count >= max_requests:
-                        break
-                    r_anos = requests.get(f'{base}/marcas/{codigo_marca}/modelos/{codigo_modelo}/anos', timeout=10)
-                    req_count += 1
-                    if r_anos.status_code != 200:
-                        continue
-                    anos = r_anos.json()
-
-                    for ano in anos:
-                        nome_ano = ano.get('nome', '')
-                        codigo_ano = ano.get('codigo')
-                        if ano_str and ano_str in nome_ano:
-                            fonte_url = f'{base}/marcas/{codigo_marca}/modelos/{codigo_modelo}/anos/{codigo_ano}'
-                            if req_count >= max_requests:
-                                break
-                            r_val = requests.get(fonte_url, timeout=10)
-                            req_count += 1
-                            if r_val.status_code == 200:
-                                detalhe = r_val.json()
-                                return {
-                                    'valor': detalhe.get('Valor'),
-                                    'fonte': fonte_url,
-                                    'marca': marca.get('nome'),
-                                    'modelo_fipe': modelo_fipe.get('nome'),
-                                    'ano_nome': nome_ano,
-                                }
-
-        # 2) Fallback: heurística mais ampla (mantida para casos onde modelo não bate exatamente)
-        lista_nomes_marcas = [m.get('nome', '').upper() for m in marcas if m.get('nome')]
-        candidatos = []
-        termo_upper = termo_norm.upper()
-        for m in marcas:
-            nome_m = (m.get('nome') or '').upper()
-            if not nome_m:
-                continue
-            if nome_m in termo_upper or any(token in nome_m for token in termo_upper.split() if len(token) > 2):
-                candidatos.append(m)
-
-        if not candidatos:
-            modelos_possiveis = difflib.get_close_matches(termo_upper.split()[0] if termo_upper else '', lista_nomes_marcas, n=5, cutoff=0.6)
-            if modelos_possiveis:
-                for nm in modelos_possiveis:
-                    for m in marcas:
-                        if (m.get('nome') or '').upper() == nm:
-                            candidatos.append(m)
-
-        if not candidatos:
-            candidatos = marcas[:10]
-
-        for marca in candidatos:
-            codigo_marca = marca.get('codigo')
-            if codigo_marca is None:
-                continue
-            if codigo_marca not in _fipe_cache['modelos_por_marca']:
-                if req_count >= max_requests:
-                    break
-                r = requests.get(f'{base}/marcas/{codigo_marca}/modelos', timeout=10)
-                req_count += 1
-                if r.status_code != 200:
-                    _fipe_cache['modelos_por_marca'][codigo_marca] = []
-                else:
-                    _fipe_cache['modelos_por_marca'][codigo_marca] = r.json().get('modelos', [])
-
-            modelos = _fipe_cache['modelos_por_marca'].get(codigo_marca, [])
-            for modelo_fipe in modelos:
-                nome_modelo_fipe = (modelo_fipe.get('nome') or '').upper()
-                if not nome_modelo_fipe:
-                    continue
-                if termo_upper.strip():
-                    termo_tokens = [t for t in termo_upper.split() if len(t) > 1]
-                    if not any(tok in nome_modelo_fipe for tok in termo_tokens):
-                        continue
-
-                codigo_modelo = modelo_fipe.get('codigo')
-                if not codigo_modelo:
-                    continue
-                if req_count >= max_requests:
-                    break
-                r_anos = requests.get(f'{base}/marcas/{codigo_marca}/modelos/{codigo_modelo}/anos', timeout=10)
-                req_count += 1
-                if r_anos.status_code != 200:
-                    continue
-                anos = r_anos.json()
-                for ano in anos:
-                    nome_ano = ano.get('nome', '')
-                    codigo_ano = ano.get('codigo')
-                    if ano_str and ano_str in nome_ano:
-                        fonte_url = f'{base}/marcas/{codigo_marca}/modelos/{codigo_modelo}/anos/{codigo_ano}'
-                        if req_count >= max_requests:
-                            break
-                        r_val = requests.get(fonte_url, timeout=10)
-                        req_count += 1
-                        if r_val.status_code == 200:
-                            detalhe = r_val.json()
-                            return {
-                                'valor': detalhe.get('Valor'),
-                                'fonte': fonte_url,
-                                'marca': marca.get('nome'),
-                                'modelo_fipe': modelo_fipe.get('nome'),
-                                'ano_nome': nome_ano,
-                            }
 
-        return None
+def _resultado_em_cache(termo_norm, ano_str):
+    """Resultado final já resolvido em execuções anteriores: (encontrado, resultado)"""
+    cache = obter_cache()
+    chave_resultado = f'{termo_norm}|{ano_str}'
+    resultado = cache.obter('resultado', chave_resultado)
+    if resultado is not None:
+        metricas.contar('fipe_consultas', origem='cache')
+        return True, resultado
+    if cache.obter('resultado_vazio', chave_resultado) is not None:
+        metricas.contar('fipe_consultas', origem='cache_vazio')
+        return True, None
+    return False, None
+
+
+def _ranquear_lote(consultas):
+    """
+    Pontua de uma vez todas as consultas pendentes contra os modelos FIPE.
+    consultas: {chave: (modelo, versao, ano_modelo)}. Retorna {chave: ranking},
+    vazio se o motor vetorizado estiver desligado ou indisponível.
+    """
+    if not USAR_MOTOR_VETORIZADO or _classe_motor() is None:
+        return {}
+    try:
+        estado = {'requisicoes': 0, 'limite': False}
+        marcas = _buscar('marcas', 'todas', f'{BASE_FIPE}/marcas', estado)
+        if marcas is None or marcas is _LIMITE:
+            return {}
+        motor = obter_motor(marcas)
+        if motor is None:
+            return {}
+        chaves = list(consultas)
+        with metricas.medir('fipe_pontuacao_lote'):
+            rankings = motor.ranquear_lote(
+                [(consultas[c][0], f"{consultas[c][0]} {consultas[c][1] or ''}") for c in chaves],
+                limite=LIMITE_CANDIDATOS,
+            )
+        return dict(zip(chaves, rankings))
+    except Exception:
+        return {}
+
+
+def _resolver_e_gravar(modelo, versao, ano_modelo, termo_norm, ano_str, ranking=None):
+    """Resolve pela API/tabela (fora do cache de resultados) e memoriza o resultado"""
+    try:
+        cache = obter_cache()
+        chave_resultado = f'{termo_norm}|{ano_str}'
+        estado = {'requisicoes': 0, 'limite': False}
+        with metricas.medir('fipe_resolver'):
+            resultado = _resolver(modelo, versao, termo_norm, ano_str, estado, ranking)
+        metricas.contar('fipe_consultas', origem='api')
+        metricas.contar('fipe_requisicoes_api', estado['requisicoes'])
+        if resultado is None:
+            # só memoriza a ausência se a busca não foi interrompida pelo limite
+            if not estado['limite']:
+                cache.gravar('resultado_vazio', chave_resultado, True)
+        else:
+            cache.gravar('resultado', chave_resultado, resultado)
+        return resultado
     except Exception:
         return None
+
+
+def _resolver_por_pontuacao(ranking, ano_str, estado, tentados):
+    """Testa os modelos na ordem de pontuação até achar o ano informado"""
+    for marca, modelo_fipe, confianca in ranking:
+        tentados.add((marca.get('codigo'), modelo_fipe.get('codigo')))
+        resultado = _valor_por_ano(marca, modelo_fipe, ano_str, estado)
+        if resultado is _LIMITE:
+            return None
+        if resultado:
+            return {**resultado, 'confianca': confianca}
+    return None
+
+
+def _resolver(modelo, versao, termo_norm, ano_str, estado, ranking=None):
+    """Varre marcas/modelos FIPE (tabela + cache + API) até achar o ano informado"""
+    # carregar marcas (cache)
+    marcas = _buscar('marcas', 'todas', f'{BASE_FIPE}/marcas', estado)
+    if marcas is None or marcas is _LIMITE:
+        raise RuntimeError('Falha ao carregar marcas FIPE')
+
+    tentados = set()
+    motor = obter_motor(marcas)
+    if motor is not None:
+        if ranking is None:
+            ranking = motor.ranquear(modelo, f"{modelo} {versao or ''}", limite=LIMITE_CANDIDATOS)
+        resultado = _resolver_por_pontuacao(ranking, ano_str, estado, tentados)
+        if resultado is not None or estado['limite']:
+            return resultado
+        # nenhum candidato do motor tem o ano: segue pela heurística do índice
+        metricas.contar('fipe_motor_fallback')
+
+    indice = obter_indice(marcas)
+    modelo_norm = _norm(modelo)
+
+    # 1) Procurar fortemente pelo modelo entre os modelos FIPE (via índice)
+    for marca, modelo_fipe in indice.candidatos(modelo_norm, termo_norm):
+        chave = (marca.get('codigo'), modelo_fipe.get('codigo'))
+        if chave in tentados:
+            continue
+        tentados.add(chave)
+
+        # obter anos disponíveis
+        resultado = _valor_por_ano(marca, modelo_fipe, ano_str, estado)
+        if resultado is _LIMITE:
+            break
+        if resultado:
+            return resultado
+
+    # 2) Fallback: heurística mais ampla (mantida para casos onde modelo não bate exatamente)
+    codigos_candidatos = _marcas_candidatas(marcas, termo_norm)
+    for marca, modelo_fipe in indice.candidatos_amplos(termo_norm, codigos_candidatos, tentados):
+        resultado = _valor_por_ano(marca, modelo_fipe, ano_str, estado)
+        if resultado is _LIMITE:
+            break
+        if resultado:
+            return resultado
+
+    return None
+
+
+def _marcas_candidatas(marcas, termo_norm):
+    """Códigos das marcas em que a fase ampla do índice invertido procura o termo"""
+    lista_nomes_marcas = [m.get('nome', '').upper() for m in marcas if m.get('nome')]
+    candidatos = []
+    termo_upper = termo_norm.upper()
+    for m in marcas:
+        nome_m = (m.get('nome') or '').upper()
+        if not nome_m:
+            continue
+        if nome_m in termo_upper or any(token in nome_m for token in termo_upper.split() if len(token) > 2):
+            candidatos.append(m)
+
+    if not candidatos:
+        modelos_possiveis = difflib.get_close_matches(termo_upper.split()[0] if termo_upper else '', lista_nomes_marcas, n=5, cutoff=0.6)
+        if modelos_possiveis:
+            for nm in modelos_possiveis:
+                for m in marcas:
+                    if (m.get('nome') or '').upper() == nm:
+                        candidatos.append(m)
+
+    if not candidatos:
+        candidatos = marcas[:10]
+
+    return [m.get('codigo') for m in candidatos if m.get('codigo') is not None]
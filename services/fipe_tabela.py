@@ -0,0 +1,410 @@
+"""
+Tabela FIPE local (SQLite) do mês de referência: marca -> modelo -> ano -> valor.
+
+Importação (incremental: retoma de onde parou se interrompida):
+
+    python -m services.fipe_tabela [--saida fipe_tabela.sqlite3]
+                                   [--json dump.json] [--limite N] [--workers 8]
+
+Sem --json, baixa tudo da API (parallelum). Com --json, importa um dump
+em lista de objetos com: codigo_marca, marca, codigo_modelo, modelo,
+codigo_ano, ano, valor e, opcionais, codigo_fipe, combustivel, mes_referencia.
+
+fipe_service consulta esta tabela antes do cache e da API, então com a
+tabela completa o enriquecimento de uma varredura roda só com consultas locais.
+Uma tabela de mês anterior não é consultada; a importação seguinte a refaz
+para o mês corrente.
+"""
+
+import argparse
+import json
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from services.http_client import requisitar
+
+MESES = (
+    'janeiro', 'fevereiro', 'março', 'abril', 'maio', 'junho',
+    'julho', 'agosto', 'setembro', 'outubro', 'novembro', 'dezembro',
+)
+
+
+def referencia_atual(hoje=None):
+    """Mês corrente no formato do MesReferencia da API: 'outubro de 2026'"""
+    hoje = hoje or date.today()
+    return f"{MESES[hoje.month - 1]} de {hoje.year}"
+
+
+def _mesmo_mes(referencia, outra):
+    # a API devolve 'outubro de 2026 ' (com espaço e caixa variáveis)
+    normalizar = lambda texto: ' '.join(str(texto).lower().split())  # noqa: E731
+    return referencia is not None and outra is not None and normalizar(referencia) == normalizar(outra)
+
+
+class TabelaFipe:
+    """
+    Tabela FIPE em SQLite, devolvendo os dados no mesmo formato da API
+    (marcas, modelos, anos e valor), para servir de fonte offline.
+    Um modelo só é considerado importado quando todos os seus anos foram gravados.
+    """
+
+    def __init__(self, caminho='fipe_tabela.sqlite3'):
+        self.caminho = caminho
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(caminho, check_same_thread=False)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS meta ("
+            " chave TEXT PRIMARY KEY,"
+            " valor TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS marcas ("
+            " codigo PRIMARY KEY,"
+            " nome TEXT NOT NULL,"
+            " modelos_importados INTEGER NOT NULL DEFAULT 0) WITHOUT ROWID;"
+            "CREATE TABLE IF NOT EXISTS modelos ("
+            " codigo_marca NOT NULL,"
+            " codigo NOT NULL,"
+            " nome TEXT NOT NULL,"
+            " completo INTEGER NOT NULL DEFAULT 0,"
+            " PRIMARY KEY (codigo_marca, codigo)) WITHOUT ROWID;"
+            "CREATE TABLE IF NOT EXISTS anos ("
+            " codigo_marca NOT NULL,"
+            " codigo_modelo NOT NULL,"
+            " codigo NOT NULL,"
+            " nome TEXT NOT NULL,"
+            " valor TEXT,"
+            " codigo_fipe TEXT,"
+            " combustivel TEXT,"
+            " PRIMARY KEY (codigo_marca, codigo_modelo, codigo)) WITHOUT ROWID;"
+        )
+        self._conn.commit()
+        self._referencia = self._meta('referencia')
+
+    def _meta(self, chave):
+        with self._lock:
+            linha = self._conn.execute("SELECT valor FROM meta WHERE chave = ?", (chave,)).fetchone()
+        return linha[0] if linha else None
+
+    # --- leitura no formato da API ---
+
+    @property
+    def referencia(self):
+        return self._referencia
+
+    @property
+    def vigente(self):
+        """A tabela é do mês corrente (senão fipe_service não a consulta)"""
+        return _mesmo_mes(self._referencia, referencia_atual())
+
+    def marcas(self):
+        with self._lock:
+            linhas = self._conn.execute("SELECT codigo, nome FROM marcas ORDER BY nome").fetchall()
+        return [{'codigo': codigo, 'nome': nome} for codigo, nome in linhas] or None
+
+    def modelos(self, codigo_marca):
+        with self._lock:
+            importada = self._conn.execute(
+                "SELECT modelos_importados FROM marcas WHERE codigo = ?", (str(codigo_marca),)
+            ).fetchone()
+            if not importada or not importada[0]:
+                return None
+            linhas = self._conn.execute(
+                "SELECT codigo, nome FROM modelos WHERE codigo_marca = ? ORDER BY nome",
+                (str(codigo_marca),),
+            ).fetchall()
+        return {'modelos': [{'codigo': codigo, 'nome': nome} for codigo, nome in linhas], 'anos': []}
+
+    def anos(self, codigo_marca, codigo_modelo):
+        with self._lock:
+            completo = self._conn.execute(
+                "SELECT completo FROM modelos WHERE codigo_marca = ? AND codigo = ?",
+                (str(codigo_marca), _codigo(codigo_modelo)),
+            ).fetchone()
+            if not completo or not completo[0]:
+                return None
+            linhas = self._conn.execute(
+                "SELECT codigo, nome FROM anos WHERE codigo_marca = ? AND codigo_modelo = ? "
+                "ORDER BY codigo DESC",
+                (str(codigo_marca), _codigo(codigo_modelo)),
+            ).fetchall()
+        return [{'codigo': codigo, 'nome': nome} for codigo, nome in linhas]
+
+    def valor(self, codigo_marca, codigo_modelo, codigo_ano):
+        with self._lock:
+            linha = self._conn.execute(
+                "SELECT a.valor, a.codigo_fipe, a.combustivel, a.nome, m.nome, mo.nome "
+                "FROM anos a JOIN marcas m ON m.codigo = a.codigo_marca "
+                "JOIN modelos mo ON mo.codigo_marca = a.codigo_marca AND mo.codigo = a.codigo_modelo "
+                "WHERE a.codigo_marca = ? AND a.codigo_modelo = ? AND a.codigo = ?",
+                (str(codigo_marca), _codigo(codigo_modelo), str(codigo_ano)),
+            ).fetchone()
+        if linha is None or linha[0] is None:
+            return None
+        valor, codigo_fipe, combustivel, nome_ano, marca, modelo = linha
+        ano_modelo = str(codigo_ano).split('-')[0]
+        return {
+            'Valor': valor,
+            'Marca': marca,
+            'Modelo': modelo,
+            'AnoModelo': int(ano_modelo) if ano_modelo.isdigit() else nome_ano,
+            'Combustivel': combustivel,
+            'CodigoFipe': codigo_fipe,
+            'MesReferencia': self.referencia,
+        }
+
+    def consultar(self, nivel, chave):
+        """
+        Mesmo par (nivel, chave) usado pelo cache do fipe_service.
+        Retorna os dados no formato da API ou None se a tabela não cobre.
+        """
+        if nivel == 'marcas':
+            return self.marcas()
+        partes = str(chave).split('/')
+        if nivel == 'modelos':
+            return self.modelos(partes[0])
+        if nivel == 'anos' and len(partes) == 2:
+            return self.anos(*partes)
+        if nivel == 'valor' and len(partes) == 3:
+            return self.valor(*partes)
+        return None
+
+    def estatisticas(self):
+        with self._lock:
+            contar = lambda sql: self._conn.execute(sql).fetchone()[0]  # noqa: E731
+            return {
+                'referencia': self.referencia,
+                'marcas': contar("SELECT COUNT(*) FROM marcas"),
+                'modelos': contar("SELECT COUNT(*) FROM modelos"),
+                'modelos_completos': contar("SELECT COUNT(*) FROM modelos WHERE completo = 1"),
+                'valores': contar("SELECT COUNT(*) FROM anos WHERE valor IS NOT NULL"),
+            }
+
+    # --- escrita ---
+
+    def gravar_marcas(self, marcas):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO marcas (codigo, nome) VALUES (?, ?) "
+                "ON CONFLICT (codigo) DO UPDATE SET nome = excluded.nome",
+                [(str(m['codigo']), m['nome']) for m in marcas],
+            )
+
+    def gravar_modelos(self, codigo_marca, modelos):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO modelos (codigo_marca, codigo, nome) VALUES (?, ?, ?)",
+                [(str(codigo_marca), _codigo(m['codigo']), m['nome']) for m in modelos],
+            )
+            self._conn.execute(
+                "UPDATE marcas SET modelos_importados = 1 WHERE codigo = ?", (str(codigo_marca),)
+            )
+
+    def gravar_anos(self, codigo_marca, codigo_modelo, anos, completo=True):
+        """
+        anos: [(codigo, nome, detalhe da API ou None)]; marca o modelo como completo.
+        completo=False grava o que veio mas deixa o modelo pendente (algum valor falhou).
+        """
+        linhas = []
+        referencia = None
+        for codigo, nome, detalhe in anos:
+            detalhe = detalhe or {}
+            referencia = referencia or detalhe.get('MesReferencia')
+            linhas.append((
+                str(codigo_marca), _codigo(codigo_modelo), str(codigo), nome,
+                detalhe.get('Valor'), detalhe.get('CodigoFipe'), detalhe.get('Combustivel'),
+            ))
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO anos VALUES (?, ?, ?, ?, ?, ?, ?)", linhas)
+            if completo:
+                self._conn.execute(
+                    "UPDATE modelos SET completo = 1 WHERE codigo_marca = ? AND codigo = ?",
+                    (str(codigo_marca), _codigo(codigo_modelo)),
+                )
+            if referencia:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO meta (chave, valor) VALUES ('referencia', ?)", (referencia,)
+                )
+                self._referencia = referencia
+
+    def reiniciar(self, mes):
+        """
+        Troca de mês: marcas e modelos voltam a pendentes e deixam de ser
+        servidos até serem importados de novo (os valores antigos ficam só
+        até serem regravados). `mes` evita reiniciar duas vezes no mesmo mês.
+        """
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE marcas SET modelos_importados = 0")
+            self._conn.execute("UPDATE modelos SET completo = 0")
+            self._conn.execute("DELETE FROM meta WHERE chave = 'referencia'")
+            self._conn.execute("INSERT OR REPLACE INTO meta (chave, valor) VALUES ('reinicio', ?)", (mes,))
+            self._referencia = None
+
+    def reiniciar_se_antiga(self):
+        """Reinicia a tabela se ela é de um mês anterior (uma vez por mês). Retorna se reiniciou."""
+        mes = referencia_atual()
+        if self.vigente or self.marcas() is None or self._meta('reinicio') == mes:
+            return False
+        print(f"🔄 Tabela FIPE de {self.referencia or 'mês anterior'}: reimportando para {mes}")
+        self.reiniciar(mes)
+        return True
+
+    def pendentes(self):
+        """Modelos cujos anos/valores ainda não foram importados: [(codigo_marca, codigo)]"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT codigo_marca, codigo FROM modelos WHERE completo = 0"
+            ).fetchall()
+
+    def marcas_pendentes(self):
+        with self._lock:
+            return [l[0] for l in self._conn.execute(
+                "SELECT codigo FROM marcas WHERE modelos_importados = 0"
+            )]
+
+    def fechar(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _codigo(codigo):
+    # a API devolve códigos de modelo numéricos; da URL/chave eles vêm como texto
+    return int(codigo) if isinstance(codigo, str) and codigo.isdigit() else codigo
+
+
+def importar_da_api(tabela, base_url, limite=None, max_workers=8):
+    """
+    Baixa marcas, modelos, anos e valores que ainda faltam na tabela.
+    limite: máximo de requisições nesta execução (None = sem limite).
+    Falhas numa marca ou modelo não interrompem o resto: o que falhou
+    continua pendente e é tentado de novo na próxima importação.
+    Retorna o número de requisições feitas.
+    """
+    tabela.reiniciar_se_antiga()
+    contador = {'requisicoes': 0}
+    lock = threading.Lock()
+
+    def _esgotado():
+        return limite is not None and contador['requisicoes'] >= limite
+
+    def _get(url):
+        with lock:
+            if _esgotado():
+                return None
+            contador['requisicoes'] += 1
+        try:
+            r = requisitar('GET', url, timeout=15)
+            return r.json() if r.status_code == 200 else None
+        except Exception as e:
+            print(f"    ❌ {url}: {e}")
+            return None
+
+    if tabela.marcas() is None:
+        marcas = _get(f'{base_url}/marcas')
+        if not marcas:
+            return contador['requisicoes']
+        tabela.gravar_marcas(marcas)
+
+    for codigo_marca in tabela.marcas_pendentes():
+        if _esgotado():
+            return contador['requisicoes']
+        try:
+            dados = _get(f'{base_url}/marcas/{codigo_marca}/modelos')
+            if dados is not None:
+                tabela.gravar_modelos(codigo_marca, dados.get('modelos', []))
+        except Exception as e:
+            print(f"    ❌ Marca {codigo_marca}: {e}")
+
+    def _importar_modelo(codigo_marca, codigo_modelo):
+        url_modelo = f'{base_url}/marcas/{codigo_marca}/modelos/{codigo_modelo}'
+        anos = _get(f'{url_modelo}/anos')
+        if anos is None:
+            return
+        linhas = []
+        completo = True
+        for ano in anos:
+            detalhe = _get(f"{url_modelo}/anos/{ano['codigo']}")
+            if detalhe is None:
+                # incompleto: volta para a fila na próxima importação
+                completo = False
+                if _esgotado():
+                    break
+                continue
+            linhas.append((ano['codigo'], ano['nome'], detalhe))
+        tabela.gravar_anos(codigo_marca, codigo_modelo, linhas, completo=completo)
+
+    def _importar_modelo_seguro(pendente):
+        try:
+            _importar_modelo(*pendente)
+        except Exception as e:
+            print(f"    ❌ Modelo {pendente[0]}/{pendente[1]}: {e}")
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(_importar_modelo_seguro, tabela.pendentes()))
+    return contador['requisicoes']
+
+
+def importar_json(tabela, caminho):
+    """
+    Importa um dump JSON (lista de linhas marca/modelo/ano/valor), que
+    substitui a tabela inteira; sem mes_referencia vale como do mês corrente.
+    Retorna as linhas lidas.
+    """
+    with open(caminho, 'r', encoding='utf-8') as f:
+        linhas = json.load(f)
+    tabela.reiniciar(referencia_atual())
+
+    marcas = {}
+    modelos = {}
+    anos = {}
+    for linha in linhas:
+        codigo_marca = str(linha['codigo_marca'])
+        marcas[codigo_marca] = linha['marca']
+        modelos.setdefault(codigo_marca, {})[linha['codigo_modelo']] = linha['modelo']
+        anos.setdefault((codigo_marca, linha['codigo_modelo']), []).append((
+            linha['codigo_ano'], linha['ano'], {
+                'Valor': linha.get('valor'),
+                'CodigoFipe': linha.get('codigo_fipe'),
+                'Combustivel': linha.get('combustivel'),
+                'MesReferencia': linha.get('mes_referencia') or referencia_atual(),
+            },
+        ))
+
+    tabela.gravar_marcas([{'codigo': c, 'nome': n} for c, n in marcas.items()])
+    for codigo_marca, por_codigo in modelos.items():
+        tabela.gravar_modelos(codigo_marca, [{'codigo': c, 'nome': n} for c, n in por_codigo.items()])
+    for (codigo_marca, codigo_modelo), linhas_ano in anos.items():
+        tabela.gravar_anos(codigo_marca, codigo_modelo, linhas_ano)
+    return len(linhas)
+
+
+def main():
+    from services.fipe_service import BASE_FIPE, CAMINHO_TABELA_FIPE
+
+    parser = argparse.ArgumentParser(description="Importa a tabela FIPE para consulta offline")
+    parser.add_argument('--saida', default=CAMINHO_TABELA_FIPE)
+    parser.add_argument('--json', help='dump JSON para importar em vez de baixar da API')
+    parser.add_argument('--limite', type=int, help='máximo de requisições nesta execução')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--base-url', default=BASE_FIPE)
+    args = parser.parse_args()
+
+    tabela = TabelaFipe(args.saida)
+    if args.json:
+        print(f"📥 {importar_json(tabela, args.json)} linhas importadas de {args.json}")
+    else:
+        requisicoes = importar_da_api(tabela, args.base_url, args.limite, args.workers)
+        print(f"📥 {requisicoes} requisições à API FIPE")
+
+    stats = tabela.estatisticas()
+    print(
+        f"📚 Tabela FIPE {stats['referencia'] or '(sem referência)'}"
+        + ("" if tabela.vigente else " (desatualizada)")
+        + f": {stats['marcas']} marcas, "
+        f"{stats['modelos_completos']}/{stats['modelos']} modelos completos, {stats['valores']} valores"
+    )
+    tabela.fechar()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import sqlite3
+import threading
+
+from services.metricas import metricas
+
+
+class CacheHistorico:
+    """
+    Cópia local (SQLite) do histórico de preço dos anúncios no Supabase.
+    A marca d'água de cada car_id é o updated_at mais recente já baixado
+    (linhas novas e também as alteradas depois de inseridas): obter()
+    só pede ao banco o que mudou depois dela, numa chamada em lote para
+    todos os anúncios, e responde a partir da cópia local.
+    Guarda no máximo `max_por_anuncio` linhas por anúncio.
+    """
+
+    def __init__(self, caminho='historico_cache.sqlite3', max_por_anuncio=50):
+        self.caminho = caminho
+        self.max_por_anuncio = max_por_anuncio
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(caminho, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS historico ("
+            " car_id TEXT NOT NULL,"
+            " created_at TEXT NOT NULL,"
+            " price_numeric REAL,"
+            " status TEXT,"
+            " updated_at TEXT,"
+            " PRIMARY KEY (car_id, created_at))"
+        )
+        colunas = {linha[1] for linha in self._conn.execute("PRAGMA table_info(historico)")}
+        if 'updated_at' not in colunas:
+            self._conn.execute("ALTER TABLE historico ADD COLUMN updated_at TEXT")
+        self._conn.commit()
+
+    def marcas_agua(self, car_ids):
+        """{car_id: updated_at mais recente em cache} dos anúncios que já têm linhas"""
+        marcas = {}
+        with self._lock:
+            for car_id in car_ids:
+                linha = self._conn.execute(
+                    "SELECT MAX(COALESCE(updated_at, created_at)) FROM historico WHERE car_id = ?",
+                    (car_id,),
+                ).fetchone()
+                if linha[0] is not None:
+                    marcas[car_id] = linha[0]
+        return marcas
+
+    def gravar(self, historicos):
+        """historicos: {car_id: [(created_at, price_numeric, status, updated_at), ...]}"""
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO historico (car_id, created_at, price_numeric, status, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(car_id, *linha) for car_id, linhas in historicos.items() for linha in linhas],
+            )
+            self._conn.commit()
+
+    def consultar(self, car_ids, limite=10):
+        """{car_id: [(created_at, price_numeric, status), ...]} só com o que está em cache"""
+        historicos = {}
+        with self._lock:
+            for car_id in car_ids:
+                linhas = self._conn.execute(
+                    "SELECT created_at, price_numeric, status FROM historico "
+                    "WHERE car_id = ? ORDER BY created_at DESC LIMIT ?",
+                    (car_id, limite),
+                ).fetchall()
+                historicos[car_id] = linhas
+        return historicos
+
+    def obter(self, db, car_ids, limite=10):
+        """
+        Histórico dos `limite` registros mais recentes de cada car_id:
+        busca no banco só o que mudou depois da marca d'água local e
+        responde do cache. Retorna {car_id: [(created_at, price_numeric, status), ...]}.
+        """
+        car_ids = list(dict.fromkeys(str(car_id) for car_id in car_ids))
+        if not car_ids:
+            return {}
+
+        novos = db.obter_historicos_precos(car_ids, limite, desde=self.marcas_agua(car_ids))
+        metricas.contar('historico_linhas_novas', sum(len(linhas) for linhas in novos.values()))
+        if novos:
+            self.gravar(novos)
+        return self.consultar(car_ids, limite)
+
+    def podar(self):
+        """Mantém só as max_por_anuncio linhas mais recentes de cada anúncio"""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM historico WHERE rowid IN ("
+                " SELECT rowid FROM ("
+                "  SELECT rowid, ROW_NUMBER() OVER ("
+                "   PARTITION BY car_id ORDER BY created_at DESC) AS posicao"
+                "  FROM historico)"
+                " WHERE posicao > ?)",
+                (self.max_por_anuncio,),
+            )
+            self._conn.commit()
+
+    def fechar(self):
+        with self._lock:
+            self.podar()
+            self._conn.close()
@@ -0,0 +1,207 @@
+"""
+Camada HTTP compartilhada por autocarro, FIPE e Telegram.
+
+- uma requests.Session por host (pool de conexões com keep-alive, sem
+  repetir o handshake TLS a cada chamada)
+- fábrica de httpx.AsyncClient com os mesmos limites para o código async
+- retentativas limitadas com backoff exponencial e jitter em 5xx / 429
+  (respeitando Retry-After)
+- circuit breaker por host: após várias falhas seguidas o host fica
+  "aberto" por um tempo e as chamadas falham na hora com CircuitoAberto
+"""
+
+import asyncio
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from services.metricas import metricas
+
+MAX_TENTATIVAS = 4
+BACKOFF_BASE = 0.5
+BACKOFF_MAXIMO = 30.0
+STATUS_REPETIVEIS = frozenset({429, 500, 502, 503, 504})
+# POST não é idempotente: só repete quando o servidor recusou a requisição
+STATUS_REPETIVEIS_POST = frozenset({429})
+FALHAS_PARA_ABRIR = 5
+TEMPO_CIRCUITO_ABERTO = 60.0
+TAMANHO_POOL = 10
+
+_sessoes = {}
+_circuitos = {}
+_lock = threading.Lock()
+
+
+class CircuitoAberto(Exception):
+    """O host falhou demais em sequência e está temporariamente bloqueado"""
+
+
+class Circuito:
+    def __init__(self, falhas_para_abrir=FALHAS_PARA_ABRIR, tempo_aberto=TEMPO_CIRCUITO_ABERTO):
+        self.falhas_para_abrir = falhas_para_abrir
+        self.tempo_aberto = tempo_aberto
+        self.falhas = 0
+        self._aberto_ate = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def aberto(self):
+        return time.monotonic() < self._aberto_ate
+
+    def sucesso(self):
+        with self._lock:
+            self.falhas = 0
+            self._aberto_ate = 0.0
+
+    def falha(self):
+        """Registra uma falha; retorna True se o circuito abriu agora"""
+        with self._lock:
+            self.falhas += 1
+            # meio-aberto: depois do tempo de espera, uma nova falha reabre direto
+            if self.falhas >= self.falhas_para_abrir and not self.aberto:
+                self._aberto_ate = time.monotonic() + self.tempo_aberto
+                return True
+            return False
+
+
+def _host(url):
+    return urlsplit(url).netloc
+
+
+def obter_circuito(host):
+    with _lock:
+        if host not in _circuitos:
+            _circuitos[host] = Circuito()
+        return _circuitos[host]
+
+
+def obter_sessao(host):
+    """Sessão com pool de conexões do host (reutilizada entre threads)"""
+    with _lock:
+        if host not in _sessoes:
+            sessao = requests.Session()
+            adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=TAMANHO_POOL, max_retries=0)
+            sessao.mount('https://', adaptador)
+            sessao.mount('http://', adaptador)
+            _sessoes[host] = sessao
+        return _sessoes[host]
+
+
+def cliente_async(**opcoes):
+    """httpx.AsyncClient com o pool padrão (um por event loop)"""
+    opcoes.setdefault('limits', httpx.Limits(
+        max_keepalive_connections=TAMANHO_POOL, max_connections=TAMANHO_POOL * 2
+    ))
+    return httpx.AsyncClient(**opcoes)
+
+
+def backoff(tentativa, retry_after=None):
+    """Espera antes da próxima tentativa: Retry-After ou backoff exponencial com jitter"""
+    if retry_after is not None:
+        return retry_after
+    return random.uniform(0, min(BACKOFF_MAXIMO, BACKOFF_BASE * 2 ** tentativa))
+
+
+def _retry_after(response):
+    valor = response.headers.get('retry-after')
+    if valor is None:
+        # o Telegram manda no corpo: {"parameters": {"retry_after": N}}
+        try:
+            valor = response.json().get('parameters', {}).get('retry_after')
+        except (ValueError, AttributeError):
+            valor = None
+    try:
+        return float(valor) if valor is not None else None
+    except ValueError:
+        return None
+
+
+def _avaliar_resposta(metodo, host, circuito, response):
+    """Retorna True se a resposta deve ser repetida"""
+    repetiveis = STATUS_REPETIVEIS if metodo == 'GET' else STATUS_REPETIVEIS_POST
+    status = response.status_code
+    # 429 é limite de taxa, não indisponibilidade: não conta para o circuito
+    if status >= 500:
+        if circuito.falha():
+            metricas.contar('http_circuito_aberto', host=host)
+    elif status != 429:
+        circuito.sucesso()
+    return status in repetiveis
+
+
+def _registrar_erro(host, circuito):
+    if circuito.falha():
+        metricas.contar('http_circuito_aberto', host=host)
+
+
+def _repetir_erro(metodo, erro, erros_get, erros_post):
+    return isinstance(erro, erros_get if metodo == 'GET' else erros_post)
+
+
+def _anunciar(host, motivo, espera):
+    metricas.contar('http_retentativas', host=host)
+    print(f" [!] {host} {motivo}: nova tentativa em {espera:.1f}s")
+
+
+def requisitar(metodo, url, tentativas=MAX_TENTATIVAS, **kwargs):
+    """
+    requests.request com sessão do host, retentativas e circuit breaker.
+    Retorna a última resposta (mesmo com erro HTTP) ou levanta a exceção
+    de rede da última tentativa / CircuitoAberto.
+    """
+    metodo = metodo.upper()
+    host = _host(url)
+    circuito = obter_circuito(host)
+    sessao = obter_sessao(host)
+
+    for tentativa in range(tentativas):
+        if circuito.aberto:
+            raise CircuitoAberto(host)
+        ultima = tentativa == tentativas - 1
+        try:
+            response = sessao.request(metodo, url, **kwargs)
+        except requests.RequestException as e:
+            _registrar_erro(host, circuito)
+            if ultima or not _repetir_erro(
+                    metodo, e, (requests.ConnectionError, requests.Timeout), requests.ConnectTimeout):
+                raise
+            espera = backoff(tentativa)
+            _anunciar(host, e.__class__.__name__, espera)
+        else:
+            if not _avaliar_resposta(metodo, host, circuito, response) or ultima:
+                return response
+            espera = backoff(tentativa, _retry_after(response))
+            _anunciar(host, f"HTTP {response.status_code}", espera)
+        time.sleep(espera)
+
+
+async def requisitar_async(client, metodo, url, tentativas=MAX_TENTATIVAS, **kwargs):
+    """Versão async de requisitar() sobre um httpx.AsyncClient"""
+    metodo = metodo.upper()
+    host = _host(url)
+    circuito = obter_circuito(host)
+
+    for tentativa in range(tentativas):
+        if circuito.aberto:
+            raise CircuitoAberto(host)
+        ultima = tentativa == tentativas - 1
+        try:
+            response = await client.request(metodo, url, **kwargs)
+        except httpx.TransportError as e:
+            _registrar_erro(host, circuito)
+            if ultima or not _repetir_erro(
+                    metodo, e, httpx.TransportError, (httpx.ConnectError, httpx.ConnectTimeout)):
+                raise
+            espera = backoff(tentativa)
+            _anunciar(host, e.__class__.__name__, espera)
+        else:
+            if not _avaliar_resposta(metodo, host, circuito, response) or ultima:
+                return response
+            espera = backoff(tentativa, _retry_after(response))
+            _anunciar(host, f"HTTP {response.status_code}", espera)
+        await asyncio.sleep(espera)
@@ -0,0 +1,347 @@
+import json
+import os
+import sqlite3
+import time
+
+from services.pipeline import id_canonico
+
+DIA = 24 * 60 * 60
+
+
+def _chave(car_id):
+    """Chave canônica na memória: o ID numérico do anúncio (id ou link)"""
+    canonico = id_canonico(car_id)
+    return str(canonico) if canonico is not None else str(car_id)
+
+
+class MemoriaPrecos:
+    """
+    Memória de preços em SQLite (modo WAL), substituta do price_memory.json.
+
+    - `atual`: último preço de cada car_id (consulta pontual pela chave)
+    - `historico`: log só de inserção com todos os preços já vistos
+
+    Leituras (get / in) enxergam o estado do início da execução; as
+    atribuições (memoria[car_id] = preco) ficam pendentes e só são gravadas
+    em salvar(), então o mesmo objeto serve de `memoria` e `nova_memoria`.
+
+    Cada anúncio guarda quando foi visto pela última vez (data, número da
+    execução e página), para que expirar() remova os que saíram do ar, e o
+    modelo/ano, para estatisticas_modelos() (preço médio e desvio por modelo
+    e ano).
+
+    A tabela `paginas` guarda, por URL de busca, os validadores HTTP
+    (ETag / Last-Modified), os hashes do conteúdo e os car_ids da última
+    resposta, para pular páginas que não mudaram.
+
+    As chaves são o ID numérico do anúncio (id_canonico); memórias antigas,
+    com o link inteiro como chave, são migradas uma vez ao abrir.
+    """
+
+    def __init__(self, caminho='price_memory.sqlite3', importar_json=None):
+        self.caminho = caminho
+        self._pendentes = {}
+        self._vistos = {}
+        self._paginas = {}
+        self._varreduras = {}
+        self._conn = sqlite3.connect(caminho)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS atual ("
+            " car_id TEXT PRIMARY KEY,"
+            " preco REAL NOT NULL,"
+            " atualizado REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS historico ("
+            " car_id TEXT NOT NULL,"
+            " preco REAL NOT NULL,"
+            " visto_em REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS idx_historico_car_id ON historico (car_id, visto_em);"
+            "CREATE TABLE IF NOT EXISTS meta ("
+            " chave TEXT PRIMARY KEY,"
+            " valor TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS paginas ("
+            " url TEXT PRIMARY KEY,"
+            " etag TEXT,"
+            " last_modified TEXT,"
+            " hash_bruto TEXT,"
+            " hash_itens TEXT,"
+            " car_ids TEXT NOT NULL,"
+            " atualizado REAL NOT NULL);"
+        )
+        colunas = {linha[1] for linha in self._conn.execute("PRAGMA table_info(atual)")}
+        if 'visto_em' not in colunas:
+            self._conn.execute("ALTER TABLE atual ADD COLUMN visto_em REAL")
+            self._conn.execute("UPDATE atual SET visto_em = atualizado")
+        if 'visto_execucao' not in colunas:
+            self._conn.execute("ALTER TABLE atual ADD COLUMN visto_execucao INTEGER NOT NULL DEFAULT 0")
+        if 'modelo' not in colunas:
+            self._conn.execute("ALTER TABLE atual ADD COLUMN modelo TEXT")
+            self._conn.execute("ALTER TABLE atual ADD COLUMN ano INTEGER")
+        if 'pagina' not in colunas:
+            self._conn.execute("ALTER TABLE atual ADD COLUMN pagina TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_atual_modelo ON atual (modelo, ano)")
+        self._conn.commit()
+        self._migrar_ids()
+        if 'pagina' not in colunas:
+            self._atribuir_paginas()
+
+        linha = self._conn.execute("SELECT valor FROM meta WHERE chave = 'execucao'").fetchone()
+        self.execucao = (int(linha[0]) if linha else 0) + 1
+
+        if importar_json and len(self) == 0 and os.path.exists(importar_json):
+            self._importar_json(importar_json)
+
+    def _importar_json(self, caminho):
+        """Migração única do price_memory.json legado"""
+        try:
+            with open(caminho, 'r') as f:
+                dados = json.load(f)
+        except (OSError, ValueError):
+            return
+        for car_id, preco in dados.items():
+            self[car_id] = preco
+        self.salvar()
+        print(f"✓ {len(dados)} preços importados de {caminho}")
+
+    def _migrar_ids(self):
+        """
+        Troca as chaves antigas (link inteiro ou id em outro formato) pelo ID
+        canônico em atual, historico e paginas. Se o mesmo anúncio aparece
+        com as duas chaves, fica o preço atualizado mais recentemente.
+        """
+        if self._conn.execute("SELECT 1 FROM meta WHERE chave = 'ids_canonicos'").fetchone():
+            return
+
+        migrados = 0
+        with self._conn:
+            antigas = [
+                (car_id, _chave(car_id), atualizado)
+                for car_id, atualizado in self._conn.execute("SELECT car_id, atualizado FROM atual")
+                if _chave(car_id) != car_id
+            ]
+            for car_id, nova, atualizado in antigas:
+                existente = self._conn.execute(
+                    "SELECT atualizado FROM atual WHERE car_id = ?", (nova,)
+                ).fetchone()
+                if existente and existente[0] >= atualizado:
+                    self._conn.execute("DELETE FROM atual WHERE car_id = ?", (car_id,))
+                else:
+                    self._conn.execute("DELETE FROM atual WHERE car_id = ?", (nova,))
+                    self._conn.execute("UPDATE atual SET car_id = ? WHERE car_id = ?", (nova, car_id))
+                self._conn.execute("UPDATE historico SET car_id = ? WHERE car_id = ?", (nova, car_id))
+                migrados += 1
+
+            for url, car_ids in self._conn.execute("SELECT url, car_ids FROM paginas").fetchall():
+                canonicos = [
+                    car_id if id_canonico(car_id) is None else id_canonico(car_id)
+                    for car_id in json.loads(car_ids)
+                ]
+                self._conn.execute(
+                    "UPDATE paginas SET car_ids = ? WHERE url = ?", (json.dumps(canonicos), url)
+                )
+            self._conn.execute("INSERT OR REPLACE INTO meta (chave, valor) VALUES ('ids_canonicos', '1')")
+        if migrados:
+            print(f"✓ {migrados} anúncios da memória migrados para o ID numérico")
+
+    def _atribuir_paginas(self):
+        """Preenche a página de cada anúncio a partir da tabela paginas (memórias antigas)"""
+        with self._conn:
+            for url, car_ids in self._conn.execute("SELECT url, car_ids FROM paginas").fetchall():
+                self._conn.executemany(
+                    "UPDATE atual SET pagina = ? WHERE car_id = ?",
+                    [(url, _chave(car_id)) for car_id in json.loads(car_ids)],
+                )
+
+    def get(self, car_id, padrao=None):
+        linha = self._conn.execute(
+            "SELECT preco FROM atual WHERE car_id = ?", (_chave(car_id),)
+        ).fetchone()
+        return linha[0] if linha else padrao
+
+    def __contains__(self, car_id):
+        return self._conn.execute(
+            "SELECT 1 FROM atual WHERE car_id = ?", (_chave(car_id),)
+        ).fetchone() is not None
+
+    def __setitem__(self, car_id, preco):
+        self._pendentes[_chave(car_id)] = float(preco)
+        self._vistos.setdefault(_chave(car_id), (None, None))
+
+    def marcar_visto(self, car_id, modelo=None, ano=None):
+        """Registra que o anúncio ainda está no ar nesta execução (e seu modelo/ano)"""
+        chave = _chave(car_id)
+        anterior = self._vistos.get(chave, (None, None))
+        self._vistos[chave] = (modelo or anterior[0], ano or anterior[1])
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM atual").fetchone()[0]
+
+    @property
+    def alteracoes(self):
+        return len(self._pendentes)
+
+    def obter_pagina(self, url):
+        """Estado salvo da última resposta da URL, ou None"""
+        linha = self._conn.execute(
+            "SELECT etag, last_modified, hash_bruto, hash_itens, car_ids FROM paginas WHERE url = ?",
+            (url,),
+        ).fetchone()
+        if linha is None:
+            return None
+        return {
+            'etag': linha[0],
+            'last_modified': linha[1],
+            'hash_bruto': linha[2],
+            'hash_itens': linha[3],
+            'car_ids': json.loads(linha[4]),
+        }
+
+    def registrar_pagina(self, url, etag=None, last_modified=None, hash_bruto=None,
+                         hash_itens=None, car_ids=()):
+        self._paginas[url] = (
+            etag, last_modified, hash_bruto, hash_itens, json.dumps(list(car_ids))
+        )
+
+    def descartar(self, car_ids):
+        """
+        Desfaz os preços pendentes dos anúncios (gravação no banco falhou), para
+        que voltem como novidade na próxima execução. As páginas que os contêm
+        também não são registradas, senão seriam puladas como inalteradas.
+        """
+        chaves = {_chave(car_id) for car_id in car_ids}
+        for chave in chaves:
+            self._pendentes.pop(chave, None)
+        self._paginas = {
+            url: campos for url, campos in self._paginas.items()
+            if chaves.isdisjoint(_chave(car_id) for car_id in json.loads(campos[4]))
+        }
+        return len(chaves)
+
+    def ultima_varredura_completa(self, url):
+        """Quando (time.time) a busca foi varrida até o fim pela última vez; 0 se nunca"""
+        linha = self._conn.execute(
+            "SELECT valor FROM meta WHERE chave = ?", ('varredura:' + url,)
+        ).fetchone()
+        return float(linha[0]) if linha else 0.0
+
+    def registrar_varredura_completa(self, urls):
+        agora = time.time()
+        for url in urls:
+            self._varreduras['varredura:' + url] = str(agora)
+
+    def estatisticas_modelos(self):
+        """
+        Preços atuais agrupados por modelo e ano (estado do início da execução):
+        {(modelo, ano): (quantidade, media, desvio)}
+        """
+        linhas = self._conn.execute(
+            "SELECT modelo, ano, COUNT(*), AVG(preco), AVG(preco * preco) FROM atual "
+            "WHERE modelo IS NOT NULL AND preco > 0 GROUP BY modelo, ano"
+        ).fetchall()
+        return {
+            (modelo, ano): (qtd, media, max(0.0, media_quadrados - media * media) ** 0.5)
+            for modelo, ano, qtd, media, media_quadrados in linhas
+        }
+
+    def historico(self, car_id, limite=10):
+        """Últimos preços registrados do anúncio: [(visto_em, preco), ...]"""
+        return self._conn.execute(
+            "SELECT visto_em, preco FROM historico WHERE car_id = ? "
+            "ORDER BY visto_em DESC LIMIT ?",
+            (_chave(car_id), limite),
+        ).fetchall()
+
+    def salvar(self):
+        """Grava só as entradas alteradas e as marcações de visto desta execução"""
+        agora = time.time()
+        linhas = [(car_id, preco, agora) for car_id, preco in self._pendentes.items()]
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO atual (car_id, preco, atualizado, visto_em, visto_execucao) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (car_id) DO UPDATE SET preco = excluded.preco, "
+                "atualizado = excluded.atualizado",
+                [(car_id, preco, agora, agora, self.execucao) for car_id, preco, _ in linhas],
+            )
+            self._conn.executemany(
+                "INSERT INTO historico (car_id, preco, visto_em) VALUES (?, ?, ?)",
+                linhas,
+            )
+            self._conn.executemany(
+                "UPDATE atual SET visto_em = ?, visto_execucao = ?, "
+                "modelo = COALESCE(?, modelo), ano = COALESCE(?, ano) WHERE car_id = ?",
+                [(agora, self.execucao, modelo, ano, car_id)
+                 for car_id, (modelo, ano) in self._vistos.items()],
+            )
+            # página em que cada anúncio foi visto por último (ver expirar)
+            self._conn.executemany(
+                "UPDATE atual SET pagina = ? WHERE car_id = ?",
+                [(url, _chave(car_id))
+                 for url, campos in self._paginas.items() for car_id in json.loads(campos[4])],
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO paginas "
+                "(url, etag, last_modified, hash_bruto, hash_itens, car_ids, atualizado) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(url, *campos, agora) for url, campos in self._paginas.items()],
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (chave, valor) VALUES ('execucao', ?)",
+                (str(self.execucao),),
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO meta (chave, valor) VALUES (?, ?)",
+                self._varreduras.items(),
+            )
+        gravadas = len(self._pendentes)
+        self._pendentes = {}
+        self._vistos = {}
+        self._paginas = {}
+        self._varreduras = {}
+        return gravadas
+
+    def nova_execucao(self):
+        """Inicia a próxima execução no mesmo objeto (modo daemon: um ciclo = uma execução)"""
+        self.execucao += 1
+
+    def expirar(self, max_dias=None, max_execucoes=None, paginas=None):
+        """
+        Remove da memória (e do histórico) os anúncios não vistos há mais de
+        `max_dias` dias ou `max_execucoes` execuções.
+        paginas: URLs das páginas que esta execução comprovadamente leu; por
+        execuções só expiram os anúncios vistos por último numa delas (um
+        anúncio fora das páginas lidas pode continuar no ar). None = sem
+        restrição. O limite em dias vale sempre.
+        Retorna a lista de (car_id, ultimo_preco) removidos.
+        """
+        condicoes = []
+        parametros = []
+        if max_dias is not None:
+            condicoes.append("COALESCE(visto_em, atualizado) < ?")
+            parametros.append(time.time() - max_dias * DIA)
+        if max_execucoes is not None:
+            condicao = "visto_execucao < ?"
+            parametros.append(self.execucao - max_execucoes)
+            if paginas is not None:
+                condicao = f"({condicao} AND pagina IN (SELECT value FROM json_each(?)))"
+                parametros.append(json.dumps(sorted(paginas)))
+            condicoes.append(condicao)
+        if not condicoes:
+            return []
+
+        filtro = " OR ".join(condicoes)
+        with self._conn:
+            removidos = self._conn.execute(
+                f"SELECT car_id, preco FROM atual WHERE {filtro}", parametros
+            ).fetchall()
+            self._conn.execute(
+                f"DELETE FROM historico WHERE car_id IN (SELECT car_id FROM atual WHERE {filtro})",
+                parametros,
+            )
+            self._conn.execute(f"DELETE FROM atual WHERE {filtro}", parametros)
+        return removidos
+
+    def fechar(self):
+        self.salvar()
+        self._conn.close()
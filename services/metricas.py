@@ -0,0 +1,163 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+
+def _chave(nome, rotulos):
+    return nome, tuple(sorted((k, str(v)) for k, v in rotulos.items()))
+
+
+def _rotulos_prometheus(rotulos):
+    if not rotulos:
+        return ''
+    pares = []
+    for chave, valor in rotulos:
+        valor = valor.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pares.append(f'{chave}="{valor}"')
+    return '{' + ','.join(pares) + '}'
+
+
+class Metricas:
+    """
+    Instrumentação de uma execução: contadores, tempos agregados, medidas
+    pontuais e etapas (spans com início e duração).
+
+    - contar('http_requisicoes', host=...)      -> contador
+    - with medir('db', operacao='insert'):       -> tempo agregado (qtd/soma/máx)
+    - with etapa('fipe'):                        -> tempo agregado + span no relatório
+    - definir('cache_taxa_acerto', 0.93)         -> medida (último valor)
+
+    Rótulos são kwargs livres. Seguro para uso entre threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        with self._lock:
+            self.inicio = time.time()
+            self._relogio = time.perf_counter()
+            self._contadores = {}
+            self._tempos = {}
+            self._medidas = {}
+            self._etapas = []
+
+    def contar(self, nome, valor=1, **rotulos):
+        chave = _chave(nome, rotulos)
+        with self._lock:
+            self._contadores[chave] = self._contadores.get(chave, 0) + valor
+
+    def definir(self, nome, valor, **rotulos):
+        with self._lock:
+            self._medidas[_chave(nome, rotulos)] = valor
+
+    def registrar_tempo(self, nome, segundos, **rotulos):
+        chave = _chave(nome, rotulos)
+        with self._lock:
+            qtd, soma, maximo = self._tempos.get(chave, (0, 0.0, 0.0))
+            self._tempos[chave] = (qtd + 1, soma + segundos, max(maximo, segundos))
+
+    @contextmanager
+    def medir(self, nome, **rotulos):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar_tempo(nome, time.perf_counter() - inicio, **rotulos)
+
+    @contextmanager
+    def etapa(self, nome, **rotulos):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            duracao = time.perf_counter() - inicio
+            self.registrar_tempo(f'etapa_{nome}', duracao, **rotulos)
+            with self._lock:
+                self._etapas.append({
+                    'nome': nome,
+                    'rotulos': {k: str(v) for k, v in rotulos.items()},
+                    'inicio': inicio - self._relogio,
+                    'duracao': duracao,
+                })
+
+    def resumo_etapas(self):
+        """Tempo total por etapa (sem rótulos), da mais lenta para a mais rápida"""
+        totais = {}
+        with self._lock:
+            for etapa in self._etapas:
+                totais[etapa['nome']] = totais.get(etapa['nome'], 0.0) + etapa['duracao']
+        return sorted(totais.items(), key=lambda item: item[1], reverse=True)
+
+    def relatorio(self):
+        """Relatório da execução como dict serializável em JSON"""
+        with self._lock:
+            return {
+                'inicio': self.inicio,
+                'duracao': time.perf_counter() - self._relogio,
+                'etapas': list(self._etapas),
+                'tempos': [
+                    {'nome': nome, 'rotulos': dict(rotulos), 'quantidade': qtd,
+                     'total': soma, 'media': soma / qtd if qtd else 0.0, 'maximo': maximo}
+                    for (nome, rotulos), (qtd, soma, maximo) in sorted(self._tempos.items())
+                ],
+                'contadores': [
+                    {'nome': nome, 'rotulos': dict(rotulos), 'valor': valor}
+                    for (nome, rotulos), valor in sorted(self._contadores.items())
+                ],
+                'medidas': [
+                    {'nome': nome, 'rotulos': dict(rotulos), 'valor': valor}
+                    for (nome, rotulos), valor in sorted(self._medidas.items())
+                ],
+            }
+
+    def prometheus(self, prefixo='autocarro'):
+        """Métricas no formato texto do Prometheus (ex: textfile collector do node_exporter)"""
+        linhas = []
+
+        def _familia(nome, tipo, amostras):
+            linhas.append(f'# TYPE {nome} {tipo}')
+            for sufixo, rotulos, valor in amostras:
+                linhas.append(f'{nome}{sufixo}{_rotulos_prometheus(rotulos)} {valor}')
+
+        def _agrupar(itens):
+            grupos = {}
+            for (nome, rotulos), valor in sorted(itens):
+                grupos.setdefault(nome, []).append((rotulos, valor))
+            return grupos
+
+        with self._lock:
+            contadores = _agrupar(self._contadores.items())
+            tempos = _agrupar(self._tempos.items())
+            medidas = _agrupar(self._medidas.items())
+            duracao = time.perf_counter() - self._relogio
+
+        for nome, amostras in contadores.items():
+            _familia(f'{prefixo}_{nome}_total', 'counter', [('', r, v) for r, v in amostras])
+        for nome, amostras in tempos.items():
+            base = f'{prefixo}_{nome}_segundos'
+            _familia(base, 'summary', [
+                amostra
+                for rotulos, (qtd, soma, _) in amostras
+                for amostra in (('_count', rotulos, qtd), ('_sum', rotulos, soma))
+            ])
+            _familia(f'{base}_max', 'gauge', [('', r, maximo) for r, (_, _, maximo) in amostras])
+        for nome, amostras in medidas.items():
+            _familia(f'{prefixo}_{nome}', 'gauge', [('', r, v) for r, v in amostras])
+        _familia(f'{prefixo}_execucao_segundos', 'gauge', [('', (), duracao)])
+        _familia(f'{prefixo}_execucao_inicio_timestamp', 'gauge', [('', (), self.inicio)])
+        return '\n'.join(linhas) + '\n'
+
+    def salvar(self, caminho_json=None, caminho_prometheus=None):
+        if caminho_json:
+            with open(caminho_json, 'w', encoding='utf-8') as f:
+                json.dump(self.relatorio(), f, indent=2, ensure_ascii=False)
+        if caminho_prometheus:
+            with open(caminho_prometheus, 'w', encoding='utf-8') as f:
+                f.write(self.prometheus())
+
+
+# Instância única do processo, usada por autocarro.py e pelos services
+metricas = Metricas()
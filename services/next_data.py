@@ -0,0 +1,70 @@
+import json
+
+_MARCADOR = b'__NEXT_DATA__'
+
+# Quantas páginas foram lidas pelo caminho rápido e quantas caíram no BeautifulSoup
+estatisticas = {'rapido': 0, 'fallback': 0}
+
+
+def fatiar_next_data(conteudo):
+    """
+    Localiza o <script id="__NEXT_DATA__"> direto nos bytes da página e
+    retorna o JSON bruto (bytes), sem montar a árvore HTML.
+    Retorna None se a tag não for encontrada.
+    """
+    if isinstance(conteudo, str):
+        conteudo = conteudo.encode('utf-8')
+
+    inicio = 0
+    while True:
+        idx = conteudo.find(_MARCADOR, inicio)
+        if idx == -1:
+            return None
+        inicio = idx + len(_MARCADOR)
+
+        # o marcador precisa estar dentro da própria tag <script ...>
+        tag = conteudo.rfind(b'<script', 0, idx)
+        if tag == -1 or conteudo.find(b'>', tag, idx) != -1:
+            continue
+
+        fim_tag = conteudo.find(b'>', idx)
+        fim_script = conteudo.find(b'</script>', fim_tag)
+        if fim_tag == -1 or fim_script == -1:
+            return None
+        return conteudo[fim_tag + 1:fim_script]
+
+
+def _extrair_com_bs4(conteudo):
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(conteudo, 'html.parser')
+    script_tag = soup.find('script', id='__NEXT_DATA__')
+    if not script_tag or not script_tag.string:
+        return None
+    return json.loads(script_tag.string)
+
+
+def extrair_next_data(conteudo):
+    """
+    Retorna o __NEXT_DATA__ da página como dict, ou None se ausente.
+    Usa o fatiamento por bytes e só recorre ao BeautifulSoup se o layout
+    mudar a ponto de o caminho rápido não achar um JSON válido.
+    """
+    if isinstance(conteudo, str):
+        conteudo = conteudo.encode('utf-8')
+
+    # sem o marcador nem o BeautifulSoup acharia a tag
+    if _MARCADOR not in conteudo:
+        return None
+
+    bruto = fatiar_next_data(conteudo)
+    if bruto is not None:
+        try:
+            dados = json.loads(bruto)
+            estatisticas['rapido'] += 1
+            return dados
+        except ValueError:
+            pass
+
+    estatisticas['fallback'] += 1
+    return _extrair_com_bs4(conteudo)
@@ -0,0 +1,117 @@
+"""
+Pontuação de oportunidades em lote, depois do enriquecimento FIPE.
+
+Para cada novidade:
+- desconto em relação à FIPE: (fipe - preço) / fipe
+- z-score do preço contra os preços atuais do mesmo modelo/ano na memória
+  (só quando há pelo menos MIN_AMOSTRAS anúncios para comparar)
+- pontuação = PESO_DESCONTO * desconto + PESO_ZSCORE * (-z limitado a ±3) / 3
+
+Componentes ausentes contam como 0. O lote inteiro é ranqueado e só as
+melhores (top N ou acima dos limites) seguem para alerta e gravação.
+"""
+
+import re
+
+import numpy as np
+
+PESO_DESCONTO = 0.7
+PESO_ZSCORE = 0.3
+MIN_AMOSTRAS = 5
+
+
+def valor_numerico(texto):
+    """'R$ 48.500,00' -> 48500.0; None se não for um valor"""
+    if texto is None:
+        return None
+    if isinstance(texto, (int, float)):
+        return float(texto)
+    limpo = re.sub(r'[^\d,]', '', str(texto)).replace(',', '.')
+    try:
+        return float(limpo) if limpo else None
+    except ValueError:
+        return None
+
+
+def _ano(valor):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+def pontuar(novidades, fipes, estatisticas=None, min_amostras=MIN_AMOSTRAS):
+    """
+    Calcula os indicadores do lote em arrays NumPy (NaN = sem dado).
+    estatisticas: {(modelo, ano): (quantidade, media, desvio)}
+    Retorna dict com 'preco', 'fipe', 'desconto', 'zscore' e 'pontuacao'.
+    """
+    estatisticas = estatisticas or {}
+    qtd = len(novidades)
+    preco = np.array([n.get('preco_float') or np.nan for n in novidades], dtype=float)
+    fipe = np.array([
+        (valor_numerico(f.get('valor')) if isinstance(f, dict) else None) or np.nan
+        for f in fipes
+    ], dtype=float)
+
+    media = np.full(qtd, np.nan)
+    desvio = np.full(qtd, np.nan)
+    for i, novidade in enumerate(novidades):
+        grupo = estatisticas.get((novidade.get('model'), _ano(novidade.get('year_model'))))
+        if grupo and grupo[0] >= min_amostras and grupo[2] > 0:
+            media[i], desvio[i] = grupo[1], grupo[2]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        desconto = (fipe - preco) / fipe
+        zscore = (preco - media) / desvio
+    pontuacao = (
+        PESO_DESCONTO * np.nan_to_num(desconto, nan=0.0)
+        + PESO_ZSCORE * np.clip(np.nan_to_num(-zscore, nan=0.0), -3, 3) / 3
+    )
+    return {'preco': preco, 'fipe': fipe, 'desconto': desconto, 'zscore': zscore, 'pontuacao': pontuacao}
+
+
+def selecionar(indicadores, top_n=None, desconto_minimo=None, zscore_maximo=None):
+    """
+    Índices das novidades escolhidas, da maior para a menor pontuação:
+    as top_n melhores e, além delas, as com desconto >= desconto_minimo
+    ou z-score <= zscore_maximo. Sem nenhum critério, todas.
+    """
+    pontuacao = indicadores['pontuacao']
+    ordem = np.argsort(-pontuacao, kind='stable')
+    if top_n is None and desconto_minimo is None and zscore_maximo is None:
+        return ordem
+
+    escolhidas = np.zeros(len(pontuacao), dtype=bool)
+    if top_n:
+        escolhidas[ordem[:top_n]] = True
+    with np.errstate(invalid='ignore'):
+        if desconto_minimo is not None:
+            escolhidas |= indicadores['desconto'] >= desconto_minimo
+        if zscore_maximo is not None:
+            escolhidas |= indicadores['zscore'] <= zscore_maximo
+    return ordem[escolhidas[ordem]]
+
+
+def _float(valor):
+    return None if np.isnan(valor) else round(float(valor), 4)
+
+
+def ranquear_oportunidades(novidades, fipes, estatisticas=None, top_n=None,
+                           desconto_minimo=None, zscore_maximo=None):
+    """
+    Pontua o lote, anota em cada novidade 'fipe_numerico', 'desconto_fipe',
+    'zscore' e 'pontuacao', e retorna (novidades, fipes) só das escolhidas,
+    ordenadas da melhor para a pior.
+    """
+    if not novidades:
+        return [], []
+    indicadores = pontuar(novidades, fipes, estatisticas)
+    for i, novidade in enumerate(novidades):
+        novidade['fipe_numerico'] = _float(indicadores['fipe'][i])
+        novidade['desconto_fipe'] = _float(indicadores['desconto'][i])
+        novidade['zscore'] = _float(indicadores['zscore'][i])
+        novidade['pontuacao'] = _float(indicadores['pontuacao'][i])
+
+    escolhidas = selecionar(indicadores, top_n, desconto_minimo, zscore_maximo)
+    return [novidades[i] for i in escolhidas], [fipes[i] for i in escolhidas]
@@ -0,0 +1,94 @@
+"""
+Perfil de inicialização (python autocarro.py --profile-startup).
+
+ativar() troca builtins.__import__ por uma versão que cronometra cada
+módulo carregado pela primeira vez: tempo total (com os imports aninhados)
+e tempo próprio (sem eles). Precisa ser chamado antes dos imports que se
+quer medir; usa só a biblioteca padrão para não distorcer a medida.
+Submódulos trazidos por `from pacote import sub` contam no pacote.
+"""
+
+import builtins
+import importlib.util
+import sys
+import threading
+import time
+
+_original = None
+_local = threading.local()
+_lock = threading.Lock()
+# (módulo, profundidade, total, próprio) na ordem em que terminaram de carregar
+_registros = []
+
+
+def _nome_absoluto(nome, globais, nivel):
+    if not nivel:
+        return nome
+    try:
+        pacote = (globais or {}).get('__package__') or ''
+        return importlib.util.resolve_name('.' * nivel + nome, pacote)
+    except (ImportError, ValueError):
+        return nome
+
+
+def _importar(name, globals=None, locals=None, fromlist=(), level=0):
+    # mesma assinatura de builtins.__import__ (há quem chame com kwargs)
+    absoluto = _nome_absoluto(name, globals, level)
+    if absoluto in sys.modules:
+        return _original(name, globals, locals, fromlist, level)
+
+    pilha = getattr(_local, 'pilha', None)
+    if pilha is None:
+        pilha = _local.pilha = []
+    inicio = time.perf_counter()
+    pilha.append(0.0)  # tempo dos imports aninhados
+    try:
+        return _original(name, globals, locals, fromlist, level)
+    finally:
+        total = time.perf_counter() - inicio
+        filhos = pilha.pop()
+        if pilha:
+            pilha[-1] += total
+        with _lock:
+            _registros.append((absoluto, len(pilha), total, total - filhos))
+
+
+def ativar():
+    global _original
+    if _original is None:
+        _original = builtins.__import__
+        builtins.__import__ = _importar
+
+
+def desativar():
+    global _original
+    if _original is not None:
+        builtins.__import__ = _original
+        _original = None
+
+
+def imports():
+    """[(módulo, profundidade, total, próprio)] dos módulos carregados desde ativar()"""
+    with _lock:
+        return list(_registros)
+
+
+def imprimir(inicializacoes=(), limite=15):
+    """
+    Imprime os imports diretos (profundidade 0) e os mais lentos por tempo
+    próprio, mais os tempos de inicialização [(serviço, segundos)].
+    """
+    registros = imports()
+    diretos = sorted((r for r in registros if r[1] == 0), key=lambda r: r[2], reverse=True)
+    total = sum(r[2] for r in diretos)
+
+    print(f"\n⏱ Imports: {len(registros)} módulos em {total:.3f}s")
+    for modulo, _, tempo_total, _ in diretos[:limite]:
+        print(f"   {tempo_total:8.3f}s  {modulo}")
+    print("⏱ Mais lentos (tempo próprio):")
+    for modulo, _, _, proprio in sorted(registros, key=lambda r: r[3], reverse=True)[:limite]:
+        print(f"   {proprio:8.3f}s  {modulo}")
+    if inicializacoes:
+        print("⏱ Inicialização:")
+        for servico, segundos in sorted(inicializacoes, key=lambda i: i[1], reverse=True):
+            print(f"   {segundos:8.3f}s  {servico}")
@@ -0,0 +1,397 @@
+"""
+Pipeline de anúncios em estágios encadeáveis (geradores):
+
+    fonte → parse → filtro → diff → enriquecimento → destino
+
+Cada estágio é uma função que recebe um iterável (e opções nomeadas) e
+devolve outro iterável, então pode ser trocado, reordenado ou medido
+isoladamente com cronometrar(). Entre os estágios passa um Listing
+(com __slots__) em vez de dicts avulsos; ele também aceita
+listing['campo'] / listing.get('campo') para o código que trata as
+novidades como dict (planejador, oportunidades).
+
+EstagioParalelo roda um trecho do pipeline numa thread alimentada por uma
+fila limitada: a busca segue baixando páginas enquanto o enriquecimento
+trabalha, e a fila cheia segura a busca, então a memória fica limitada e o
+estágio mais lento define o ritmo, em vez da soma de todos.
+"""
+
+import asyncio
+import queue
+import re
+import threading
+import time
+from datetime import datetime
+
+from services.metricas import metricas
+from services.next_data import extrair_next_data
+
+STATUS_NOVO = "🆕 NOVO"
+STATUS_BAIXOU = "📉 BAIXOU"
+STATUS_SUBIU = "📈 SUBIU"
+
+_FIM = object()
+# último segmento do link só com dígitos: .../anuncio/<slug>/1800000 (com ou
+# sem / e query); o mínimo de dígitos descarta anos e números curtos
+# (.../hb20-1-0-2018 ou .../2018 não são IDs)
+_NUMERO_NO_LINK = re.compile(r'/(\d{5,})/?(?:[?#].*)?$')
+
+
+def limpar_preco(preco_str):
+    try:
+        limpo = preco_str.replace('R$', '').replace(
+            '.', '').replace(',', '.').strip()
+        return float(limpo)
+    except:
+        return 0.0
+
+
+def id_canonico(valor):
+    """
+    ID numérico do anúncio a partir do id (int ou texto só com dígitos) ou
+    do link do autocarro (o último segmento da URL, se numérico). None se
+    não houver ID; quem chama usa o link inteiro.
+    """
+    if isinstance(valor, int) and not isinstance(valor, bool):
+        return valor
+    if not isinstance(valor, str):
+        return None
+    valor = valor.strip()
+    if valor.isdecimal():
+        return int(valor)
+    encontrado = _NUMERO_NO_LINK.search(valor)
+    return int(encontrado.group(1)) if encontrado else None
+
+
+def id_anuncio(carro):
+    """car_id canônico de um anúncio bruto (o link inteiro se não houver número)"""
+    link = carro.get('link')
+    canonico = id_canonico(carro.get('id'))
+    if canonico is None:
+        canonico = id_canonico(link)
+    return canonico if canonico is not None else str(link)
+
+
+class Listing:
+    """Anúncio que percorre o pipeline (do parse até a gravação e o alerta)"""
+
+    __slots__ = (
+        'car_id', 'model', 'version', 'nome_completo', 'preco_visual', 'preco_float',
+        'year_model', 'link', 'cidade', 'status_aviso', 'watchlists', 'fipe',
+        'fipe_numerico', 'desconto_fipe', 'zscore', 'pontuacao',
+    )
+
+    def __init__(self, car_id, model, version, preco_visual, preco_float, year_model, link,
+                 cidade=None):
+        self.car_id = car_id
+        self.model = model
+        self.version = version
+        self.nome_completo = f"{model} {version}".strip()
+        self.preco_visual = preco_visual
+        self.preco_float = preco_float
+        self.year_model = year_model
+        self.link = link
+        self.cidade = cidade
+        self.status_aviso = None
+        self.watchlists = None
+        self.fipe = None
+        self.fipe_numerico = None
+        self.desconto_fipe = None
+        self.zscore = None
+        self.pontuacao = None
+
+    @classmethod
+    def de_oferta(cls, carro):
+        """Anúncio bruto de offers.items"""
+        link = carro.get('link')
+        preco_visual = carro.get('priceCurrency', 'R$ 0')
+        return cls(
+            car_id=id_anuncio(carro),
+            model=(carro.get('model') or '').upper(),
+            version=(carro.get('version') or '').upper(),
+            preco_visual=preco_visual,
+            preco_float=limpar_preco(preco_visual),
+            year_model=carro.get('yearModel'),
+            link=link,
+            cidade=carro.get('city'),
+        )
+
+    # acesso como dict, para o código que trata novidades como dicts
+    def __getitem__(self, campo):
+        try:
+            return getattr(self, campo)
+        except AttributeError:
+            raise KeyError(campo) from None
+
+    def __setitem__(self, campo, valor):
+        try:
+            setattr(self, campo, valor)
+        except AttributeError:
+            raise KeyError(campo) from None
+
+    def get(self, campo, padrao=None):
+        return getattr(self, campo, padrao)
+
+    def __repr__(self):
+        return f"Listing({self.car_id!r}, {self.nome_completo!r}, {self.preco_visual!r})"
+
+    def para_registro(self, pontuacao=False, data=None, modelo=False):
+        """
+        Registro no formato de BufferAnuncios / SupabaseService (data: listing_date,
+        padrão agora). pontuacao / modelo: inclui as colunas opcionais.
+        """
+        fipe = self.fipe if isinstance(self.fipe, dict) else {}
+        registro = {
+            'car_id': str(self.car_id),
+            'full_name': self.nome_completo,
+            'price_display': self.preco_visual,
+            'price_numeric': self.preco_float,
+            'model_year': self.year_model,
+            'fipe_value': fipe.get('valor'),
+            'fipe_source': fipe.get('fonte'),
+            'brand': fipe.get('marca'),
+            'fipe_model': fipe.get('modelo_fipe'),
+            'fipe_year': fipe.get('ano_nome'),
+            'city_name': self.cidade or 'Brasil',
+            'listing_url': self.link,
+            'status': self.status_aviso,
+            'listing_date': data or datetime.now(),
+        }
+        if modelo:
+            registro['model'] = self.model or None
+        if pontuacao:
+            registro.update({
+                'fipe_numeric': self.fipe_numerico,
+                'fipe_discount': self.desconto_fipe,
+                'price_zscore': self.zscore,
+                'deal_score': self.pontuacao,
+            })
+        return registro
+
+
+def ler_ofertas(data_json, limite=None):
+    """Lista de anúncios (offers.items) do __NEXT_DATA__ já decodificado"""
+    page_props = data_json.get('props', {}).get('pageProps', {})
+    offers = page_props.get('offers', {})
+    lista_bruta = offers.get('items', [])
+
+    if limite is not None:
+        lista_bruta = lista_bruta[:limite]
+    return lista_bruta
+
+
+# --- estágios ---
+
+def analisar(conteudos, limite=None):
+    """parse: páginas (HTML em bytes/str) -> anúncios brutos"""
+    for conteudo in conteudos:
+        data_json = extrair_next_data(conteudo)
+        if data_json:
+            yield from ler_ofertas(data_json, limite)
+
+
+def normalizar(itens):
+    """anúncios brutos -> Listing"""
+    for carro in itens:
+        yield Listing.de_oferta(carro)
+
+
+def filtrar(listings, predicado):
+    for listing in listings:
+        if predicado(listing):
+            yield listing
+
+
+def sem_sedan(listings):
+    return filtrar(listings, lambda listing: 'SEDAN' not in listing.nome_completo)
+
+
+def deduplicar(listings, processados, origem=None, vistos=None):
+    """
+    Deixa passar só a primeira ocorrência de cada car_id na execução, então
+    cada anúncio vai uma vez só à FIPE e ao banco, em quantas buscas aparecer.
+    processados: dict car_id -> origens (buscas) em que o anúncio apareceu.
+    vistos: lista opcional que recebe os car_ids repetidos (continuam no ar).
+    """
+    for listing in listings:
+        ja_processado = listing.car_id in processados
+        processados.setdefault(listing.car_id, set()).add(origem)
+        if ja_processado:
+            metricas.contar('anuncios_repetidos')
+            if vistos is not None:
+                vistos.append(listing.car_id)
+            continue
+        yield listing
+
+
+def comparar(listings, memoria, nova_memoria, vistos=None):
+    """
+    diff com a memória de preços: deixa passar os novos e os que mudaram de
+    preço (com status_aviso), gravando o preço em nova_memoria.
+    vistos: lista opcional que recebe o car_id de todos os considerados.
+    """
+    for listing in listings:
+        car_id = listing.car_id
+        preco_antigo = memoria.get(car_id)
+        nova_memoria.marcar_visto(car_id, listing.model, listing.year_model)
+        if vistos is not None:
+            vistos.append(car_id)
+
+        if car_id not in memoria:
+            listing.status_aviso = STATUS_NOVO
+        elif listing.preco_float != preco_antigo:
+            listing.status_aviso = STATUS_BAIXOU if listing.preco_float < preco_antigo else STATUS_SUBIU
+        else:
+            continue  # preço mantido
+        nova_memoria[car_id] = listing.preco_float
+        yield listing
+
+
+def enriquecer(listings, resolver, tamanho_lote=20, estatisticas=None):
+    """
+    Preenche listing.fipe em lotes de até `tamanho_lote` anúncios.
+    resolver(consultas) -> (resultados, _), como resolver_fipe_em_lote.
+    Consultas repetidas na execução (mesmo modelo/versão/ano) são resolvidas
+    uma vez só. estatisticas: dict opcional acumulando consultas/unicas/economizadas.
+    """
+    from services.fipe_service import chave_fipe
+
+    estatisticas = estatisticas if estatisticas is not None else {}
+    for campo in ('consultas', 'unicas', 'economizadas'):
+        estatisticas.setdefault(campo, 0)
+    resolvidos = {}
+
+    def _resolver_lote(lote):
+        chaves = [chave_fipe(l.model, l.version, l.year_model) for l in lote]
+        pendentes = {}
+        for chave, listing in zip(chaves, lote):
+            if chave not in resolvidos:
+                pendentes.setdefault(chave, (listing.model, listing.version, listing.year_model))
+        if pendentes:
+            resultados, _ = resolver(list(pendentes.values()))
+            resolvidos.update(zip(pendentes, resultados))
+        estatisticas['consultas'] += len(lote)
+        estatisticas['unicas'] += len(pendentes)
+        estatisticas['economizadas'] += len(lote) - len(pendentes)
+        for chave, listing in zip(chaves, lote):
+            listing.fipe = dict(resolvidos[chave]) if resolvidos[chave] else None
+        return lote
+
+    lote = []
+    for listing in listings:
+        lote.append(listing)
+        if len(lote) >= tamanho_lote:
+            yield from _resolver_lote(lote)
+            lote = []
+    if lote:
+        yield from _resolver_lote(lote)
+
+
+def gravar(listings, buffer, pontuacao=False, modelo=False):
+    """destino: enfileira cada anúncio no BufferAnuncios e o repassa adiante"""
+    for listing in listings:
+        buffer.adicionar(listing.para_registro(pontuacao, modelo=modelo))
+        yield listing
+
+
+# --- composição ---
+
+def encadear(fonte, *estagios):
+    """encadear(paginas, analisar, normalizar, ...) -> iterável do último estágio"""
+    for estagio in estagios:
+        fonte = estagio(fonte)
+    return fonte
+
+
+def cronometrar(nome, estagio):
+    """
+    Envolve um estágio para registrar nas métricas o tempo gasto só nele
+    (descontando a espera pelo estágio anterior): tempo 'estagio' e
+    contador 'estagio_itens', rotulados com estagio=nome.
+    """
+    def _cronometrado(itens, *args, **kwargs):
+        espera = 0.0
+
+        def _entrada():
+            nonlocal espera
+            iterador = iter(itens)
+            while True:
+                inicio = time.perf_counter()
+                try:
+                    item = next(iterador)
+                except StopIteration:
+                    espera += time.perf_counter() - inicio
+                    return
+                espera += time.perf_counter() - inicio
+                yield item
+
+        saida = iter(estagio(_entrada(), *args, **kwargs))
+        total = 0.0
+        quantidade = 0
+        try:
+            while True:
+                inicio = time.perf_counter()
+                try:
+                    item = next(saida)
+                except StopIteration:
+                    total += time.perf_counter() - inicio
+                    return
+                total += time.perf_counter() - inicio
+                quantidade += 1
+                yield item
+        finally:
+            metricas.registrar_tempo('estagio', max(0.0, total - espera), estagio=nome)
+            metricas.contar('estagio_itens', quantidade, estagio=nome)
+
+    return _cronometrado
+
+
+class EstagioParalelo:
+    """
+    Roda `estagio` (iterável -> iterável) numa thread própria, alimentado
+    por uma fila de até `tamanho_fila` itens. enviar() bloqueia com a fila
+    cheia (enviar_async() espera sem travar o loop asyncio); fechar() espera
+    o estágio terminar e devolve a lista de saída (ou levanta o erro que o
+    interrompeu).
+    """
+
+    def __init__(self, estagio, tamanho_fila=200, nome='pipeline'):
+        self._fila = queue.Queue(maxsize=tamanho_fila)
+        self._saida = []
+        self._erro = None
+        self._thread = threading.Thread(target=self._executar, args=(estagio,), name=nome, daemon=True)
+        self._thread.start()
+
+    def _entrada(self):
+        while True:
+            item = self._fila.get()
+            if item is _FIM:
+                return
+            yield item
+
+    def _executar(self, estagio):
+        try:
+            for item in estagio(self._entrada()):
+                self._saida.append(item)
+        except BaseException as e:
+            self._erro = e
+            # esvazia a fila para não travar quem ainda está enviando
+            while self._fila.get() is not _FIM:
+                pass
+
+    def enviar(self, item):
+        self._fila.put(item)
+
+    async def enviar_async(self, item):
+        try:
+            self._fila.put_nowait(item)
+        except queue.Full:
+            # a espera pela fila vai para uma thread; o loop segue com as outras buscas
+            await asyncio.get_running_loop().run_in_executor(None, self._fila.put, item)
+
+    def fechar(self):
+        self._fila.put(_FIM)
+        self._thread.join()
+        if self._erro is not None:
+            raise self._erro
+        return self._saida
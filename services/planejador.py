@@ -0,0 +1,162 @@
+"""
+Planejamento das buscas a partir das watchlists (watchlists.json).
+
+Formato do arquivo:
+
+    {
+      "padroes": {"estados": [43], "cambios": [1]},
+      "watchlists": [
+        {"nome": "HB20", "query": "hb20", "ano_de": 2015, "preco_ate": 60000},
+        {"nome": "HB20 SC/RS", "query": "hb20", "estados": [42, 43],
+         "cambios": [null], "ano_de": 2018, "preco_de": 50000, "preco_ate": 80000}
+      ]
+    }
+
+`estados` / `cambios` são os códigos do autocarro (null = qualquer câmbio).
+Faixas de ano e preço: ano_de, ano_ate, preco_de, preco_ate (todas opcionais).
+
+Os anúncios não trazem estado nem câmbio, então esses filtros continuam
+indo na URL; já as faixas de ano e preço são unidas numa busca ampla por
+(query, estado, câmbio) e aplicadas localmente a cada watchlist.
+"""
+
+import json
+import os
+from urllib.parse import urlencode
+
+CAMPOS_FAIXA = ('ano_de', 'ano_ate', 'preco_de', 'preco_ate')
+
+
+def _lista(valor):
+    if valor is None:
+        return [None]
+    return list(valor) if isinstance(valor, (list, tuple)) else [valor]
+
+
+def normalizar_watchlist(watchlist, padroes=None):
+    """Watchlist com todos os campos preenchidos (padrões do arquivo aplicados)"""
+    padroes = padroes or {}
+    dados = {**padroes, **watchlist}
+    if not dados.get('query'):
+        raise ValueError(f"watchlist sem query: {watchlist}")
+    normalizada = {
+        'nome': dados.get('nome') or dados['query'].upper(),
+        'query': dados['query'],
+        'estados': _lista(dados.get('estados', dados.get('estado'))),
+        'cambios': _lista(dados.get('cambios', dados.get('cambio'))),
+    }
+    for campo in CAMPOS_FAIXA:
+        normalizada[campo] = dados.get(campo)
+    return normalizada
+
+
+def carregar_watchlists(caminho, padrao=None, padroes=None):
+    """
+    Lê as watchlists do arquivo JSON. Sem arquivo, usa `padrao`
+    (lista de watchlists no mesmo formato) com os `padroes` informados.
+    """
+    if caminho and os.path.exists(caminho):
+        with open(caminho, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        padroes = config.get('padroes', {})
+        watchlists = config.get('watchlists', [])
+    else:
+        watchlists = padrao or []
+    return [normalizar_watchlist(w, padroes) for w in watchlists]
+
+
+def _min_ou_nenhum(valores):
+    # uma watchlist sem limite obriga a busca ampla a não ter limite
+    return None if any(v is None for v in valores) else min(valores)
+
+
+def _max_ou_nenhum(valores):
+    return None if any(v is None for v in valores) else max(valores)
+
+
+def url_busca(url_base, query, estado=None, cambio=None, ano_de=None, preco_ate=None,
+              extras=None):
+    parametros = [
+        ('q', query), ('ano_de', ano_de), ('preco_ate', preco_ate),
+        ('cambio', cambio), ('estado', estado),
+    ]
+    parametros += list((extras or {}).items())
+    return f"{url_base}?{urlencode([(k, v) for k, v in parametros if v is not None])}"
+
+
+def planejar(watchlists, url_base, extras=None):
+    """
+    Une as watchlists no menor conjunto de buscas: uma por
+    (query, estado, câmbio), com o menor ano_de e o maior preco_ate entre
+    as watchlists que a usam.
+    Retorna a lista de buscas: dicts com 'query', 'estado', 'cambio',
+    'ano_de', 'preco_ate', 'url' e 'watchlists' (índices em `watchlists`).
+    """
+    grupos = {}
+    for indice, watchlist in enumerate(watchlists):
+        for estado in watchlist['estados']:
+            for cambio in watchlist['cambios']:
+                chave = (watchlist['query'].lower(), estado, cambio)
+                grupos.setdefault(chave, []).append(indice)
+
+    buscas = []
+    for (query, estado, cambio), indices in grupos.items():
+        ano_de = _min_ou_nenhum([watchlists[i]['ano_de'] for i in indices])
+        preco_ate = _max_ou_nenhum([watchlists[i]['preco_ate'] for i in indices])
+        buscas.append({
+            'query': query,
+            'estado': estado,
+            'cambio': cambio,
+            'ano_de': ano_de,
+            'preco_ate': preco_ate,
+            'url': url_busca(url_base, query, estado, cambio, ano_de, preco_ate, extras),
+            'watchlists': sorted(set(indices)),
+        })
+    return buscas
+
+
+def nome_busca(busca):
+    partes = [busca['query'].upper()]
+    if busca['estado'] is not None:
+        partes.append(f"UF{busca['estado']}")
+    if busca['cambio'] is not None:
+        partes.append(f"câmbio {busca['cambio']}")
+    return ' '.join(partes)
+
+
+def aceita(watchlist, novidade):
+    """Aplica localmente as faixas de ano e preço da watchlist"""
+    try:
+        ano = int(novidade.get('year_model'))
+    except (TypeError, ValueError):
+        ano = None
+    preco = novidade.get('preco_float')
+
+    if watchlist['ano_de'] is not None and (ano is None or ano < watchlist['ano_de']):
+        return False
+    if watchlist['ano_ate'] is not None and (ano is None or ano > watchlist['ano_ate']):
+        return False
+    if watchlist['preco_de'] is not None and (not preco or preco < watchlist['preco_de']):
+        return False
+    if watchlist['preco_ate'] is not None and (not preco or preco > watchlist['preco_ate']):
+        return False
+    return True
+
+
+def aceita_alguma(watchlists, novidade):
+    """Pré-filtro antes do roteamento: a novidade cabe nas faixas de alguma watchlist"""
+    return any(aceita(watchlist, novidade) for watchlist in watchlists)
+
+
+def rotear(novidade, indices_buscas, buscas, watchlists):
+    """
+    Nomes das watchlists que recebem a novidade: as das buscas em que o
+    anúncio apareceu (indices_buscas) cujas faixas ele satisfaz.
+    """
+    nomes = []
+    for indice_busca in sorted(indices_buscas):
+        for indice in buscas[indice_busca]['watchlists']:
+            watchlist = watchlists[indice]
+            if watchlist['nome'] not in nomes and aceita(watchlist, novidade):
+                nomes.append(watchlist['nome'])
+    return nomes
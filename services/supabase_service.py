@@ -1,14 +1,73 @@
-from supabase import create_client, Client
 from datetime import datetime
 import os
+import time
 from dotenv import load_dotenv
 from pathlib import Path
 
+from services.metricas import metricas
+
 # Carregar variáveis de ambiente (prioriza .env.staging)
 _root = Path(__file__).resolve().parents[1]
 load_dotenv(_root / ".env.staging")
 load_dotenv(_root / ".env")
 
+TAMANHO_LOTE_PADRAO = 100
+INTERVALO_DESCARGA_PADRAO = 10.0
+
+# car_ids por chamada de obter_historicos_precos
+TAMANHO_LOTE_HISTORICO = 200
+# car_ids por requisição de marcar_removidos (o filtro in_ vai na URL)
+TAMANHO_LOTE_REMOVIDOS = 100
+# preenchidas pelo banco: não são copiadas para a linha de REMOVIDO
+COLUNAS_GERADAS = ('id', 'created_at', 'updated_at')
+
+# Colunas opcionais da pontuação de oportunidades (sql/listings_pontuacao.sql)
+CAMPOS_PONTUACAO = ('fipe_numeric', 'fipe_discount', 'price_zscore', 'deal_score')
+# e do modelo usado nas estatísticas (sql/estatisticas_listings.sql)
+CAMPOS_OPCIONAIS = ('model',) + CAMPOS_PONTUACAO
+
+
+def _montar_registro(dados):
+    registro = {
+        'car_id': dados.get('car_id'),
+        'full_name': dados.get('full_name'),
+        'price_display': dados.get('price_display'),
+        'price_numeric': dados.get('price_numeric'),
+        'model_year': dados.get('model_year'),
+        'fipe_value': dados.get('fipe_value'),
+        'fipe_source': dados.get('fipe_source'),
+        'brand': dados.get('brand'),
+        'fipe_model': dados.get('fipe_model'),
+        'fipe_year': dados.get('fipe_year'),
+        'city_name': dados.get('city_name'),
+        'listing_url': dados.get('listing_url'),
+        'status': dados.get('status'),
+        'listing_date': (dados.get('listing_date') or datetime.now()).isoformat()
+    }
+    # só quando o chamador preencheu (as colunas podem não existir no banco)
+    registro.update({campo: dados[campo] for campo in CAMPOS_OPCIONAIS if campo in dados})
+    return registro
+
+
+def _eventos_removidos(linhas, status):
+    """
+    Uma linha nova com `status` por car_id, copiada do registro mais recente
+    dele (linhas em ordem decrescente de created_at). Anúncios cujo último
+    registro já tem o status ficam de fora.
+    """
+    ultimas = {}
+    for linha in linhas:
+        ultimas.setdefault(str(linha['car_id']), linha)
+    agora = datetime.now().isoformat()
+    return [
+        {
+            **{coluna: valor for coluna, valor in linha.items() if coluna not in COLUNAS_GERADAS},
+            'status': status,
+            'listing_date': agora,
+        }
+        for linha in ultimas.values() if linha.get('status') != status
+    ]
+
 
 class SupabaseService:
     def __init__(self):
@@ -19,30 +78,20 @@ class SupabaseService:
             raise ValueError(
                 "❌ SUPABASE_URL e SUPABASE_KEY devem estar definidas no arquivo .env.staging ou .env"
             )
-        
-        self.client: Client = create_client(url, key)
+
+        # import pesado (httpx, gotrue, postgrest): só quando o cliente é criado
+        from supabase import create_client
+
+        self.client = create_client(url, key)
         print("✓ Cliente Supabase inicializado com sucesso.")
 
     def salvar_anuncio(self, dados):
         try:
-            registro = {
-                'car_id': dados.get('car_id'),
-                'full_name': dados.get('full_name'),
-                'price_display': dados.get('price_display'),
-                'price_numeric': dados.get('price_numeric'),
-                'model_year': dados.get('model_year'),
-                'fipe_value': dados.get('fipe_value'),
-                'fipe_source': dados.get('fipe_source'),
-                'brand': dados.get('brand'),
-                'fipe_model': dados.get('fipe_model'),
-                'fipe_year': dados.get('fipe_year'),
-                'city_name': dados.get('city_name'),
-                'listing_url': dados.get('listing_url'),
-                'status': dados.get('status'),
-                'listing_date': dados.get('listing_date', datetime.now()).isoformat()
-            }
-            
-            response = self.client.table('listings').insert(registro).execute()
+            registro = _montar_registro(dados)
+
+            with metricas.medir('db', operacao='insert'):
+                metricas.contar('db_round_trips', operacao='insert')
+                response = self.client.table('listings').insert(registro).execute()
             
             print(f"✓ Anúncio {dados.get('car_id')} salvo no Supabase.")
             return True
@@ -55,6 +104,82 @@ class SupabaseService:
                 print(f"❌ Erro ao salvar anúncio no Supabase: {e}")
                 return False
 
+    def salvar_anuncios_em_lote(self, lista_dados):
+        """
+        Grava vários anúncios com um único insert.
+        A tabela listings é o histórico de preços: cada alteração vira uma
+        linha nova (como em salvar_anuncio), então o lote não sobrescreve
+        nada nem precisa de restrição única em car_id.
+        Retorna uma lista de resultados por linha, na ordem de entrada:
+        {'car_id', 'ok', 'erro'}. Se o lote falhar, tenta linha a linha
+        para identificar quais registros têm problema.
+        """
+        if not lista_dados:
+            return []
+
+        registros = [_montar_registro(dados) for dados in lista_dados]
+
+        try:
+            with metricas.medir('db', operacao='insert_lote'):
+                metricas.contar('db_round_trips', operacao='insert_lote')
+                self.client.table('listings').insert(registros).execute()
+            metricas.contar('db_linhas', len(registros), operacao='insert_lote')
+            print(f"✓ {len(registros)} anúncios salvos no Supabase (lote).")
+            return [{'car_id': r['car_id'], 'ok': True, 'erro': None} for r in registros]
+        except Exception as e:
+            print(f"⚠ Falha no lote de {len(registros)} anúncios, gravando um a um: {e}")
+
+        resultados = []
+        for registro in registros:
+            try:
+                with metricas.medir('db', operacao='insert_linha'):
+                    metricas.contar('db_round_trips', operacao='insert_linha')
+                    self.client.table('listings').insert(registro).execute()
+                resultados.append({'car_id': registro['car_id'], 'ok': True, 'erro': None})
+            except Exception as e:
+                if 'duplicate key' in str(e).lower():
+                    # a linha já está no banco: nada a regravar
+                    print(f"⚠ Anúncio {registro['car_id']} já existe no banco.")
+                    resultados.append({'car_id': registro['car_id'], 'ok': True, 'erro': None})
+                    continue
+                print(f"❌ Erro ao salvar anúncio {registro['car_id']} no Supabase: {e}")
+                resultados.append({'car_id': registro['car_id'], 'ok': False, 'erro': str(e)})
+        return resultados
+
+    def marcar_removidos(self, car_ids, status='🗑 REMOVIDO'):
+        """
+        Registra que os anúncios saíram do ar. listings é um histórico só de
+        inserções: cada anúncio ganha uma linha nova com o status (cópia do
+        último registro dele), sem reescrever as anteriores. Anúncios que
+        nunca foram gravados no banco são ignorados.
+        Lotes de TAMANHO_LOTE_REMOVIDOS car_ids (uma leitura e uma inserção
+        por lote). Retorna quantos foram marcados.
+        """
+        car_ids = list(dict.fromkeys(str(car_id) for car_id in car_ids))
+        marcados = 0
+        try:
+            for inicio in range(0, len(car_ids), TAMANHO_LOTE_REMOVIDOS):
+                lote = car_ids[inicio:inicio + TAMANHO_LOTE_REMOVIDOS]
+                with metricas.medir('db', operacao='marcar_removidos'):
+                    metricas.contar('db_round_trips', operacao='marcar_removidos')
+                    response = (
+                        self.client.table('listings')
+                        .select('*')
+                        .in_('car_id', lote)
+                        .order('created_at', desc=True)
+                        .execute()
+                    )
+                    eventos = _eventos_removidos(response.data or [], status)
+                    if eventos:
+                        metricas.contar('db_round_trips', operacao='marcar_removidos')
+                        self.client.table('listings').insert(eventos).execute()
+                marcados += len(eventos)
+        except Exception as e:
+            print(f"❌ Erro ao marcar anúncios removidos: {e}")
+        if marcados:
+            print(f"✓ {marcados} anúncios marcados como removidos no Supabase.")
+        return marcados
+
     def obter_historico_preco(self, car_id, limite=10):
         try:
             response = (
@@ -77,45 +202,68 @@ class SupabaseService:
             print(f"❌ Erro ao obter histórico: {e}")
             return []
 
+    def obter_historicos_precos(self, car_ids, limite=10, desde=None):
+        """
+        Histórico de preço de vários anúncios de uma vez (uma chamada por
+        lote de TAMANHO_LOTE_HISTORICO car_ids) pela função historico_precos
+        (sql/historico_precos.sql): os `limite` registros mais recentes de cada um.
+        desde: {car_id: updated_at} para trazer só as linhas inseridas ou
+        alteradas (ex: status REMOVIDO) depois dessa marca d'água.
+        Retorna {car_id: [(created_at, price_numeric, status, updated_at), ...]}
+        do mais recente ao mais antigo; anúncios sem linhas novas ficam de fora.
+        """
+        car_ids = list(dict.fromkeys(str(car_id) for car_id in car_ids))
+        desde = desde or {}
+        historicos = {}
+        try:
+            for inicio in range(0, len(car_ids), TAMANHO_LOTE_HISTORICO):
+                lote = car_ids[inicio:inicio + TAMANHO_LOTE_HISTORICO]
+                with metricas.medir('db', operacao='historico_lote'):
+                    metricas.contar('db_round_trips', operacao='historico_lote')
+                    response = self.client.rpc('historico_precos', {
+                        'car_ids': lote,
+                        'desde': [desde.get(car_id) for car_id in lote],
+                        'limite': limite,
+                    }).execute()
+                for item in response.data or []:
+                    historicos.setdefault(item['car_id'], []).append(
+                        (item['created_at'], item['price_numeric'], item['status'], item['updated_at'])
+                    )
+            return historicos
+
+        except Exception as e:
+            print(f"❌ Erro ao obter históricos: {e}")
+            print("   (a função historico_precos foi criada? veja sql/historico_precos.sql)")
+            return historicos
+
     def obter_estatisticas(self):
+        """
+        Estatísticas calculadas no banco pela função estatisticas_listings
+        (sql/estatisticas_listings.sql): totais gerais mais a quebra por
+        modelo e por modelo/ano, com payload de tamanho fixo.
+        """
+        vazio = {
+            'total_anuncios': 0,
+            'total_registros': 0,
+            'preco_medio': 0,
+            'preco_minimo': 0,
+            'preco_maximo': 0,
+            'por_modelo': [],
+            'por_modelo_ano': []
+        }
         try:
-            response = (
-                self.client.table('listings')
-                .select('car_id, price_numeric')
-                .execute()
-            )
-            
+            with metricas.medir('db', operacao='estatisticas'):
+                metricas.contar('db_round_trips', operacao='estatisticas')
+                response = self.client.rpc('estatisticas_listings').execute()
             dados = response.data
-            
             if not dados:
-                return {
-                    'total_anuncios': 0,
-                    'total_registros': 0,
-                    'preco_medio': 0,
-                    'preco_minimo': 0,
-                    'preco_maximo': 0
-                }
-            
-            car_ids_unicos = set(item['car_id'] for item in dados)
-            precos = [item['price_numeric'] for item in dados if item['price_numeric']]
-            
-            return {
-                'total_anuncios': len(car_ids_unicos),
-                'total_registros': len(dados),
-                'preco_medio': sum(precos) / len(precos) if precos else 0,
-                'preco_minimo': min(precos) if precos else 0,
-                'preco_maximo': max(precos) if precos else 0
-            }
-            
+                return vazio
+            return {**vazio, **dados}
+
         except Exception as e:
             print(f"❌ Erro ao obter estatísticas: {e}")
-            return {
-                'total_anuncios': 0,
-                'total_registros': 0,
-                'preco_medio': 0,
-                'preco_minimo': 0,
-                'preco_maximo': 0
-            }
+            print("   (a função estatisticas_listings foi criada? veja sql/estatisticas_listings.sql)")
+            return vazio
 
     def listar_anuncios_recentes(self, limite=20):
         try:
@@ -153,3 +301,91 @@ class SupabaseService:
         except Exception as e:
             print(f"❌ Erro na conexão com Supabase: {e}")
             return False
+
+
+class SupabasePreguicoso:
+    """
+    Adia a criação do SupabaseService (e o import do supabase) até o
+    primeiro uso: varreduras sem novidades nunca carregam o cliente.
+    Se a conexão falhar, cada uso levanta o mesmo erro, sem nova tentativa,
+    e quem chama decide se segue sem o banco.
+    """
+
+    def __init__(self, fabrica=SupabaseService):
+        self._fabrica = fabrica
+        self._servico = None
+        self._erro = None
+
+    @property
+    def iniciado(self):
+        return self._servico is not None
+
+    def _obter(self):
+        if self._servico is None:
+            if self._erro is not None:
+                raise self._erro
+            try:
+                with metricas.medir('inicializacao', servico='supabase'):
+                    self._servico = self._fabrica()
+            except Exception as e:
+                print(f"❌ Erro Supabase: {e}")
+                self._erro = e
+                raise
+        return self._servico
+
+    def __getattr__(self, nome):
+        return getattr(self._obter(), nome)
+
+
+class BufferAnuncios:
+    """
+    Acumula anúncios durante a execução e grava em lotes via
+    salvar_anuncios_em_lote. Descarrega ao atingir `tamanho_lote` registros
+    ou quando o registro mais antigo no buffer passa de `intervalo` segundos.
+    Chame descarregar() ao final para gravar o que sobrou.
+    guardar_resultados=False mantém só as contagens (gravados / falhas),
+    para cargas grandes em que a lista de resultados cresceria sem limite.
+    """
+
+    def __init__(self, db, tamanho_lote=TAMANHO_LOTE_PADRAO, intervalo=INTERVALO_DESCARGA_PADRAO,
+                 guardar_resultados=True):
+        self.db = db
+        self.tamanho_lote = tamanho_lote
+        self.intervalo = intervalo
+        self.guardar_resultados = guardar_resultados
+        self.resultados = []
+        self.lotes_enviados = 0
+        self.gravados = 0
+        self.falhas = 0
+        self._buffer = []
+        self._inicio = None
+
+    def __len__(self):
+        return len(self._buffer)
+
+    def adicionar(self, dados):
+        if not self._buffer:
+            self._inicio = time.monotonic()
+        self._buffer.append(dados)
+
+        if (len(self._buffer) >= self.tamanho_lote
+                or time.monotonic() - self._inicio >= self.intervalo):
+            self.descarregar()
+
+    def descarregar(self):
+        """Grava o buffer atual; retorna os resultados deste lote"""
+        if not self._buffer:
+            return []
+        lote, self._buffer = self._buffer, []
+        try:
+            resultados = self.db.salvar_anuncios_em_lote(lote)
+        except Exception as e:
+            # banco indisponível (ex: cliente não pôde ser criado): o lote inteiro falha
+            resultados = [{'car_id': dados.get('car_id'), 'ok': False, 'erro': str(e)} for dados in lote]
+        self.lotes_enviados += 1
+        ok = sum(1 for r in resultados if r['ok'])
+        self.gravados += ok
+        self.falhas += len(resultados) - ok
+        if self.guardar_resultados:
+            self.resultados.extend(resultados)
+        return resultados
@@ -1,5 +1,21 @@
+import asyncio
+import html
 import os
-import requests
+import httpx
+
+from services.http_client import CircuitoAberto, cliente_async, requisitar, requisitar_async
+from services.metricas import metricas
+
+API_TELEGRAM = os.getenv('TELEGRAM_API_URL', 'https://api.telegram.org')
+LIMITE_CARACTERES = 4096
+TIMEOUT_TELEGRAM = 10
+MAX_TENTATIVAS = 5
+# O Telegram recomenda no máximo ~1 mensagem por segundo por chat
+INTERVALO_MINIMO = 1.0
+
+
+def _credenciais(token, chat_id):
+    return token or os.environ.get('TELEGRAM_TOKEN'), chat_id or os.environ.get('TELEGRAM_CHAT_ID')
 
 
 def enviar_telegram(msg, token=None, chat_id=None):
@@ -7,16 +23,118 @@ def enviar_telegram(msg, token=None, chat_id=None):
     Envia mensagem para o Telegram. token/chat_id podem ser passados ou
     obtidos de variáveis de ambiente TELEGRAM_TOKEN / TELEGRAM_CHAT_ID.
     """
-    TELEGRAM_TOKEN = token or os.environ.get('TELEGRAM_TOKEN')
-    TELEGRAM_CHAT_ID = chat_id or os.environ.get('TELEGRAM_CHAT_ID')
+    TELEGRAM_TOKEN, TELEGRAM_CHAT_ID = _credenciais(token, chat_id)
 
     if not TELEGRAM_TOKEN or not TELEGRAM_CHAT_ID:
         print(f" [!] Sem config de Telegram. Msg seria: {msg}")
         return
 
-    url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage"
+    url = f"{API_TELEGRAM}/bot{TELEGRAM_TOKEN}/sendMessage"
     payload = {'chat_id': TELEGRAM_CHAT_ID, 'text': msg, 'parse_mode': 'HTML'}
     try:
-        requests.post(url, data=payload)
+        with metricas.medir('telegram_envio'):
+            response = requisitar('POST', url, tentativas=MAX_TENTATIVAS, data=payload,
+                                  timeout=TIMEOUT_TELEGRAM)
+        metricas.contar('telegram_requisicoes', status=response.status_code)
     except Exception as e:
         print(f"Erro Telegram: {e}")
+
+
+def _tamanho(texto):
+    # o Telegram conta o limite em unidades UTF-16 (emojis valem 2)
+    return len(texto.encode('utf-16-le')) // 2
+
+
+def agrupar_mensagens(msgs, limite=LIMITE_CARACTERES, separador='\n\n'):
+    """
+    Junta os alertas em mensagens de até `limite` caracteres.
+    Alertas maiores que o limite sozinhos são quebrados em pedaços.
+    """
+    lotes = []
+    atual = ''
+    for msg in msgs:
+        while _tamanho(msg) > limite:
+            if atual:
+                lotes.append(atual)
+                atual = ''
+            corte = limite // 2
+            # não corta no meio de uma entidade HTML (&amp; &lt; &gt;)
+            entidade = msg.rfind('&', corte - 4, corte)
+            if entidade > 0 and ';' not in msg[entidade:corte]:
+                corte = entidade
+            lotes.append(msg[:corte])
+            msg = msg[corte:]
+        if not msg:
+            continue
+
+        if atual and _tamanho(atual) + _tamanho(separador) + _tamanho(msg) <= limite:
+            atual = f"{atual}{separador}{msg}"
+        else:
+            if atual:
+                lotes.append(atual)
+            atual = msg
+    if atual:
+        lotes.append(atual)
+    return lotes
+
+
+async def _enviar_com_retry(client, url, payload):
+    """Envia uma mensagem; o retry_after das respostas 429 é respeitado pela camada HTTP"""
+    with metricas.medir('telegram_envio'):
+        response = await requisitar_async(
+            client, 'POST', url, tentativas=MAX_TENTATIVAS, data=payload
+        )
+    metricas.contar('telegram_requisicoes', status=response.status_code)
+    if response.status_code == 429:
+        return False
+    response.raise_for_status()
+    return True
+
+
+async def enviar_lote_async(textos, token, chat_id, intervalo=INTERVALO_MINIMO):
+    """
+    Envia os textos em ordem pelo mesmo cliente HTTP (pool de conexões).
+    Retorna (enviadas, falhas).
+    """
+    url = f"{API_TELEGRAM}/bot{token}/sendMessage"
+    enviadas = falhas = 0
+
+    async with cliente_async(timeout=TIMEOUT_TELEGRAM) as client:
+        for i, texto in enumerate(textos):
+            if i and intervalo:
+                await asyncio.sleep(intervalo)
+            payload = {'chat_id': chat_id, 'text': texto, 'parse_mode': 'HTML'}
+            try:
+                if await _enviar_com_retry(client, url, payload):
+                    enviadas += 1
+                else:
+                    falhas += 1
+            except (httpx.HTTPError, CircuitoAberto) as e:
+                print(f"Erro Telegram: {e}")
+                falhas += 1
+    return enviadas, falhas
+
+
+def enviar_telegram_em_lote(msgs, token=None, chat_id=None, cabecalho=None):
+    """
+    Agrupa os alertas em mensagens de até 4096 caracteres e envia.
+    cabecalho: texto opcional enviado no início da primeira mensagem.
+    Os textos são escapados para o parse_mode HTML: um '<' ou '&' no nome
+    de um anúncio faria o Telegram recusar a mensagem agrupada inteira.
+    Retorna dict com 'alertas', 'mensagens', 'enviadas' e 'falhas'.
+    """
+    TELEGRAM_TOKEN, TELEGRAM_CHAT_ID = _credenciais(token, chat_id)
+    msgs = list(msgs)
+    textos = agrupar_mensagens(
+        html.escape(texto, quote=False) for texto in ([cabecalho] if cabecalho else []) + msgs
+    )
+    resumo = {'alertas': len(msgs), 'mensagens': len(textos), 'enviadas': 0, 'falhas': 0}
+
+    if not TELEGRAM_TOKEN or not TELEGRAM_CHAT_ID:
+        print(f" [!] Sem config de Telegram. {len(textos)} mensagens seriam enviadas.")
+        return resumo
+
+    enviadas, falhas = asyncio.run(enviar_lote_async(textos, TELEGRAM_TOKEN, TELEGRAM_CHAT_ID))
+    resumo['enviadas'] = enviadas
+    resumo['falhas'] = falhas
+    return resumo
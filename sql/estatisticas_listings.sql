@@ -0,0 +1,75 @@
+-- Estatísticas agregadas da tabela listings, calculadas no banco.
+-- Usada por SupabaseService.obter_estatisticas via RPC:
+--   client.rpc('estatisticas_listings').execute()
+-- O retorno tem tamanho fixo (um objeto + um item por modelo / modelo-ano),
+-- independente de quantos registros a tabela acumulou.
+--
+-- A quebra por modelo usa a coluna model (Listing.model, o modelo do anúncio
+-- em maiúsculas), a mesma chave de MemoriaPrecos.estatisticas_modelos; só é
+-- gravada com GRAVAR_MODELO_DB = True em autocarro.py. Registros sem model
+-- (anteriores à coluna) entram só nos totais gerais.
+--
+-- Aplicar no SQL Editor do Supabase.
+
+alter table listings add column if not exists model text;
+
+create index if not exists idx_listings_car_id on listings (car_id);
+
+create or replace function estatisticas_listings()
+returns json
+language sql
+stable
+as $$
+  with base as (
+    select
+      car_id,
+      price_numeric,
+      upper(nullif(trim(model), '')) as modelo,
+      model_year
+    from listings
+  ),
+  geral as (
+    select
+      count(distinct car_id)                                   as total_anuncios,
+      count(*)                                                 as total_registros,
+      coalesce(avg(price_numeric) filter (where price_numeric > 0), 0) as preco_medio,
+      coalesce(min(price_numeric) filter (where price_numeric > 0), 0) as preco_minimo,
+      coalesce(max(price_numeric) filter (where price_numeric > 0), 0) as preco_maximo
+    from base
+  ),
+  por_modelo as (
+    select
+      modelo,
+      count(distinct car_id)                                   as total_anuncios,
+      count(*)                                                 as total_registros,
+      coalesce(avg(price_numeric) filter (where price_numeric > 0), 0) as preco_medio,
+      coalesce(min(price_numeric) filter (where price_numeric > 0), 0) as preco_minimo,
+      coalesce(max(price_numeric) filter (where price_numeric > 0), 0) as preco_maximo
+    from base
+    where modelo is not null
+    group by modelo
+  ),
+  por_modelo_ano as (
+    select
+      modelo,
+      model_year,
+      count(distinct car_id)                                   as total_anuncios,
+      count(*)                                                 as total_registros,
+      coalesce(avg(price_numeric) filter (where price_numeric > 0), 0) as preco_medio,
+      coalesce(min(price_numeric) filter (where price_numeric > 0), 0) as preco_minimo,
+      coalesce(max(price_numeric) filter (where price_numeric > 0), 0) as preco_maximo
+    from base
+    where modelo is not null
+    group by modelo, model_year
+  )
+  select json_build_object(
+    'total_anuncios',  g.total_anuncios,
+    'total_registros', g.total_registros,
+    'preco_medio',     g.preco_medio,
+    'preco_minimo',    g.preco_minimo,
+    'preco_maximo',    g.preco_maximo,
+    'por_modelo',      (select coalesce(json_agg(p order by p.modelo), '[]'::json) from por_modelo p),
+    'por_modelo_ano',  (select coalesce(json_agg(p order by p.modelo, p.model_year), '[]'::json) from por_modelo_ano p)
+  )
+  from geral g;
+$$;
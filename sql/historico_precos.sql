@@ -0,0 +1,58 @@
+-- Histórico de preço de vários anúncios numa única chamada.
+-- Usada por SupabaseService.obter_historicos_precos via RPC:
+--   client.rpc('historico_precos', {'car_ids': [...], 'desde': [...], 'limite': 10}).execute()
+-- Para cada anúncio considera os `limite` registros mais recentes (por
+-- created_at) e devolve, do mais recente ao mais antigo, só os alterados
+-- depois da marca d'água em `desde` (paralelo a `car_ids`; null = todos).
+--
+-- A marca d'água é updated_at, não created_at: o pipeline só insere em
+-- listings (inclusive a linha de REMOVIDO de marcar_removidos), mas uma
+-- correção feita direto no banco também precisa chegar aos caches, e o
+-- trigger abaixo renova updated_at a cada update.
+--
+-- Aplicar no SQL Editor do Supabase.
+
+alter table listings add column if not exists updated_at timestamptz not null default now();
+
+create or replace function listings_renovar_updated_at()
+returns trigger
+language plpgsql
+as $$
+begin
+  new.updated_at := now();
+  return new;
+end;
+$$;
+
+drop trigger if exists listings_updated_at on listings;
+create trigger listings_updated_at
+  before update on listings
+  for each row execute function listings_renovar_updated_at();
+
+create index if not exists idx_listings_car_id_created_at on listings (car_id, created_at desc);
+
+-- o tipo de retorno mudou (updated_at): create or replace não troca a assinatura
+drop function if exists historico_precos(text[], timestamptz[], int);
+
+create or replace function historico_precos(car_ids text[], desde timestamptz[], limite int default 10)
+returns table (car_id text, created_at timestamptz, price_numeric numeric, status text, updated_at timestamptz)
+language sql
+stable
+as $$
+  select h.car_id, h.created_at, h.price_numeric, h.status, h.updated_at
+  from (
+    select
+      l.car_id::text as car_id,
+      l.created_at,
+      l.price_numeric,
+      l.status,
+      l.updated_at,
+      p.desde,
+      row_number() over (partition by l.car_id order by l.created_at desc) as posicao
+    from listings l
+    join unnest(car_ids, desde) as p(car_id, desde) on p.car_id = l.car_id::text
+  ) h
+  where h.posicao <= limite
+    and (h.desde is null or h.updated_at > h.desde)
+  order by h.car_id, h.created_at desc;
+$$;
@@ -0,0 +1,9 @@
+-- Colunas da pontuação de oportunidades (services/oportunidades.py).
+-- Só são gravadas com GRAVAR_PONTUACAO_DB = True em autocarro.py.
+--
+-- Aplicar no SQL Editor do Supabase.
+
+alter table listings add column if not exists fipe_numeric numeric;
+alter table listings add column if not exists fipe_discount numeric;
+alter table listings add column if not exists price_zscore numeric;
+alter table listings add column if not exists deal_score numeric;
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Script de teste dos IDs canônicos e da migração da memória de preços
+(não precisa de rede nem de Supabase)
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+
+from services.memoria_service import MemoriaPrecos
+from services.pipeline import id_anuncio, id_canonico
+
+LINK = 'https://m.autocarro.com.br/loja1/anuncio/onix-lt-2019/1800123'
+# dois anúncios sem ID no link, ambos terminando no ano: não podem colidir
+SEM_ID_HB20 = 'https://m.autocarro.com.br/loja1/anuncio/hb20-1-0-2018'
+SEM_ID_ONIX = 'https://m.autocarro.com.br/loja2/anuncio/onix-lt-2018'
+
+
+def verificar(descricao, obtido, esperado):
+    ok = obtido == esperado
+    print(f"   {'✅' if ok else '❌'} {descricao}" + ("" if ok else f": {obtido!r} != {esperado!r}"))
+    return ok
+
+
+def testar_ids():
+    """Testa a extração do ID canônico"""
+    print("=" * 60)
+    print("🧪 TESTANDO IDS CANÔNICOS")
+    print("=" * 60)
+
+    casos = [
+        ("link com ID", id_canonico(LINK), 1800123),
+        ("link com / no fim", id_canonico(LINK + '/'), 1800123),
+        ("link com query", id_canonico(LINK + '?origem=busca#fotos'), 1800123),
+        ("id em texto", id_canonico(' 1800123 '), 1800123),
+        ("id inteiro", id_canonico(1800123), 1800123),
+        ("dígitos colados em texto", id_canonico('abc123'), None),
+        ("ano no fim do slug", id_canonico(SEM_ID_HB20), None),
+        ("segmento numérico curto", id_canonico('https://m.autocarro.com.br/anuncio/2018'), None),
+        ("anúncio sem ID usa o link", id_anuncio({'link': SEM_ID_HB20}), SEM_ID_HB20),
+        ("id do anúncio tem prioridade", id_anuncio({'id': '1800123', 'link': SEM_ID_HB20}), 1800123),
+    ]
+    resultados = [verificar(*caso) for caso in casos]
+    print()
+    return all(resultados)
+
+
+def testar_migracao(pasta):
+    """Testa a migração das chaves antigas (links) de uma memória existente"""
+    print("=" * 60)
+    print("🧪 TESTANDO MIGRAÇÃO DA MEMÓRIA")
+    print("=" * 60)
+
+    caminho = os.path.join(pasta, 'memoria.sqlite3')
+    conn = sqlite3.connect(caminho)
+    conn.executescript(
+        "CREATE TABLE atual (car_id TEXT PRIMARY KEY, preco REAL NOT NULL, atualizado REAL NOT NULL);"
+        "CREATE TABLE historico (car_id TEXT NOT NULL, preco REAL NOT NULL, visto_em REAL NOT NULL);"
+        "CREATE TABLE paginas (url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, hash_bruto TEXT,"
+        " hash_itens TEXT, car_ids TEXT NOT NULL, atualizado REAL NOT NULL);"
+    )
+    # o mesmo anúncio pelo link (mais antigo) e pelo ID (mais recente)
+    conn.executemany("INSERT INTO atual VALUES (?, ?, ?)", [
+        (LINK, 50000, 1), ('1800123', 49000, 2),
+        (SEM_ID_HB20, 45000, 1), (SEM_ID_ONIX, 52000, 1),
+    ])
+    conn.executemany("INSERT INTO historico VALUES (?, ?, ?)", [
+        (LINK, 50000, 1), ('1800123', 49000, 2), (SEM_ID_HB20, 45000, 1), (SEM_ID_ONIX, 52000, 1),
+    ])
+    conn.execute(
+        "INSERT INTO paginas VALUES ('pagina', NULL, NULL, NULL, NULL, ?, 1)",
+        (json.dumps([LINK, SEM_ID_HB20, SEM_ID_ONIX]),),
+    )
+    conn.commit()
+    conn.close()
+
+    memoria = MemoriaPrecos(caminho)
+    try:
+        chaves = sorted(linha[0] for linha in memoria._conn.execute("SELECT car_id FROM atual"))
+        resultados = [
+            verificar("chaves após a migração", chaves, sorted(['1800123', SEM_ID_HB20, SEM_ID_ONIX])),
+            verificar("colisão fica com o preço mais recente", memoria.get(LINK), 49000),
+            verificar("histórico unificado", len(memoria.historico(1800123)), 2),
+            verificar("links terminados no ano continuam separados",
+                      (memoria.get(SEM_ID_HB20), memoria.get(SEM_ID_ONIX)), (45000, 52000)),
+            verificar("páginas com os IDs canônicos",
+                      memoria.obter_pagina('pagina')['car_ids'], [1800123, SEM_ID_HB20, SEM_ID_ONIX]),
+        ]
+    finally:
+        memoria.fechar()
+    print()
+    return all(resultados)
+
+
+def main():
+    """Função principal de teste"""
+    print("\n🚀 Iniciando testes da memória de preços...\n")
+    with tempfile.TemporaryDirectory() as pasta:
+        ok = testar_ids() & testar_migracao(pasta)
+    print("=" * 60)
+    print("✅ TESTES CONCLUÍDOS!" if ok else "❌ HÁ TESTES FALHANDO")
+    print("=" * 60)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
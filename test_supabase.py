@@ -90,6 +90,9 @@ def testar_consultas(db, car_id=None):
         print(f"   Preço médio: R$ {stats['preco_medio']:,.2f}")
         print(f"   Preço mínimo: R$ {stats['preco_minimo']:,.2f}")
         print(f"   Preço máximo: R$ {stats['preco_maximo']:,.2f}")
+        for modelo in stats['por_modelo'][:5]:
+            print(f"   - {modelo['modelo']}: {modelo['total_anuncios']} anúncios, "
+                  f"média R$ {modelo['preco_medio']:,.2f}")
         print()
     except Exception as e:
         print(f"   ❌ Erro: {e}\n")
@@ -106,6 +109,14 @@ def testar_consultas(db, car_id=None):
         except Exception as e:
             print(f"   ❌ Erro: {e}\n")
 
+        print("📈 Obtendo históricos em lote...")
+        try:
+            historicos = db.obter_historicos_precos([car_id], limite=5)
+            print(f"   Registros encontrados: {len(historicos.get(str(car_id), []))}")
+            print()
+        except Exception as e:
+            print(f"   ❌ Erro: {e}\n")
+
 
 def main():
     """Função principal de teste"""